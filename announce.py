@@ -0,0 +1,114 @@
+# announce.py
+# "Three of ten" position announcements for history playback, built from the sys_aud/numbers clips.
+# Numbers past ten are put together from tens and units clips ("forty" "two") when those are recorded;
+# otherwise they get a "more than ten" cue: the "ten" clip followed by a short rising chirp.
+import threading
+import os
+
+import audio_codec
+
+# Defaults
+NUMBER_WORDS = ("one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten")
+TEEN_WORDS = ("eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen")
+TENS_WORDS = ("twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety")
+EXTRA_WORDS = ("hundred", "of")
+CLIP_EXTENSIONS = (".wav", ".mp3", ".opus", ".flac")
+SILENCE_LEVEL = 300   # Samples quieter than this at either end of a clip are trimmed
+EDGE_MS = 20          # ...leaving this much so the words don't start abruptly
+OF_PAUSE_MS = 250     # Pause standing in for "of" when there is no "of" clip
+END_PAUSE_MS = 300    # Pause between the announcement and the recording
+MORE_TONE_HZ = (880, 1320)  # Rising chirp after "ten" for numbers without clips
+MORE_TONE_MS = 90           # ...per tone
+MORE_TONE_LEVEL = 6000
+
+
+class IndexAnnouncer:
+    """Decodes the number clips once, then composes announcements as PCM in memory.
+
+    Clips are looked up by word ("three.mp3", "forty.mp3"); an optional "of" clip is used between
+    the two numbers, otherwise a short pause. Numbers that can't be spoken with the clips on
+    disk get the "more than ten" cue instead.
+    """
+
+    def __init__(self, directory, rate):
+        self.directory = directory
+        self.rate = rate
+        self.clips = None  # Word -> int16 samples, once loaded
+        self.lock = threading.Lock()
+
+    def _find(self, word):
+        for extension in CLIP_EXTENSIONS:
+            path = os.path.join(self.directory, word + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _decode(self, path):
+        import numpy as np
+        _, chunks = audio_codec.open_pcm(path, self.rate)
+        samples = np.frombuffer(b"".join(chunks), dtype="<i2")
+        loud = np.flatnonzero(np.abs(samples) > SILENCE_LEVEL)
+        if not len(loud):
+            return samples
+        edge = self.rate * EDGE_MS // 1000
+        return samples[max(0, loud[0] - edge):loud[-1] + edge]
+
+    def load(self):
+        """Decode every clip (safe to call more than once; only the first call does the work)."""
+        with self.lock:
+            if self.clips is not None:
+                return
+            clips = {}
+            for word in NUMBER_WORDS + TEEN_WORDS + TENS_WORDS + EXTRA_WORDS:
+                path = self._find(word)
+                if not path:
+                    continue
+                try:
+                    clips[word] = self._decode(path)
+                except Exception as e:
+                    print(f"Could not load announcement clip {path}: {e}")
+            self.clips = clips
+            print(f"Loaded {len(clips)} announcement clips from {self.directory}")
+
+    def _words(self, number):
+        if 1 <= number <= 10:
+            return [NUMBER_WORDS[number - 1]]
+        if 11 <= number <= 19:
+            return [TEEN_WORDS[number - 11]]
+        if 20 <= number <= 99:
+            return [TENS_WORDS[number // 10 - 2]] + ([NUMBER_WORDS[number % 10 - 1]] if number % 10 else [])
+        if number == 100:
+            return ["one", "hundred"]
+        return None
+
+    def _number(self, number):
+        """Clips saying `number`, or the "more than ten" cue if they aren't all on disk."""
+        words = self._words(number)
+        if words and all(word in self.clips for word in words):
+            return [self.clips[word] for word in words]
+        return self._more()
+
+    def _more(self):
+        import numpy as np
+        parts = [self.clips["ten"]] if "ten" in self.clips else []
+        length = self.rate * MORE_TONE_MS // 1000
+        fade = np.hanning(length)  # No clicks at the tone edges
+        for hz in MORE_TONE_HZ:
+            tone = np.sin(2 * np.pi * hz * np.arange(length) / self.rate) * fade * MORE_TONE_LEVEL
+            parts.append(tone.astype("<i2"))
+        return parts
+
+    def _pause(self, ms):
+        import numpy as np
+        return np.zeros(self.rate * ms // 1000, dtype="<i2")
+
+    def compose(self, position, total):
+        """(rate, PCM bytes) saying "`position` of `total`" (either may be the "more than ten" cue)."""
+        import numpy as np
+        self.load()
+        parts = self._number(position)
+        of = self.clips.get("of")
+        parts.append(self._pause(OF_PAUSE_MS) if of is None else of)
+        parts += self._number(total)
+        parts.append(self._pause(END_PAUSE_MS))
+        return self.rate, np.concatenate(parts).astype("<i2").tobytes()
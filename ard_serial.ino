@@ -6,6 +6,36 @@ const int prevPin = 5;
 const int nextPin = 7;
 const int wordCntPin = 4;
 
+// timing
+const unsigned long LONG_PRESS_MS = 800;  // Holding WORD_CNT cycles the playback speed, holding PLAY_BACK toggles scene watch
+
+// serial link: text lines at TEXT_BAUD until the Pi asks for frames ("FRAMED:<baud>", see serial_frames.py)
+const unsigned long TEXT_BAUD = 19200;
+const byte FRAME_SYNC = 0xA5;
+const byte FRAME_LENGTH = 11;  // sync, type, seq, id, arg (2), millis (4), crc
+const byte FRAME_EVENT = 1;
+const byte FRAME_COMMAND = 2;
+const byte FRAME_ACK = 3;
+const byte FRAME_HELLO = 4;
+// event IDs (Arduino -> Pi)
+const byte EVT_TAKE_PICTURE = 1;
+const byte EVT_PLAY_BACK = 2;
+const byte EVT_PREV = 3;
+const byte EVT_NEXT = 4;
+const byte EVT_WORD_CNT = 5;
+const byte EVT_PLAYBACK_SPEED = 6;
+const byte EVT_SCENE_WATCH = 8;
+// command IDs (Pi -> Arduino)
+const byte CMD_FEEDBACK_VIBRATE = 32;
+const byte CMD_STOP_VIBRATION = 33;
+const byte CMD_REQUEST_COMPLETE = 34;
+const byte CMD_READY = 35;
+const byte CMD_WORDINESS = 36;
+const unsigned long ACK_TIMEOUT_MS = 60;      // Resend an unacknowledged event after this long...
+const byte MAX_TRIES = 5;                     // ...this many times, then go back to text
+const unsigned long CONFIRM_TIMEOUT_MS = 1500;  // No valid frame this long after switching: back to text
+const byte PENDING_SLOTS = 4;
+
 // global vars
 unsigned long simpleDelay = 0;
 int globalVibration = 0;
@@ -15,6 +45,22 @@ int vibrationStrength = 0;
 bool fadeUp = true;
 String lastCommand = "";
 
+// framed link state
+bool framed = false;
+bool framedConfirmed = false;
+unsigned long framedSince = 0;
+byte txSeq = 0;
+int lastRxSeq = -1;
+byte rxBuffer[FRAME_LENGTH];
+byte rxCount = 0;
+struct PendingEvent {
+    bool used;
+    byte frame[FRAME_LENGTH];
+    unsigned long sentAt;
+    byte tries;
+};
+PendingEvent pending[PENDING_SLOTS];
+
 
 // ITERATE VIBRATION TO NOT LOCKUP SYSTEM WHEN STEPPING UP AND DOWN 03/12/25
 
@@ -23,9 +69,10 @@ void checkButton() {
 
     bool buttonState = digitalRead(buttonPin);
     if (buttonState == LOW && lastButtonState == HIGH) {
+      unsigned long at = millis();  // Press time, before the debounce
       delay(10);  // Short debounce
         if (digitalRead(buttonPin) == LOW) {  // Confirm it's still pressed
-          sendCommand("TAKE_PICTURE");
+          sendEvent(EVT_TAKE_PICTURE, "TAKE_PICTURE", at);
         }
     }
 
@@ -37,23 +84,37 @@ void checkDigitalPins() {
     static bool lastPrevState = HIGH;
     static bool lastNextState = HIGH;
     static bool lastWordCntState = HIGH;
+    static unsigned long wordCntPressedAt = 0;
+    static bool wordCntLongSent = false;
+    static unsigned long playBackPressedAt = 0;
+    static bool playBackLongSent = false;
 
-    // Check pin 4 - PLAY_BACK
+    // Check pin 4 - PLAY_BACK (short press: history playback, long press: scene watch on/off)
     bool playBackState = digitalRead(playBackPin);
     if (playBackState == LOW && lastPlayBackState == HIGH) {
+        unsigned long at = millis();
         delay(10);  // Short debounce
         if (digitalRead(playBackPin) == LOW) {
-            sendCommand("PLAY_BACK");
+            playBackPressedAt = at;
+            playBackLongSent = false;
+        } else {
+            playBackState = HIGH;  // Bounce, not a press
         }
+    } else if (playBackState == LOW && !playBackLongSent && millis() - playBackPressedAt >= LONG_PRESS_MS) {
+        sendEvent(EVT_SCENE_WATCH, "SCENE_WATCH", playBackPressedAt + LONG_PRESS_MS);
+        playBackLongSent = true;
+    } else if (playBackState == HIGH && lastPlayBackState == LOW && !playBackLongSent) {
+        sendEvent(EVT_PLAY_BACK, "PLAY_BACK", playBackPressedAt);  // Sent on release, like WORD_CNT
     }
     lastPlayBackState = playBackState;
     
     // Check pin 5 - PREV
     bool prevState = digitalRead(prevPin);
     if (prevState == LOW && lastPrevState == HIGH) {
+        unsigned long at = millis();
         delay(10);  // Short debounce
         if (digitalRead(prevPin) == LOW) {
-            sendCommand("PREV");
+            sendEvent(EVT_PREV, "PREV", at);
         }
     }
     lastPrevState = prevState;
@@ -61,29 +122,46 @@ void checkDigitalPins() {
     // Check pin 6 - NEXT
     bool nextState = digitalRead(nextPin);
     if (nextState == LOW && lastNextState == HIGH) {
+        unsigned long at = millis();
         delay(10);  // Short debounce
         if (digitalRead(nextPin) == LOW) { 
-            sendCommand("NEXT");
+            sendEvent(EVT_NEXT, "NEXT", at);
         }
     }
     lastNextState = nextState;
     
-    // Check pin 7 - WORD_CNT
+    // Check pin 7 - WORD_CNT (short press: wordiness, long press: playback speed)
     bool wordCntState = digitalRead(wordCntPin);
     if (wordCntState == LOW && lastWordCntState == HIGH) {
         delay(10);  // Short debounce
         if (digitalRead(wordCntPin) == LOW) {
-            sendCommand("WORD_CNT");
+            wordCntPressedAt = millis();
+            wordCntLongSent = false;
+        } else {
+            wordCntState = HIGH;  // Bounce, not a press
         }
+    } else if (wordCntState == LOW && !wordCntLongSent && millis() - wordCntPressedAt >= LONG_PRESS_MS) {
+        sendEvent(EVT_PLAYBACK_SPEED, "PLAYBACK_SPEED", wordCntPressedAt + LONG_PRESS_MS);
+        wordCntLongSent = true;
+    } else if (wordCntState == HIGH && lastWordCntState == LOW && !wordCntLongSent) {
+        sendEvent(EVT_WORD_CNT, "WORD_CNT", wordCntPressedAt);  // Sent on release so a long press doesn't also change wordiness
     }
     lastWordCntState = wordCntState;
 }
 
 void checkSerialCommands() {
+    if (framed) {
+        while (Serial.available()) {
+            readFrameByte(Serial.read());
+        }
+        return;
+    }
     if (Serial.available()) {
         String command = Serial.readStringUntil('\n');
         command.trim();
-        handleCommand(command);
+        if (command.length() > 0) {  // The Pi sends a bare newline to end line noise
+            handleCommand(command);
+        }
     }
 }
 
@@ -97,6 +175,10 @@ void handleCommand(String command) {
       triggerVibration(50);
       delay(50);
       triggerVibration(50);
+    } else if (command.startsWith("FRAMED:")) {
+        startFramed(command.substring(7).toInt());
+    } else if (command == "READY" || command.startsWith("WORDINESS_")) {
+        // Nothing to do on this board
     } else {
         Serial.print("UNKNOWN_COMMAND: ");
         Serial.println(command);
@@ -106,6 +188,170 @@ void handleCommand(String command) {
 void sendCommand(const char* cmd) {
     Serial.println(cmd);
 }
+
+// ---- framed link ----
+
+byte crc8(const byte* data, byte length) {
+    byte crc = 0;
+    for (byte i = 0; i < length; i++) {
+        crc ^= data[i];
+        for (byte bit = 0; bit < 8; bit++) {
+            crc = (crc & 0x80) ? (byte)((crc << 1) ^ 0x07) : (byte)(crc << 1);
+        }
+    }
+    return crc;
+}
+
+void buildFrame(byte* frame, byte type, byte seq, byte id, unsigned int arg, unsigned long ms) {
+    frame[0] = FRAME_SYNC;
+    frame[1] = type;
+    frame[2] = seq;
+    frame[3] = id;
+    frame[4] = arg & 0xFF;
+    frame[5] = arg >> 8;
+    for (byte i = 0; i < 4; i++) {
+        frame[6 + i] = (ms >> (8 * i)) & 0xFF;
+    }
+    frame[10] = crc8(frame + 1, 9);
+}
+
+void sendAck(byte seq, byte id) {
+    byte frame[FRAME_LENGTH];
+    buildFrame(frame, FRAME_ACK, seq, id, 0, millis());
+    Serial.write(frame, FRAME_LENGTH);
+}
+
+void startFramed(long baud) {
+    if (baud <= 0) {
+        return;
+    }
+    Serial.print("FRAMED_OK:");
+    Serial.println(baud);
+    Serial.flush();  // Finish the reply at the old baud
+    Serial.begin(baud);
+    framed = true;
+    framedConfirmed = false;  // Until the Pi's first frame arrives at the new baud
+    framedSince = millis();
+    lastRxSeq = -1;
+    rxCount = 0;
+}
+
+void stopFramed() {
+    Serial.flush();
+    Serial.begin(TEXT_BAUD);
+    framed = false;
+    rxCount = 0;
+    for (byte i = 0; i < PENDING_SLOTS; i++) {
+        pending[i].used = false;
+    }
+}
+
+// Button press: a framed event with its press time (resent until acked), or a text line
+void sendEvent(byte id, const char* name, unsigned long at) {
+    if (!framed) {
+        sendCommand(name);
+        return;
+    }
+    byte slot = 0;
+    for (byte i = 0; i < PENDING_SLOTS; i++) {
+        if (!pending[i].used) {
+            slot = i;
+            break;
+        }
+        if (pending[i].sentAt < pending[slot].sentAt) {
+            slot = i;  // All busy: replace the oldest
+        }
+    }
+    txSeq++;
+    buildFrame(pending[slot].frame, FRAME_EVENT, txSeq, id, 0, at);
+    pending[slot].used = true;
+    pending[slot].sentAt = millis();
+    pending[slot].tries = 1;
+    Serial.write(pending[slot].frame, FRAME_LENGTH);
+}
+
+void handleFrame(const byte* frame) {
+    byte type = frame[1];
+    byte seq = frame[2];
+    byte id = frame[3];
+    unsigned int arg = frame[4] | (frame[5] << 8);
+    framedConfirmed = true;
+
+    if (type == FRAME_ACK) {
+        for (byte i = 0; i < PENDING_SLOTS; i++) {
+            if (pending[i].used && pending[i].frame[2] == seq) {
+                pending[i].used = false;
+            }
+        }
+        return;
+    }
+    if (type == FRAME_HELLO) {
+        sendAck(seq, id);
+        return;
+    }
+    if (type != FRAME_COMMAND) {
+        return;
+    }
+    sendAck(seq, id);  // Ack before acting: vibration patterns block for a while
+    if (seq == lastRxSeq) {
+        return;  // A resend; our ack was lost
+    }
+    lastRxSeq = seq;
+    if (id == CMD_FEEDBACK_VIBRATE) {
+        handleCommand("FEEDBACK_VIBRATE");
+    } else if (id == CMD_STOP_VIBRATION) {
+        handleCommand("STOP_VIBRATION");
+    } else if (id == CMD_REQUEST_COMPLETE) {
+        handleCommand("REQUEST_COMPLETE");
+    } else if (id == CMD_READY || id == CMD_WORDINESS) {
+        (void)arg;  // Nothing to do on this board
+    }
+}
+
+void readFrameByte(byte b) {
+    if (rxCount == 0 && b != FRAME_SYNC) {
+        return;  // Wait for the start of a frame
+    }
+    rxBuffer[rxCount++] = b;
+    if (rxCount < FRAME_LENGTH) {
+        return;
+    }
+    if (crc8(rxBuffer + 1, 9) == rxBuffer[10]) {
+        rxCount = 0;
+        handleFrame(rxBuffer);
+        return;
+    }
+    // Bad CRC: resynchronise on the next SYNC byte in what was received
+    byte start = 1;
+    while (start < FRAME_LENGTH && rxBuffer[start] != FRAME_SYNC) {
+        start++;
+    }
+    rxCount = FRAME_LENGTH - start;
+    memmove(rxBuffer, rxBuffer + start, rxCount);
+}
+
+void checkFramedLink() {
+    if (!framed) {
+        return;
+    }
+    unsigned long now = millis();
+    if (!framedConfirmed && now - framedSince > CONFIRM_TIMEOUT_MS) {
+        stopFramed();  // The Pi never followed us to the new baud
+        return;
+    }
+    for (byte i = 0; i < PENDING_SLOTS; i++) {
+        if (!pending[i].used || now - pending[i].sentAt < ACK_TIMEOUT_MS) {
+            continue;
+        }
+        if (pending[i].tries >= MAX_TRIES) {
+            stopFramed();  // The Pi went away (restarted?); it asks for frames again when it's back
+            return;
+        }
+        pending[i].sentAt = now;
+        pending[i].tries++;
+        Serial.write(pending[i].frame, FRAME_LENGTH);
+    }
+}
 /*
 void iteVibr() {
   if (globalVibration 
@@ -131,7 +377,7 @@ void stopVibration() {
 // ###       ### ###     ### ########### ###    ####
 // main
 void setup() {
-    Serial.begin(19200);
+    Serial.begin(TEXT_BAUD);
     pinMode(buttonPin, INPUT_PULLUP);
     pinMode(vibrationPin, OUTPUT);
     pinMode(playBackPin, INPUT_PULLUP);
@@ -145,6 +391,7 @@ void loop() {
     checkButton();
     checkDigitalPins();
     checkSerialCommands();
+    checkFramedLink();
 
     // Handle ongoing vibration loop
     if (isVibrating) {
@@ -0,0 +1,218 @@
+# audio_codec.py
+# Compact storage for the response history (Opus or FLAC through PyAV) and streaming decode for playback.
+import struct
+import wave
+import mmap
+import os
+
+# Supported history formats: codec -> (PyAV encoder, container, file extension)
+CODECS = {
+    "opus": ("libopus", "ogg", ".opus"),  # Speech at 24 kbit/s: ~10x smaller than 22 kHz PCM
+    "flac": ("flac", "flac", ".flac"),    # Lossless: ~2x smaller
+}
+OPUS_RATE = 24000       # Opus only runs at 8/12/16/24/48 kHz
+OPUS_BIT_RATE = 24000
+FRAME_SAMPLES = 8192    # Samples per frame handed to the encoder (and per block when streaming a WAV)
+RELEASE_BYTES = 1 << 20  # Streamed WAV pages are released in steps this size
+COMPRESSED_EXTENSIONS = tuple(extension for _, _, extension in CODECS.values())
+WAVE_FORMAT_FLOAT = 3
+# Streamed WAV sample widths: bytes -> (numpy type, scale to 16-bit); 24-bit is read through a strided view
+WIDTH_DTYPES = {1: "u1", 2: "<i2", 4: "<i4"}
+WIDTH_SCALE = {1: 256.0, 2: 1.0, 3: 1.0, 4: 1.0 / 65536}
+
+
+def is_compressed(path):
+    return path.lower().endswith(COMPRESSED_EXTENSIONS)
+
+
+def encode_wav(wav_path, codec="opus", out_dir=None):
+    """Encode a 16-bit mono WAV in `codec` next to itself (or into `out_dir`); returns the new path.
+
+    The WAV is kept.
+    """
+    import av
+    import numpy as np
+
+    encoder, container_format, extension = CODECS[codec]
+    out_path = os.path.splitext(wav_path)[0] + extension
+    if out_dir:
+        out_path = os.path.join(out_dir, os.path.basename(out_path))
+    temp_path = out_path + ".tmp"
+    try:
+        with wave.open(wav_path, "rb") as source, av.open(temp_path, "w", format=container_format) as container:
+            rate = source.getframerate()
+            stream = container.add_stream(encoder, rate=OPUS_RATE if codec == "opus" else rate)
+            stream.layout = "mono"
+            if codec == "opus":
+                stream.bit_rate = OPUS_BIT_RATE
+
+            while True:
+                block = source.readframes(FRAME_SAMPLES)
+                if not block:
+                    break
+                samples = np.frombuffer(block, dtype="<i2").reshape(1, -1)
+                frame = av.AudioFrame.from_ndarray(samples, format="s16", layout="mono")
+                frame.sample_rate = rate
+                for packet in stream.encode(frame):  # PyAV converts rate/format for the encoder
+                    container.mux(packet)
+            for packet in stream.encode(None):
+                container.mux(packet)
+        os.replace(temp_path, out_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return out_path
+
+
+def _wav_data(mapped):
+    """(offset, length, rate, channels, sample width) of the sample data in a mapped WAV file."""
+    if mapped[:4] != b"RIFF" or mapped[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+    position, fmt = 12, None
+    while position + 8 <= len(mapped):
+        chunk_id = mapped[position:position + 4]
+        size = struct.unpack_from("<I", mapped, position + 4)[0]
+        if chunk_id == b"fmt ":
+            tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", mapped, position + 8)
+            if tag == WAVE_FORMAT_FLOAT:
+                raise ValueError("Floating-point WAV files can't be streamed")
+            fmt = (rate, channels, bits // 8)
+        elif chunk_id == b"data" and fmt:
+            return (position + 8, min(size, len(mapped) - position - 8)) + fmt
+        position += 8 + size + (size & 1)
+    raise ValueError("WAV file has no sample data")
+
+
+def wav_format(path):
+    """(rate, channels, sample width) of a WAV file."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return _wav_data(mapped)[2:]
+
+
+def open_wav_pcm(path, block_frames=FRAME_SAMPLES, start=0, gain=1.0, mono=True):
+    """Like open_pcm for a WAV, read block by block from a memory map.
+
+    Samples come out as 16-bit PCM whatever the file's sample width (8, 16, 24 or 32 bits);
+    channels are mixed to mono, or kept interleaved with `mono=False`. Starting at sample
+    `start` only maps the pages from there on; nothing before it is read. `gain` scales each
+    block in a buffer reused for the whole file, so memory use doesn't grow with the length
+    of the file.
+    """
+    import numpy as np
+
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        offset, length, rate, channels, width = _wav_data(mapped)
+        if width not in WIDTH_SCALE:
+            raise ValueError(f"Unsupported WAV sample width ({width * 8} bits): {path}")
+    except Exception:
+        mapped.close()
+        raise
+    frame_bytes = width * channels
+    end = offset + length - length % frame_bytes
+    out_channels = 1 if mono else channels
+    factor = gain * WIDTH_SCALE[width]
+
+    work = np.empty(block_frames * out_channels, dtype=np.float32)
+    out = np.empty(block_frames * out_channels, dtype="<i2")
+
+    def read_block(position, frames):
+        # The array only lives in here: the map can't close while one still points into it
+        count = frames * channels
+        if width == 3:
+            # The upper two bytes of each 24-bit sample, read in place as 16-bit samples
+            view = np.ndarray((count,), dtype="<i2", buffer=mapped, offset=position + 1, strides=(3,))
+        else:
+            view = np.frombuffer(mapped, dtype=WIDTH_DTYPES[width], count=count, offset=position)
+        if width == 2 and out_channels == channels and gain == 1.0:
+            return view.tobytes()
+        block = work[:frames * out_channels]
+        if out_channels != channels:
+            np.mean(view.reshape(-1, channels), axis=1, out=block)
+        else:
+            block[:] = view
+        if width == 1:
+            block -= 128  # 8-bit WAV samples are unsigned
+        if factor != 1.0:
+            block *= factor
+            np.clip(block, -32768, 32767, out=block)
+        np.rint(block, out=block)
+        out[:len(block)] = block
+        return out[:len(block)].tobytes()
+
+    def chunks():
+        try:
+            position = min(offset + start * frame_bytes, end)
+            released = position - position % mmap.PAGESIZE
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            while position < end:
+                frames = min(block_frames, (end - position) // frame_bytes)
+                block = read_block(position, frames)
+                position += frames * frame_bytes
+                # Hand pages already played back to the kernel so resident memory stays flat
+                done = position - position % mmap.PAGESIZE
+                if done - released >= RELEASE_BYTES and hasattr(mapped, "madvise"):
+                    mapped.madvise(mmap.MADV_DONTNEED, released, done - released)
+                    released = done
+                yield block
+        finally:
+            mapped.close()
+
+    return rate, chunks()
+
+
+def open_pcm(path, rate=None, start=0):
+    """Open a compressed (or WAV) file for streaming playback, resampled to `rate` if given.
+
+    Returns (sample_rate, chunks): `chunks` yields 16-bit mono PCM bytes as it decodes, so the
+    player can start after the first frame instead of after the whole file. `start` skips that
+    many samples (at the returned rate) by seeking, not by decoding them.
+    """
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as source:
+            native = source.getframerate()
+        if rate in (None, native):
+            return open_wav_pcm(path, start=start)
+
+    import av
+
+    container = av.open(path)
+    stream = container.streams.audio[0]
+    rate = rate or stream.rate
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=rate)
+    seconds = start / rate
+    if start:
+        container.seek(int(seconds / stream.time_base), stream=stream)  # Lands on or before `start`
+
+    def chunks():
+        skip = 0 if not start else None  # Samples between the seek point and `start`
+        try:
+            for frame in container.decode(stream):
+                if skip is None:
+                    skip = max(0, int(round((seconds - (frame.time or 0.0)) * rate)))
+                for converted in resampler.resample(frame):
+                    data = converted.to_ndarray().tobytes()
+                    if skip:
+                        dropped = min(2 * skip, len(data))
+                        data, skip = data[dropped:], skip - dropped // 2
+                    if data:
+                        yield data
+            for converted in resampler.resample(None):
+                yield converted.to_ndarray().tobytes()
+        finally:
+            container.close()
+
+    return rate, chunks()
+
+
+def duration(path):
+    """Length of a compressed file in seconds (0 if unknown)."""
+    import av
+
+    try:
+        with av.open(path) as container:
+            return (container.duration or 0) / av.time_base
+    except (av.FFmpegError, OSError):
+        return 0.0
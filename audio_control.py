@@ -1,10 +1,11 @@
 import sounddevice as sd
-import numpy as np
-import wave
 import threading
 import time
 import os
 
+# Memory-mapped, block-by-block WAV reading
+import audio_codec
+
 # Global lock to prevent overlapping audio operations
 audio_lock = threading.Lock()
 
@@ -13,37 +14,41 @@ current_thread = None
 current_audio = None
 is_looping = False
 
-def load_wav(file_path):
-    """Loads a WAV file into a NumPy array for playback."""
-    with wave.open(file_path, 'rb') as wf:
-        frames = wf.readframes(wf.getnframes())
-        audio_data = np.frombuffer(frames, dtype=np.int16)
-        channels = wf.getnchannels()
-        sample_rate = wf.getframerate()
+# Samples handed to the output device per write
+BLOCK_FRAMES = 2048
+
+# Set to make the playback thread stop after its current block
+stop_event = threading.Event()
 
-    if channels == 2:
-        audio_data = audio_data.reshape(-1, 2)
+def _stream_wav(file_path, volume, loop):
+    """Plays a WAV from a memory map, one block at a time with the volume applied per block.
 
-    return audio_data, sample_rate
+    Stereo files stay stereo; 8/24/32-bit samples are converted to 16-bit as they are read.
+    """
+    _, channels, _ = audio_codec.wav_format(file_path)
+    while not stop_event.is_set():
+        sample_rate, chunks = audio_codec.open_wav_pcm(file_path, BLOCK_FRAMES, gain=volume / 100, mono=False)
+        try:
+            with sd.RawOutputStream(samplerate=sample_rate, channels=channels, dtype="int16",
+                                    blocksize=BLOCK_FRAMES) as stream:
+                for block in chunks:
+                    if stop_event.is_set():
+                        break
+                    stream.write(block)
+        finally:
+            chunks.close()
+        if not (loop and is_looping):
+            break
 
 def _play_audio_impl(file_path, volume=100):
     """Internal function to actually play the audio once."""
     global current_thread, is_looping, current_audio
 
-    # Load & prepare audio data
-    audio_data, sample_rate = load_wav(file_path)
-    audio_data = np.clip(audio_data * (volume / 100), -32768, 32767).astype(np.int16)
-
-    def playback():
-        sd.stop()        # Ensure no old playback is running
-        time.sleep(0.1)  # Tiny delay so device can settle
-        sd.play(audio_data, samplerate=sample_rate)
-        sd.wait()        # Block until playback finishes
-
-    current_audio = audio_data
+    current_audio = file_path
     is_looping = False
+    stop_event.clear()
 
-    current_thread = threading.Thread(target=playback, daemon=True)
+    current_thread = threading.Thread(target=_stream_wav, args=(file_path, volume, False), daemon=True)
     current_thread.start()
 
     time.sleep(0.1)  # Ensure thread truly starts
@@ -70,20 +75,11 @@ def _loop_audio_impl(file_path, volume=100):
     """Internal function to actually loop the audio."""
     global current_thread, is_looping, current_audio
 
-    audio_data, sample_rate = load_wav(file_path)
-    audio_data = np.clip(audio_data * (volume / 100), -32768, 32767).astype(np.int16)
-
-    def playback():
-        while is_looping:
-            sd.stop()
-            time.sleep(0.1)
-            sd.play(audio_data, samplerate=sample_rate)
-            sd.wait()
-
-    current_audio = audio_data
+    current_audio = file_path
     is_looping = True
+    stop_event.clear()
 
-    current_thread = threading.Thread(target=playback, daemon=True)
+    current_thread = threading.Thread(target=_stream_wav, args=(file_path, volume, True), daemon=True)
     current_thread.start()
 
     print(f"🔄 Looping {file_path} at {volume}% volume")
@@ -115,7 +111,7 @@ def _stop_audio_impl():
     is_looping = False
     if current_thread and current_thread.is_alive():
         print("🛑 Stopping current audio thread safely...")
-        sd.stop()
+        stop_event.set()
         current_thread.join(timeout=5)
         current_thread = None
     print("🛑 Audio fully stopped and memory cleaned up")
@@ -1,9 +1,16 @@
 # audio_manager.py
 import threading
-import subprocess
+import select
+import queue
 import time
 import os
 
+# Audio output backend (aplay/mpg123 on the Pi, null/wave-file sink in simulation)
+import hardware
+
+# Compressed history formats (decoded by the sink)
+from audio_codec import COMPRESSED_EXTENSIONS
+
 # Import volume control module
 try:
     import volume_control
@@ -12,6 +19,9 @@ except ImportError:
     has_volume_control = False
     print("WARNING: volume_control module not found, falling back to direct amixer calls")
 
+# How often the worker polls players that have no stderr pipe (simulated sinks)
+POLL_INTERVAL = 0.02
+
 # Define command types
 AUDIO_CMD_PLAY = "play"     # Play a sound once
 AUDIO_CMD_LOOP = "loop"     # Loop a sound until stopped
@@ -22,15 +32,27 @@ class AudioManager:
         # State tracking
         self.is_audio_playing = threading.Event()  # Flag to track if audio is playing
         self.current_audio_pid = None  # Track current audio process ID
+        self.current_proc = None  # Current player process (or simulated playback)
         self.in_playback_mode = False  # Track if we're in playback cycle
+        self.underrun_count = 0  # Underruns reported by aplay
+        self.on_underrun = None  # Optional function called on each underrun
         
         # For looping sounds
         self.loop_active = threading.Event()
-        self.loop_thread = None
+
+        # One long-lived worker owns the playing sound and runs completion callbacks
+        self.lock = threading.Lock()
+        self._active = None  # Playback entry owned by the worker
+        self._finished = queue.Queue()  # Stopped entries whose callbacks still need to run
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_w, False)
+        self.worker_thread = threading.Thread(target=self._worker, name="audio-worker", daemon=True)
+        self.worker_thread.start()
         
         # Check available audio players
-        self.has_aplay = self._command_exists("aplay")  # For WAV files
-        self.has_mpg123 = self._command_exists("mpg123")  # For MP3 files
+        self.sink = hardware.create_audio_sink()
+        self.has_aplay = self.sink.has_aplay  # For WAV files
+        self.has_mpg123 = self.sink.has_mpg123  # For MP3 files
         
         # Flag to indicate if MP3 playback is supported
         self.can_play_mp3 = self.has_mpg123
@@ -41,26 +63,11 @@ class AudioManager:
         if not (self.has_aplay or self.has_mpg123):
             print("WARNING: No supported audio player found!")
         
-        # Initialize volume control if available
-        if has_volume_control:
-            try:
-                self.volume_control = volume_control.init_volume_encoder()
-                print("Volume control initialized with rotary encoder")
-            except Exception as e:
-                print(f"WARNING: Failed to initialize volume control: {e}")
-                self.volume_control = None
-        else:
-            self.volume_control = None
-            
+        # The rotary encoder is initialized once by the application (see picture.startup)
+
     def _command_exists(self, cmd):
         """Check if a command exists on the system."""
-        try:
-            result = subprocess.run(["which", cmd], 
-                                   stdout=subprocess.PIPE, 
-                                   stderr=subprocess.PIPE)
-            return result.returncode == 0
-        except:
-            return False
+        return hardware.command_exists(cmd)
 
     def _set_volume(self, volume):
         """Set system volume (0-100)"""
@@ -69,28 +76,221 @@ class AudioManager:
             volume = max(0, min(100, volume))
             
             # Use volume_control module if available
-            if has_volume_control and self.volume_control:
+            if has_volume_control and volume_control.volume_encoder:
                 return volume_control.set_volume(volume)
             else:
                 # Fallback to direct amixer command
-                subprocess.run(
-                    ["amixer", "sset", "SoftMaster", f"{volume}%"], 
-                    stdout=subprocess.PIPE, 
-                    stderr=subprocess.PIPE
-                )
+                hardware.set_system_volume(volume)
                 print(f"Volume set to {volume}%")
                 return True
         except Exception as e:
             print(f"Error setting volume: {e}")
             return False
             
-    def play_sound(self, file_path, volume=100, callback=None):
+    def _check_player(self, file_ext):
+        """Check that a player is available for this file type."""
+        if file_ext == '.wav' or file_ext in COMPRESSED_EXTENSIONS:
+            if not self.has_aplay:
+                print("ERROR: No WAV player (aplay) available")
+                return False
+        elif file_ext == '.mp3':
+            if not self.has_mpg123:
+                print("ERROR: No MP3 player (mpg123) available")
+                return False
+        else:
+            print(f"ERROR: Unsupported file format: {file_ext}")
+            return False
+        return True
+
+    def _wake(self):
+        """Wake the worker so it picks up a state change."""
+        try:
+            os.write(self._wake_w, b"x")
+        except BlockingIOError:
+            pass  # Already has a pending wake-up
+
+    def _start_entry(self, file_path, callback=None, on_start=None, loop=False, replaces=None, speed=1.0,
+                     intro=None, start=0, on_end=None):
+        """Start a player and hand it to the worker.
+
+        With `replaces`, the new player is only installed if that entry is still active
+        (a loop restart must not resurrect a sound stopped in the meantime).
+        """
+        proc = self.sink.start(file_path, speed, intro, start)
+        stderr_fd = None
+        try:
+            stderr_fd = proc.stderr.fileno()
+            os.set_blocking(stderr_fd, False)
+        except (AttributeError, OSError, ValueError):
+            pass  # Simulated players have an in-memory stderr
+
+        entry = {
+            "file_path": file_path,
+            "proc": proc,
+            "stderr_fd": stderr_fd,
+            "callback": callback,
+            "on_start": on_start,
+            "on_end": on_end,
+            "position": getattr(proc, "stream_position", None),
+            "feed": getattr(proc, "pcm_feed", None),  # Streamed PCM the worker writes into the player
+            "started": False,
+            "stderr_eof": False,
+            "loop": loop,
+        }
+        with self.lock:
+            if replaces is not None and (self._active is not replaces or not self.loop_active.is_set()):
+                proc.terminate()
+                return None
+            self._active = entry
+            self.current_proc = proc
+            self.current_audio_pid = proc.pid
+            self.is_audio_playing.set()
+        self._wake()
+        return entry
+
+    def _read_stderr(self, entry):
+        """Read whatever the player has written to stderr without blocking."""
+        proc = entry["proc"]
+        if entry["stderr_fd"] is not None:
+            try:
+                data = os.read(entry["stderr_fd"], 4096)
+            except BlockingIOError:
+                return None
+            except OSError:
+                data = b""
+        else:
+            data = proc.stderr.read()
+            if not data:
+                # In-memory stderr is exhausted; treat as EOF once the player exits
+                return b"" if proc.poll() is not None else None
+        return data
+
+    def _service(self, entry):
+        """Handle stderr output and completion of the active player (worker thread only)."""
+        if not entry["stderr_eof"]:
+            data = self._read_stderr(entry)
+            if data is not None:
+                # aplay reports "Playing WAVE ..." once the device is open;
+                # mpg123 -q prints nothing so the first event is EOF
+                if not entry["started"]:
+                    entry["started"] = True
+                    if entry["on_start"]:
+                        self._run_callback(entry["on_start"])
+                if data == b"":
+                    entry["stderr_eof"] = True
+                else:
+                    underruns = data.count(b"underrun")
+                    if underruns:
+                        self.underrun_count += underruns
+                        if self.on_underrun:
+                            for _ in range(underruns):
+                                self.on_underrun()
+
+        if entry["proc"].poll() is None:
+            return
+
+        # Player finished on its own
+        self._close_feed(entry)
+        with self.lock:
+            if self._active is not entry:
+                return  # Stopped meanwhile; stop_all_audio queued its callback
+            if entry["loop"] and self.loop_active.is_set():
+                restart = True
+            else:
+                restart = False
+                self._active = None
+                self.is_audio_playing.clear()
+                self.current_audio_pid = None
+                self.current_proc = None
+                # Reset playback mode when audio finishes
+                self.in_playback_mode = False
+
+        if restart:
+            try:
+                self._start_entry(entry["file_path"], loop=True, replaces=entry)
+            except Exception as e:
+                print(f"Error in sound loop: {e}")
+            return
+
+        print(f"Sound playback of {entry['file_path']} completed")
+        if entry["on_end"]:
+            self._run_callback(lambda: entry["on_end"](None))
+        if entry["callback"]:
+            self._run_callback(entry["callback"])
+
+    def _close_feed(self, entry):
+        if entry["feed"]:
+            entry["feed"].close()
+
+    def _run_callback(self, callback):
+        try:
+            callback()
+        except Exception as e:
+            print(f"Error in audio callback: {e}")
+
+    def _worker(self):
+        """Single audio thread: waits on the active player's stderr, runs callbacks."""
+        while True:
+            with self.lock:
+                entry = self._active
+
+            read_fds = [self._wake_r]
+            write_fds = []
+            timeout = None  # Idle: sleep until woken
+            if entry:
+                if entry["stderr_fd"] is not None and not entry["stderr_eof"]:
+                    read_fds.append(entry["stderr_fd"])
+                    timeout = 1.0
+                else:
+                    timeout = POLL_INTERVAL
+                if entry["feed"] and not entry["feed"].done:
+                    write_fds.append(entry["feed"].fd)
+
+            try:
+                ready, writable, _ = select.select(read_fds, write_fds, [], timeout)
+                if self._wake_r in ready:
+                    os.read(self._wake_r, 1024)
+                if writable:
+                    entry["feed"].write()  # Fills the player's pipe without blocking
+            except Exception as e:
+                print(f"Error in audio worker: {e}")
+                time.sleep(POLL_INTERVAL)
+
+            # Completion callbacks of sounds that were stopped
+            while True:
+                try:
+                    stopped = self._finished.get_nowait()
+                except queue.Empty:
+                    break
+                self._close_feed(stopped)  # The worker owns the chunk iterator
+                if stopped["on_end"] and stopped["position"]:
+                    self._run_callback(lambda: stopped["on_end"](stopped["position"].samples))
+                if stopped["callback"]:
+                    self._run_callback(stopped["callback"])
+
+            with self.lock:
+                entry = self._active
+            if entry:
+                try:
+                    self._service(entry)
+                except Exception as e:
+                    print(f"Error in audio worker: {e}")
+
+    def play_sound(self, file_path, volume=100, callback=None, on_start=None, speed=1.0, intro=None, start=0,
+                   on_end=None):
         """Play a sound file once.
         
         Args:
-            file_path: Path to audio file (WAV or MP3)
+            file_path: Path to audio file (WAV, Opus/FLAC or MP3)
             volume: Volume 0-100
             callback: Optional function to call when playback completes
+            on_start: Optional function to call once the player has opened the
+                audio device and started writing samples (used for latency tracing)
+            speed: Playback speed for speech (1.5 = 50% faster, same pitch; not for MP3)
+            intro: Optional (sample_rate, PCM bytes) spoken right before the file, with no gap
+            start: Sample to start the file at (at the intro's rate if one is given)
+            on_end: Optional function called with None when the sound plays to the end, or with
+                the sample reached when it is stopped early (only known for streamed playback)
         """
         # First stop any playing sounds
         self.stop_all_audio()
@@ -106,54 +306,12 @@ class AudioManager:
             # Check file type and select appropriate player
             file_ext = os.path.splitext(file_path.lower())[1]
             
-            if file_ext == '.wav':
-                if not self.has_aplay:
-                    print("ERROR: No WAV player (aplay) available")
-                    return False
-                    
-                player_cmd = ["aplay", file_path]
-                
-            elif file_ext == '.mp3':
-                if not self.has_mpg123:
-                    print("ERROR: No MP3 player (mpg123) available")
-                    return False
-                    
-                player_cmd = ["mpg123", "-q", file_path]  # -q for quiet mode
-                
-            else:
-                print(f"ERROR: Unsupported file format: {file_ext}")
+            if not self._check_player(file_ext):
                 return False
                 
             print(f"Playing sound: {file_path} at volume {volume}%")
-            proc = subprocess.Popen(player_cmd, 
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE)
-            
-            # Set state flags
-            self.current_audio_pid = proc.pid
-            self.is_audio_playing.set()
-            
-            # Start a monitor thread to reset flags when playback completes
-            def monitor_playback():
-                try:
-                    proc.wait()  # Wait for process to complete
-                    print(f"Sound playback of {file_path} completed")
-                    self.is_audio_playing.clear()
-                    self.current_audio_pid = None
-                    
-                    # Reset playback mode when audio finishes
-                    self.in_playback_mode = False
-                    
-                    # Call the callback if provided
-                    if callback:
-                        callback()
-                        
-                except Exception as e:
-                    print(f"Error in monitor thread: {e}")
-            
-            monitor_thread = threading.Thread(target=monitor_playback, daemon=True)
-            monitor_thread.start()
-            
+            self._start_entry(file_path, callback=callback, on_start=on_start, speed=speed, intro=intro,
+                              start=start, on_end=on_end)
             return True
             
         except Exception as e:
@@ -175,57 +333,18 @@ class AudioManager:
         # Check file type and select appropriate player
         file_ext = os.path.splitext(file_path.lower())[1]
         
-        if file_ext == '.wav':
-            if not self.has_aplay:
-                print("ERROR: No WAV player (aplay) available")
-                return False
-                
-            player_cmd = ["aplay", file_path]
-            
-        elif file_ext == '.mp3':
-            if not self.has_mpg123:
-                print("ERROR: No MP3 player (mpg123) available")
-                return False
-                
-            player_cmd = ["mpg123", "-q", file_path]  # -q for quiet mode
-            
-        else:
-            print(f"ERROR: Unsupported file format: {file_ext}")
+        if not self._check_player(file_ext):
             return False
             
-        # Set up loop control
+        # Set up loop control; the worker restarts the player each time it ends
         self.loop_active.set()
-        
-        # Define the loop function
-        def sound_loop():
-            print(f"Starting sound loop for {file_path} at volume {volume}%")
-            while self.loop_active.is_set():
-                try:
-                    # Play the sound once
-                    proc = subprocess.Popen(player_cmd, 
-                                           stdout=subprocess.PIPE,
-                                           stderr=subprocess.PIPE)
-                    
-                    # Update state
-                    self.current_audio_pid = proc.pid
-                    self.is_audio_playing.set()
-                    
-                    # Wait for this play to complete
-                    proc.wait()
-                    
-                    # Small delay between loops
-                    if self.loop_active.is_set():
-                        time.sleep(0.1)
-                        
-                except Exception as e:
-                    print(f"Error in sound loop: {e}")
-                    time.sleep(0.5)  # Wait before retry
-            
-            print("Sound loop terminated")
-            
-        # Start the loop in a background thread
-        self.loop_thread = threading.Thread(target=sound_loop, daemon=True)
-        self.loop_thread.start()
+        print(f"Starting sound loop for {file_path} at volume {volume}%")
+        try:
+            self._start_entry(file_path, loop=True)
+        except Exception as e:
+            print(f"Error in sound loop: {e}")
+            self.loop_active.clear()
+            return False
         return True
 
     def stop_all_audio(self):
@@ -233,36 +352,39 @@ class AudioManager:
         # Clear loop flag if active
         self.loop_active.clear()
         
-        # Kill specific process if we know its PID
-        if self.current_audio_pid:
+        # Take the active sound away from the worker
+        with self.lock:
+            entry = self._active
+            self._active = None
+            self.is_audio_playing.clear()
+            self.current_audio_pid = None
+            self.current_proc = None
+
+        # Kill specific process if we know it
+        if entry:
+            proc = entry["proc"]
             try:
-                subprocess.run(["kill", str(self.current_audio_pid)], 
-                              stdout=subprocess.PIPE, 
-                              stderr=subprocess.PIPE)
-                print(f"Killed audio process {self.current_audio_pid}")
+                proc.terminate()
+                print(f"Killed audio process {proc.pid}")
             except Exception as e:
-                print(f"Error killing process {self.current_audio_pid}: {e}")
+                print(f"Error killing process {proc.pid}: {e}")
+            if entry["loop"]:
+                print("Sound loop terminated")
         
         # Kill all audio player instances to be thorough
         try:
-            # Kill WAV players
-            if self.has_aplay:
-                subprocess.run(["pkill", "-f", "aplay"], 
-                              stdout=subprocess.PIPE, 
-                              stderr=subprocess.PIPE)
-                
-            # Kill MP3 players
-            if self.has_mpg123:
-                subprocess.run(["pkill", "-f", "mpg123"], 
-                              stdout=subprocess.PIPE, 
-                              stderr=subprocess.PIPE)
-                
+            self.sink.kill_all()
         except Exception as e:
             print(f"Error killing audio processes: {e}")
-            
-        # Reset state
-        self.is_audio_playing.clear()
-        self.current_audio_pid = None
+
+        # Stopped sounds still report completion (play_sound_and_wait relies on it)
+        if entry:
+            try:
+                entry["proc"].wait(timeout=1)
+            except Exception:
+                pass
+            self._finished.put(entry)
+            self._wake()
         
         # Small delay to ensure audio is fully stopped
         time.sleep(0.1)
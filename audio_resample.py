@@ -0,0 +1,101 @@
+# audio_resample.py
+# Streaming polyphase resampler and channel mixer for 16-bit PCM (replaces the pydub/ffmpeg transcode).
+import wave
+from math import gcd
+
+import numpy as np
+
+# Defaults
+TAPS_PER_PHASE = 32  # Filter length per output sample (24 kHz -> 22.05 kHz: aliases ~45 dB down)
+KAISER_BETA = 8.0
+CUTOFF = 0.9         # Fraction of the lower Nyquist frequency kept (flat to ~8 kHz for 22.05 kHz output)
+
+
+def design_filter(up, down, taps_per_phase=TAPS_PER_PHASE, beta=KAISER_BETA, cutoff=CUTOFF):
+    """Kaiser-windowed sinc low-pass split into `up` phases; returns an (up, taps_per_phase) bank."""
+    length = up * taps_per_phase
+    fc = cutoff / max(up, down)
+    t = np.arange(length) - (length - 1) / 2.0
+    h = fc * np.sinc(fc * t) * np.kaiser(length, beta)
+    # Phase p holds taps h[p], h[p + up], ...; normalising each phase keeps DC gain at exactly 1
+    bank = h.reshape(taps_per_phase, up).T
+    return (bank / bank.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def to_mono(samples, channels):
+    """Average interleaved channels into one."""
+    if channels == 1:
+        return samples
+    return samples.reshape(-1, channels).mean(axis=1)
+
+
+class StreamResampler:
+    """Resamples interleaved little-endian int16 PCM arriving in arbitrary byte chunks to mono int16."""
+
+    def __init__(self, in_rate, out_rate, channels=1, taps_per_phase=TAPS_PER_PHASE):
+        divisor = gcd(in_rate, out_rate)
+        self.up, self.down = out_rate // divisor, in_rate // divisor
+        self.channels = channels
+        self.frame_bytes = 2 * channels
+        self.taps = taps_per_phase
+        self.bank = design_filter(self.up, self.down, taps_per_phase)
+        self.leftover = b""  # Partial frame from the previous chunk
+        # Input history: starts as taps-1 zeros so the first outputs have a full window
+        self.history = np.zeros(taps_per_phase - 1, dtype=np.float32)
+        self.history_start = -(taps_per_phase - 1)  # Absolute index of history[0]
+        self.next_out = 0  # Absolute index of the next output sample
+
+    def process(self, data):
+        """Resample another chunk; returns the int16 bytes that are ready."""
+        data = self.leftover + data
+        usable = len(data) - len(data) % self.frame_bytes
+        self.leftover = data[usable:]
+        if not usable:
+            return b""
+        samples = to_mono(np.frombuffer(data[:usable], dtype="<i2").astype(np.float32), self.channels)
+        return self._run(samples)
+
+    def flush(self):
+        """Emit the samples still held back by the filter delay."""
+        self.leftover = b""
+        return self._run(np.zeros(self.taps // 2, dtype=np.float32))
+
+    def _run(self, samples):
+        if self.up == self.down:
+            return np.clip(np.rint(samples), -32768, 32767).astype("<i2").tobytes()
+
+        buffer = np.concatenate((self.history, samples))
+        end = self.history_start + len(buffer)  # One past the last available input index
+
+        # Output m sits at upsampled position m*down: input index (m*down)//up, filter phase (m*down)%up
+        last = (end * self.up - 1) // self.down
+        positions = np.arange(self.next_out, last + 1, dtype=np.int64) * self.down
+        inputs, phases = positions // self.up, positions % self.up
+        window = (inputs - self.history_start)[:, np.newaxis] - np.arange(self.taps)[np.newaxis, :]
+        out = np.einsum("ij,ij->i", buffer[window], self.bank[phases])
+
+        self.next_out = last + 1
+        keep = self.taps - 1
+        self.history = buffer[-keep:]
+        self.history_start = end - keep
+        return np.clip(np.rint(out), -32768, 32767).astype("<i2").tobytes()
+
+
+def convert_wav(input_file, output_file, out_rate=22050, block_frames=16384):
+    """Rewrite a PCM WAV as 16-bit mono at `out_rate`, a block at a time."""
+    with wave.open(input_file, "rb") as source:
+        channels, width, rate = source.getnchannels(), source.getsampwidth(), source.getframerate()
+        if width != 2:
+            raise ValueError(f"Only 16-bit WAV input is supported (got {8 * width}-bit)")
+        resampler = StreamResampler(rate, out_rate, channels)
+        with wave.open(output_file, "wb") as target:
+            target.setnchannels(1)
+            target.setsampwidth(2)
+            target.setframerate(out_rate)
+            while True:
+                block = source.readframes(block_frames)
+                if not block:
+                    break
+                target.writeframesraw(resampler.process(block))
+            target.writeframesraw(resampler.flush())
+    return output_file
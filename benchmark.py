@@ -0,0 +1,282 @@
+# benchmark.py
+# End-to-end benchmark of the real capture -> describe -> speak pipeline (picture.py)
+# on simulated hardware against the local mock OpenAI server.
+#
+#   python benchmark.py --cycles 20 --latency 0.8 --token-rate 40 --json results.json
+#   python benchmark.py --cycles 20 --baseline results.json   # compare against a saved run
+import argparse
+import threading
+import subprocess
+import resource
+import socket
+import json
+import time
+import sys
+import os
+
+import mock_openai_server
+from latency_trace import percentile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="picture.py end-to-end benchmark")
+    parser.add_argument("--cycles", type=int, default=10, help="Measured capture cycles")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured warm-up cycles")
+    parser.add_argument("--port", type=int, default=8765, help="Mock server port")
+    parser.add_argument("--cycle-timeout", type=float, default=120.0, help="Seconds to wait for one cycle")
+    parser.add_argument("--wordiness", default=None,
+                        help="Wordiness level(s) to benchmark, e.g. 50 or 50,200,1000 (cycles rotate through them)")
+    parser.add_argument("--summary-first", action="store_true",
+                        help="Two-tier mode: speak a short summary before the full description")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results to this file")
+    parser.add_argument("--baseline", default=None, help="Compare against a previous --json result")
+    mock_openai_server.add_arguments(parser)
+    return parser.parse_args()
+
+
+def mock_server_command(args):
+    """Command line for the mock server subprocess (kept out of process so its CPU isn't counted)."""
+    command = [sys.executable, os.path.join(SCRIPT_DIR, "mock_openai_server.py"), "--port", str(args.port)]
+    for name in ("latency", "jitter", "token_rate", "words", "audio_rate", "chunk_size",
+                 "error_rate", "rate_limit_rate", "stall_rate", "stall_seconds", "seed"):
+        value = getattr(args, name)
+        if value is not None:
+            command += ["--" + name.replace("_", "-"), str(value)]
+    return command
+
+
+def wait_for_port(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 1) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+def run_benchmark(args):
+    # Simulated hardware and the mock API must be configured before picture.py is imported
+    os.environ["BCAM_BACKEND"] = "sim"
+    os.environ["BCAM_SIM_STDIN"] = "0"
+    os.environ["OPENAI_KEY"] = "benchmark"
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.chdir(SCRIPT_DIR)
+
+    import_start = time.monotonic()
+    import picture
+    import hardware
+    import serialHandle
+    import_seconds = time.monotonic() - import_start
+    startup_timings = picture.startup()
+
+    # Keep benchmark traces apart from the device's own trace file
+    picture.tracer.path = os.path.abspath("traces/benchmark.jsonl")
+    picture.tracer.sample_memory = True
+    picture.summary_first = args.summary_first
+    levels = [int(level) for level in args.wordiness.split(",")] if args.wordiness else [picture.wordiness]
+
+    finished = []
+    cycle_done = threading.Event()
+
+    def on_trace(trace):
+        finished.append(trace)
+        cycle_done.set()
+
+    picture.tracer.add_listener(on_trace)
+    serialHandle.start_serial_listener()
+    threading.Thread(target=picture.main_loop, daemon=True).start()
+
+    results = []
+    usage_start = None
+    wall_start = None
+    total = args.warmup + args.cycles
+
+    for index in range(total):
+        measured = index >= args.warmup
+        if measured and usage_start is None:
+            usage_start = resource.getrusage(resource.RUSAGE_SELF)
+            wall_start = time.monotonic()
+
+        # Wait until the device is idle (no response playing)
+        while picture.audio_manager.is_playing() or picture.audio_manager.in_playback_mode:
+            time.sleep(0.05)
+
+        picture.wordiness = levels[index % len(levels)]
+        cycle_done.clear()
+        finished.clear()
+        press_time = time.monotonic()
+        hardware.simulated_arduino.press("TAKE_PICTURE")
+
+        if not cycle_done.wait(args.cycle_timeout):
+            print(f"Cycle {index + 1}/{total}: timed out after {args.cycle_timeout}s")
+            results.append({"measured": measured, "status": "timeout", "wordiness": picture.wordiness})
+            picture.audio_manager.stop_all_audio()
+            continue
+
+        trace = finished[-1]
+        status = trace.meta.get("status", "unknown")
+        result = {
+            "measured": measured,
+            "status": status,
+            "wordiness": trace.meta.get("wordiness"),
+            "spans": dict(trace.spans),
+            "cpu": dict(trace.cpu),
+            "rss_kb": dict(trace.rss_kb),
+        }
+        if "first_audio" in trace.marks:
+            first_audio = trace.start + trace.marks["first_audio"] / 1000.0
+            result["press_to_first_audio"] = round((first_audio - press_time) * 1000, 1)
+        results.append(result)
+
+        label = "warm-up" if not measured else f"{index - args.warmup + 1}/{args.cycles}"
+        print(f"Cycle {label}: wordiness={result['wordiness']} {status} "
+              f"press_to_first_audio={result.get('press_to_first_audio')} ms")
+
+        # Cancel the response like a user pressing the shutter again
+        picture.audio_manager.stop_all_audio()
+        picture.audio_manager.in_playback_mode = False
+
+    wall_seconds = time.monotonic() - wall_start if wall_start else 0.0
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+    measured = [r for r in results if r["measured"]]
+    completed = [r for r in measured if "press_to_first_audio" in r]
+
+    # Per-stage latency, CPU and RSS growth
+    stages = {}
+    for result in completed:
+        previous_rss = None
+        for name, duration in result["spans"].items():
+            stage = stages.setdefault(name, {"latency": [], "cpu": [], "rss_delta_kb": []})
+            stage["latency"].append(duration)
+            if name in result["cpu"]:
+                stage["cpu"].append(result["cpu"][name])
+            rss = result["rss_kb"].get(name)
+            if rss is not None and previous_rss is not None:
+                stage["rss_delta_kb"].append(rss - previous_rss)
+            if rss is not None:
+                previous_rss = rss
+
+    cpu_seconds = 0.0
+    if usage_start:
+        cpu_seconds = (usage_end.ru_utime - usage_start.ru_utime) + (usage_end.ru_stime - usage_start.ru_stime)
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("json_path", "baseline")},
+        "import_seconds": round(import_seconds, 3),
+        "startup_seconds": {name: round(seconds, 3) for name, seconds in startup_timings.items()},
+        "cycles": len(measured),
+        "completed": len(completed),
+        "failed": {status: sum(1 for r in measured if r["status"] == status)
+                   for status in {r["status"] for r in measured if "press_to_first_audio" not in r}},
+        "wall_seconds": round(wall_seconds, 2),
+        "throughput_per_min": round(len(completed) / wall_seconds * 60, 2) if wall_seconds else None,
+        "cpu_seconds_per_cycle": round(cpu_seconds / len(measured), 3) if measured else None,
+        "peak_rss_kb": usage_end.ru_maxrss,
+        "threads_at_end": threading.active_count(),
+        "press_to_first_audio": summarize([r["press_to_first_audio"] for r in completed]),
+        "wordiness": {
+            str(level): {
+                "press_to_first_audio": summarize([r["press_to_first_audio"] for r in completed
+                                                   if r["wordiness"] == level]),
+                "vision_p50": percentile([r["spans"]["vision"] for r in completed
+                                          if r["wordiness"] == level and "vision" in r["spans"]], 50),
+                "tts_p50": percentile([r["spans"]["tts"] for r in completed
+                                       if r["wordiness"] == level and "tts" in r["spans"]], 50),
+            }
+            for level in levels
+        },
+        "stages": {
+            name: {
+                "latency": summarize(values["latency"]),
+                "cpu_mean_ms": round(sum(values["cpu"]) / len(values["cpu"]), 1) if values["cpu"] else None,
+                "rss_delta_mean_kb": round(sum(values["rss_delta_kb"]) / len(values["rss_delta_kb"]), 1)
+                if values["rss_delta_kb"] else None,
+            }
+            for name, values in stages.items()
+        },
+    }
+
+
+def print_report(report, baseline=None):
+    def delta(current, previous):
+        if current is None or previous is None:
+            return ""
+        change = current - previous
+        percent = f" ({change / previous * 100:+.0f}%)" if previous else ""
+        return f"  [{change:+.1f}{percent}]"
+
+    print("\n==== Benchmark results ====")
+    print(f"Cycles: {report['completed']}/{report['cycles']} completed, failed: {report['failed'] or 'none'}")
+    print(f"Throughput: {report['throughput_per_min']} cycles/min over {report['wall_seconds']} s")
+    print(f"CPU per cycle: {report['cpu_seconds_per_cycle']} s, peak RSS: {report['peak_rss_kb'] / 1024:.1f} MiB, "
+          f"threads at end: {report['threads_at_end']}, import: {report['import_seconds']} s")
+    print("Startup (s): " + ", ".join(f"{name}={seconds}" for name, seconds in report["startup_seconds"].items()))
+
+    p = report["press_to_first_audio"]
+    base = baseline["press_to_first_audio"] if baseline else {}
+    print("\nPress-to-first-audio (ms):")
+    for key in ("p50", "p95", "p99"):
+        print(f"  {key}: {p[key]}{delta(p[key], base.get(key))}")
+
+    print(f"\n{'wordiness':<10}{'p50':>10}{'p95':>10}{'vision':>10}{'tts':>10}  (ms)")
+    for level, stats in report.get("wordiness", {}).items():
+        p = stats["press_to_first_audio"]
+        line = f"{level:<10}{p['p50']!s:>10}{p['p95']!s:>10}{stats['vision_p50']!s:>10}{stats['tts_p50']!s:>10}"
+        previous = baseline.get("wordiness", {}).get(level) if baseline else None
+        if previous:
+            line += delta(p["p50"], previous["press_to_first_audio"]["p50"])
+        print(line)
+
+    print(f"\n{'stage':<18}{'p50':>10}{'p95':>10}{'p99':>10}{'cpu ms':>10}{'rss +KiB':>10}")
+    for name, stage in report["stages"].items():
+        latency = stage["latency"]
+        line = (f"{name:<18}{latency['p50']!s:>10}{latency['p95']!s:>10}{latency['p99']!s:>10}"
+                f"{stage['cpu_mean_ms']!s:>10}{stage['rss_delta_mean_kb']!s:>10}")
+        if baseline and name in baseline.get("stages", {}):
+            line += delta(latency["p50"], baseline["stages"][name]["latency"]["p50"])
+        print(line)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    server = subprocess.Popen(mock_server_command(args))
+    exit_code = 1
+    try:
+        if not wait_for_port(args.port):
+            print(f"Mock server did not start on port {args.port}")
+            raise SystemExit(1)
+
+        report = run_benchmark(args)
+
+        baseline = None
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        print_report(report, baseline)
+
+        if args.json_path:
+            with open(args.json_path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"\nResults written to {args.json_path}")
+        exit_code = 0
+    finally:
+        server.terminate()
+        server.wait(timeout=5)
+        sys.stdout.flush()
+        os._exit(exit_code)  # picture.py leaves daemon threads blocked on the pty and audio
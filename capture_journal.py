@@ -0,0 +1,215 @@
+# capture_journal.py
+import sqlite3
+import threading
+import json
+import time
+import os
+
+# One row per capture cycle (press -> description -> speech)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    original_path TEXT,
+    resized_path TEXT,
+    description TEXT,
+    audio_path TEXT,
+    wordiness INTEGER,
+    status TEXT NOT NULL DEFAULT 'pending',
+    timings TEXT,
+    completed_at REAL,
+    resume_sample INTEGER,
+    played_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_captures_created ON captures(created_at);
+CREATE INDEX IF NOT EXISTS idx_captures_audio ON captures(audio_path);
+CREATE INDEX IF NOT EXISTS idx_captures_status ON captures(status);
+"""
+
+# Columns added after the first release: name -> SQL type
+MIGRATIONS = {
+    "completed_at": "REAL",
+    "resume_sample": "INTEGER",  # Where history playback was left (samples at the playback rate)
+    "played_at": "REAL",
+}
+
+# Columns callers are allowed to update
+UPDATABLE_FIELDS = ("original_path", "resized_path", "description", "audio_path", "wordiness", "status", "timings",
+                    "completed_at", "resume_sample", "played_at")
+
+# Capture status values
+STATUS_PENDING = "pending"
+STATUS_COMPLETE = "complete"
+STATUS_ERROR = "error"
+STATUS_INTERRUPTED = "interrupted"
+STATUS_QUEUED = "queued"  # Network failed; waiting to be processed in the background
+
+# Captures whose audio is kept in the history (interrupted responses are stored too, just not played)
+HISTORY_STATUSES = (STATUS_COMPLETE, STATUS_INTERRUPTED)
+
+
+class CaptureJournal:
+    """Small SQLite (WAL) store linking each capture's image, text, audio and timings."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Autocommit mode; WAL keeps readers from blocking the writer
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self.conn.executescript(SCHEMA)
+        print(f"Capture journal opened: {db_path}")
+
+    def _migrate(self):
+        """Add columns missing from journals created by older versions."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(captures)")}
+        if not columns:
+            return  # New database; SCHEMA creates everything
+        for name, sql_type in MIGRATIONS.items():
+            if name not in columns:
+                self.conn.execute(f"ALTER TABLE captures ADD COLUMN {name} {sql_type}")
+
+    def start_capture(self, original_path, wordiness):
+        """Create a new capture row and return its id."""
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO captures (created_at, original_path, wordiness, status) VALUES (?, ?, ?, ?)",
+                (time.time(), original_path, wordiness, STATUS_PENDING)
+            )
+            return cursor.lastrowid
+
+    def update(self, capture_id, **fields):
+        """Update one or more columns of a capture row."""
+        if capture_id is None or not fields:
+            return False
+
+        for name in fields:
+            if name not in UPDATABLE_FIELDS:
+                raise ValueError(f"Unknown journal field: {name}")
+
+        if "timings" in fields and not isinstance(fields["timings"], str):
+            fields["timings"] = json.dumps(fields["timings"])
+
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self.lock:
+            self.conn.execute(
+                f"UPDATE captures SET {assignments} WHERE id = ?",
+                (*fields.values(), capture_id)
+            )
+        return True
+
+    def finish(self, capture_id, status, timings=None):
+        """Mark a capture as finished with its final status and stage timings."""
+        fields = {"status": status}
+        if timings is not None:
+            fields["timings"] = timings
+        if status == STATUS_COMPLETE:
+            fields["completed_at"] = time.time()
+        return self.update(capture_id, **fields)
+
+    def _row_to_dict(self, row):
+        entry = dict(row)
+        if entry.get("timings"):
+            try:
+                entry["timings"] = json.loads(entry["timings"])
+            except ValueError:
+                pass
+        return entry
+
+    def get(self, capture_id):
+        """Return a single capture as a dict, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM captures WHERE id = ?", (capture_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def recent(self, limit=10, status=None):
+        """Return the most recent captures (newest first)."""
+        query = "SELECT * FROM captures"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def recent_audio(self, limit=10):
+        """Return audio paths of history captures (most recently completed first) that still exist on disk.
+
+        Deferred captures sort by when their result arrived, so they show up at the top of the history.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT audio_path FROM captures WHERE status IN (?, ?) AND audio_path IS NOT NULL "
+                "ORDER BY COALESCE(completed_at, created_at) DESC, id DESC LIMIT ?",
+                (*HISTORY_STATUSES, limit)
+            ).fetchall()
+        return [row["audio_path"] for row in rows if os.path.exists(row["audio_path"])]
+
+    def queued(self, limit=10):
+        """Return queued captures, oldest first."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM captures WHERE status = ? ORDER BY created_at, id LIMIT ?",
+                (STATUS_QUEUED, limit)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def count_queued(self):
+        """Number of captures waiting in the queue."""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM captures WHERE status = ?", (STATUS_QUEUED,)).fetchone()[0]
+
+    def find_by_audio(self, audio_path):
+        """Return the capture that produced a given audio file, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM captures WHERE audio_path = ? ORDER BY id DESC LIMIT 1",
+                (audio_path,)
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def save_position(self, audio_path, sample):
+        """Remember where playback of a history entry stopped (0 once it was heard to the end)."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE captures SET resume_sample = ?, played_at = ? WHERE audio_path = ?",
+                (sample, time.time(), audio_path)
+            )
+
+    def resume_position(self, audio_path):
+        """Sample to resume a history entry from (0 if it was never left partway through)."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT resume_sample FROM captures WHERE audio_path = ? ORDER BY id DESC LIMIT 1",
+                (audio_path,)
+            ).fetchone()
+        return (row["resume_sample"] or 0) if row else 0
+
+    def last_interrupted(self):
+        """Audio path of the history entry most recently left partway through, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT audio_path FROM captures WHERE status IN (?, ?) AND resume_sample > 0 "
+                "ORDER BY played_at DESC LIMIT 1",
+                HISTORY_STATUSES
+            ).fetchone()
+        return row["audio_path"] if row else None
+
+    def close(self):
+        """Close the database connection."""
+        with self.lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+                print("Capture journal closed")
@@ -0,0 +1,130 @@
+# capture_queue.py
+import threading
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from capture_journal import STATUS_COMPLETE, STATUS_ERROR
+
+# Defaults
+DEFAULT_CONCURRENCY = 2      # Captures processed at once while draining
+DEFAULT_BATCH_SIZE = 4       # Captures fetched from the journal per batch
+DEFAULT_RETRY_INTERVAL = 30  # Seconds between connectivity probes while offline
+
+
+def tcp_probe(url, timeout=3.0):
+    """Cheap connectivity check: can we open a TCP connection to the API host?"""
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        with socket.create_connection((parsed.hostname, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class CaptureQueue:
+    """Drains captures the journal marked as queued once the network is back.
+
+    The journal is the durable queue: a capture whose vision or TTS call failed for
+    network reasons stays in the 'queued' state (with its resized image and, if it got
+    that far, its description) until a background batch completes it.
+    """
+
+    def __init__(self, journal, process, is_retryable, probe=None, on_complete=None,
+                 concurrency=DEFAULT_CONCURRENCY, batch_size=DEFAULT_BATCH_SIZE,
+                 retry_interval=DEFAULT_RETRY_INTERVAL):
+        self.journal = journal
+        self.process = process            # process(entry) -> audio path; raises on failure
+        self.is_retryable = is_retryable  # is_retryable(exception) -> keep it queued?
+        self.probe = probe                # probe() -> True when the API looks reachable
+        self.on_complete = on_complete    # on_complete(entry, audio_path) for announcements
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+
+        self.wake = threading.Event()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Start the drain thread (sleeps until notified or the retry interval passes)."""
+        if self.thread and self.thread.is_alive():
+            return False
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="capture-queue", daemon=True)
+        self.thread.start()
+        # Captures left queued by a previous run
+        self.wake.set()
+        return True
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+
+    def notify(self):
+        """Something changed (a capture was queued, or a live request succeeded)."""
+        self.wake.set()
+
+    def pending(self):
+        """Number of captures waiting in the queue."""
+        return self.journal.count_queued()
+
+    def _process_one(self, entry):
+        try:
+            audio_path = self.process(entry)
+        except Exception as e:
+            if self.is_retryable(e):
+                print(f"Deferred capture {entry['id']} still failing, keeping it queued: {e}")
+                return False
+            print(f"Deferred capture {entry['id']} failed permanently: {e}")
+            self.journal.finish(entry["id"], STATUS_ERROR)
+            return True
+
+        self.journal.update(entry["id"], audio_path=audio_path)
+        self.journal.finish(entry["id"], STATUS_COMPLETE)
+        print(f"Deferred capture {entry['id']} completed: {audio_path}")
+        if self.on_complete:
+            try:
+                self.on_complete(entry, audio_path)
+            except Exception as e:
+                print(f"Error announcing deferred capture: {e}")
+        return True
+
+    def drain(self):
+        """Process queued captures in bounded batches. Returns True if the queue emptied."""
+        while self.running:
+            entries = self.journal.queued(self.batch_size)
+            if not entries:
+                return True
+
+            if self.probe and not self.probe():
+                print(f"Network still unavailable, {self.pending()} capture(s) queued")
+                return False
+
+            print(f"Processing {len(entries)} deferred capture(s)")
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="capture-queue") as pool:
+                results = list(pool.map(self._process_one, entries))
+
+            if not all(results):
+                # Something is still failing; wait for the next retry
+                return False
+        return False
+
+    def _run(self):
+        while self.running:
+            self.wake.wait()
+            self.wake.clear()
+            if not self.running:
+                break
+
+            try:
+                emptied = self.drain()
+            except Exception as e:
+                print(f"Error draining capture queue: {e}")
+                emptied = False
+
+            if not emptied:
+                # Retry later unless notified sooner
+                self.wake.wait(self.retry_interval)
+                self.wake.set()
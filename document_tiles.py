@@ -0,0 +1,80 @@
+# document_tiles.py
+# Picks text-dense regions of a full-resolution frame so only those crops are sent to the vision model.
+import numpy as np
+
+# Defaults
+DEFAULT_TILE_SIZE = 1024    # Full-resolution pixels per tile side (the model reads ~768px short side at high detail)
+DEFAULT_MAX_TILES = 4
+DEFAULT_STRIDE = 4          # Analyse every 4th pixel; text strokes still show up as edges
+DEFAULT_CELL = 16           # Density cell size in analysed pixels (64 full-resolution pixels)
+DEFAULT_EDGE_THRESHOLD = 40 # Gradient step that counts as an edge (0-255 scale)
+DEFAULT_MIN_DENSITY = 0.03  # Mean edge density a tile needs to be worth sending
+
+
+def edge_density_map(frame, stride=DEFAULT_STRIDE, cell=DEFAULT_CELL, threshold=DEFAULT_EDGE_THRESHOLD):
+    """Fraction of edge pixels per cell of a subsampled luma image.
+
+    Returns a (rows, cols) float32 array; cell (r, c) covers
+    frame[r*cell*stride:(r+1)*cell*stride, c*cell*stride:(c+1)*cell*stride].
+    """
+    # Green is a good, free stand-in for luma
+    luma = frame[::stride, ::stride, 1] if frame.ndim == 3 else frame[::stride, ::stride]
+    luma = luma.astype(np.int16)
+
+    edges = np.zeros(luma.shape, dtype=bool)
+    edges[:, 1:] |= np.abs(np.diff(luma, axis=1)) > threshold
+    edges[1:, :] |= np.abs(np.diff(luma, axis=0)) > threshold
+
+    rows, cols = edges.shape[0] // cell, edges.shape[1] // cell
+    edges = edges[:rows * cell, :cols * cell]
+    return edges.reshape(rows, cell, cols, cell).mean(axis=(1, 3), dtype=np.float32)
+
+
+def select_tiles(frame, tile_size=DEFAULT_TILE_SIZE, max_tiles=DEFAULT_MAX_TILES, stride=DEFAULT_STRIDE,
+                 cell=DEFAULT_CELL, min_density=DEFAULT_MIN_DENSITY):
+    """Choose up to `max_tiles` non-overlapping, text-dense boxes (x, y, w, h) in reading order.
+
+    The densest region is always returned (unless the frame is completely flat).
+    """
+    height, width = frame.shape[:2]
+    density = edge_density_map(frame, stride, cell)
+    cell_px = stride * cell
+
+    # Tile size in cells (never larger than the frame)
+    span_r = max(1, min(density.shape[0], min(tile_size, height) // cell_px))
+    span_c = max(1, min(density.shape[1], min(tile_size, width) // cell_px))
+
+    boxes = []
+    available = density.copy()
+    for _ in range(max_tiles):
+        # Summed-area table gives every window's total in one pass
+        table = np.zeros((available.shape[0] + 1, available.shape[1] + 1), dtype=np.float64)
+        table[1:, 1:] = available.cumsum(axis=0).cumsum(axis=1)
+        sums = (table[span_r:, span_c:] - table[:-span_r, span_c:]
+                - table[span_r:, :-span_c] + table[:-span_r, :-span_c])
+
+        r, c = np.unravel_index(np.argmax(sums), sums.shape)
+        # The densest window is always sent; further tiles must look like text
+        if sums[r, c] <= 0 or (boxes and sums[r, c] / (span_r * span_c) < min_density):
+            break
+
+        # Centre the tile on the edges inside the window (argmax favours the top-left of a plateau)
+        window = available[r:r + span_r, c:c + span_c]
+        total = window.sum()
+        center_y = (r + (window.sum(axis=1) * np.arange(span_r)).sum() / total + 0.5) * cell_px
+        center_x = (c + (window.sum(axis=0) * np.arange(span_c)).sum() / total + 0.5) * cell_px
+        tile_w, tile_h = min(span_c * cell_px, width), min(span_r * cell_px, height)
+        x = int(min(max(0, center_x - tile_w / 2), width - tile_w))
+        y = int(min(max(0, center_y - tile_h / 2), height - tile_h))
+        boxes.append((x, y, tile_w, tile_h))
+
+        # Don't pick overlapping regions again
+        available[r:r + span_r, c:c + span_c] = 0
+
+    # Reading order: top to bottom, then left to right (rows of tiles within half a tile)
+    return sorted(boxes, key=lambda box: (box[1] // max(1, span_r * cell_px // 2), box[0]))
+
+
+def crop_tiles(frame, boxes):
+    """Crop the selected boxes out of the frame."""
+    return [frame[y:y + h, x:x + w] for x, y, w, h in boxes]
@@ -0,0 +1,70 @@
+# exposure.py
+# Auto-exposure convergence gating and a too-dark check, so unusable frames never reach the API.
+import time
+
+import numpy as np
+
+# Defaults
+DEFAULT_TIMEOUT = 0.5     # Longest wait for a settled frame (seconds); the latest frame is used after that
+DEFAULT_TOLERANCE = 0.05  # Relative frame-to-frame change that still counts as settled
+SETTLE_KEYS = ("ExposureTime", "AnalogueGain", "Lux")
+HISTOGRAM_WIDTH = 480     # Columns sampled for the luma histogram (full-resolution frames are subsampled)
+
+
+def exposure_settled(previous, metadata, tolerance=DEFAULT_TOLERANCE):
+    """True once AE reports it is locked, or exposure, gain and lux stopped changing between frames."""
+    if metadata.get("AeLocked"):
+        return True
+    if previous is None:
+        return False
+    for key in SETTLE_KEYS:
+        old, new = previous.get(key), metadata.get(key)
+        if old is None or new is None:
+            continue
+        if abs(new - old) > tolerance * max(abs(old), 1e-6):
+            return False
+    return True
+
+
+def wait_for_exposure(camera, timeout=DEFAULT_TIMEOUT, tolerance=DEFAULT_TOLERANCE, keep_frame=True):
+    """Read frames from the running stream until exposure settles or `timeout` passes.
+
+    Returns (frame, settled, frames_read). `frame` is the main-stream array of the last frame read,
+    or None with keep_frame=False (e.g. before a mode switch, where only the AE state matters).
+    """
+    deadline = time.monotonic() + timeout
+    previous = None
+    frames = 0
+    while True:
+        request = camera.capture_request()
+        try:
+            metadata = request.get_metadata()
+            frames += 1
+            settled = exposure_settled(previous, metadata, tolerance)
+            if settled or time.monotonic() >= deadline:
+                frame = request.make_array("main") if keep_frame else None
+                return frame, settled, frames
+        finally:
+            request.release()
+        previous = metadata
+
+
+def luma_percentile(frame, pct, step=None):
+    """Luma (0-255) that `pct` percent of the (subsampled) pixels are at or below, from a histogram."""
+    if step is None:
+        step = max(1, frame.shape[1] // HISTOGRAM_WIDTH)
+    pixels = frame[::step, ::step]
+    if pixels.ndim == 3:
+        # Integer BT.601 weights; uint16 holds 255 * 256
+        pixels = pixels.astype(np.uint16)
+        luma = (pixels[..., 0] * 77 + pixels[..., 1] * 150 + pixels[..., 2] * 29) >> 8
+    else:
+        luma = pixels
+    histogram = np.bincount(luma.ravel(), minlength=256)
+    cumulative = np.cumsum(histogram)
+    return int(np.searchsorted(cumulative, pct / 100 * cumulative[-1]))
+
+
+def too_dark(frame, level, pct=95):
+    """True if even the brighter pixels (the `pct` percentile) are below `level`."""
+    return level > 0 and luma_percentile(frame, pct) < level
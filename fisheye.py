@@ -0,0 +1,99 @@
+# fisheye.py
+# Optional fisheye -> rectilinear correction using a remap table built once per resolution.
+import threading
+import math
+import os
+
+import numpy as np
+
+# Lens model (equidistant fisheye: r = f * theta)
+FISHEYE_FOV_DEG = float(os.environ.get("BCAM_FISHEYE_FOV", "160"))  # Horizontal field of view of the lens
+OUTPUT_FOV_DEG = float(os.environ.get("BCAM_RECTIFIED_FOV", "120"))  # Horizontal field of view after correction
+CACHE_DIR = os.path.abspath("cache/remap")
+TABLE_VERSION = 1  # Bump when the mapping changes so old cache files are ignored
+BUILD_ROWS = 256   # Rows computed per block (keeps temporaries small at full sensor resolution)
+
+
+def build_remap(width, height, fov_deg=FISHEYE_FOV_DEG, out_fov_deg=OUTPUT_FOV_DEG):
+    """Flat source-pixel index for every output pixel, as an int32 (height, width) array."""
+    cx, cy = (width - 1) / 2.0, (height - 1) / 2.0
+    f_fisheye = (width / 2.0) / math.radians(fov_deg / 2.0)
+    f_output = (width / 2.0) / math.tan(math.radians(out_fov_deg / 2.0))
+
+    table = np.empty((height, width), dtype=np.int32)
+    dx = (np.arange(width, dtype=np.float32) - cx)[np.newaxis, :]
+    for row in range(0, height, BUILD_ROWS):
+        dy = (np.arange(row, min(row + BUILD_ROWS, height), dtype=np.float32) - cy)[:, np.newaxis]
+        r_out = np.hypot(dx, dy)
+        theta = np.arctan(r_out / f_output)
+        # Radial scale from output to source (at the centre: the limit f_fisheye / f_output)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scale = np.where(r_out > 0, f_fisheye * theta / r_out, f_fisheye / f_output)
+        src_x = np.clip(np.rint(cx + dx * scale), 0, width - 1).astype(np.int32)
+        src_y = np.clip(np.rint(cy + dy * scale), 0, height - 1).astype(np.int32)
+        table[row:row + dy.shape[0]] = src_y * width + src_x
+    return table
+
+
+class FisheyeRectifier:
+    """Applies cached remap tables (memory-mapped .npy files) to camera frames."""
+
+    def __init__(self, fov_deg=FISHEYE_FOV_DEG, out_fov_deg=OUTPUT_FOV_DEG, cache_dir=CACHE_DIR):
+        self.fov_deg = fov_deg
+        self.out_fov_deg = out_fov_deg
+        self.cache_dir = cache_dir
+        self.tables = {}  # (width, height) -> remap table
+        self.lock = threading.Lock()
+
+    def cache_path(self, width, height):
+        return os.path.join(self.cache_dir,
+                            f"remap_v{TABLE_VERSION}_{width}x{height}_{self.fov_deg:g}_{self.out_fov_deg:g}.npy")
+
+    def table(self, width, height):
+        """Remap table for a resolution: from memory, else the disk cache, else built and cached."""
+        key = (width, height)
+        with self.lock:
+            if key in self.tables:
+                return self.tables[key]
+
+            path = self.cache_path(width, height)
+            try:
+                table = np.load(path, mmap_mode="r")
+                if table.shape != (height, width):
+                    raise ValueError(f"unexpected shape {table.shape}")
+            except (OSError, ValueError) as e:
+                if os.path.exists(path):
+                    print(f"Rebuilding remap table {path}: {e}")
+                print(f"Building fisheye remap table for {width}x{height}...")
+                table = build_remap(width, height, self.fov_deg, self.out_fov_deg)
+                try:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    temp_path = f"{path}.{os.getpid()}.tmp.npy"
+                    np.save(temp_path, table)
+                    os.replace(temp_path, path)
+                    table = np.load(path, mmap_mode="r")
+                except OSError as e:
+                    print(f"Could not cache remap table: {e}")
+
+            self.tables[key] = table
+            return table
+
+    def prepare(self, width, height):
+        """Load or build the table ahead of the first frame at this size."""
+        self.table(width, height)
+
+    def apply(self, frame, box=None, step=1):
+        """Rectified copy of an (H, W) or (H, W, C) frame (one gather, no interpolation).
+
+        `box` (x, y, w, h) and `step` select a region / subsampling of the rectified image,
+        so crops and previews only gather the pixels they need.
+        """
+        height, width = frame.shape[:2]
+        table = self.table(width, height)
+        if box is not None:
+            x, y, w, h = box
+            table = table[y:y + h, x:x + w]
+        if step > 1:
+            table = table[::step, ::step]
+        pixels = frame.reshape(height * width, -1)
+        return np.take(pixels, table, axis=0).reshape(table.shape + frame.shape[2:])
@@ -0,0 +1,662 @@
+# hardware.py
+# Pluggable hardware backends so the pipeline can run off a Pi.
+#
+#   BCAM_BACKEND=pi   (default) Picamera2, /dev/ttyS0, RPi.GPIO, aplay/mpg123, amixer
+#   BCAM_BACKEND=sim  JPEG replay camera, pty serial, simulated GPIO, null/wave-file audio sink
+import threading
+import subprocess
+import itertools
+import shutil
+import select
+import wave
+import time
+import os
+import io
+
+# Compressed history files are decoded in-process and streamed to the player
+import audio_codec
+
+# The simulated Arduino speaks the framed serial protocol too
+import serial_frames as frames
+
+BACKEND = os.environ.get("BCAM_BACKEND", "pi").lower()
+SIMULATED = BACKEND == "sim"
+
+# Simulation settings
+SIM_IMAGE_DIR = os.environ.get("BCAM_SIM_IMAGES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "resized"))
+SIM_AUDIO_SINK = os.environ.get("BCAM_SIM_AUDIO", "null")  # "null" or a directory to write played files into
+SIM_AUDIO_REALTIME = os.environ.get("BCAM_SIM_AUDIO_REALTIME", "1") != "0"  # Block for the real duration
+SIM_SENSOR_SIZE = (4608, 2592)  # Camera Module 3 full resolution
+SIM_FRAME_INTERVAL = 1 / 30     # Seconds between frames of the running stream
+SIM_AE_SETTLE_FRAMES = 4        # Frames auto exposure takes to settle after start / set_controls
+
+
+###################################
+# Camera
+###################################
+class SimulatedRequest:
+    """Stand-in for a Picamera2 CompletedRequest (one frame plus its metadata)."""
+
+    def __init__(self, camera, metadata):
+        self.camera = camera
+        self.metadata = metadata
+
+    def get_metadata(self):
+        return dict(self.metadata)
+
+    def make_array(self, name="main"):
+        return self.camera.capture_array(name)
+
+    def release(self):
+        pass
+
+
+class SimulatedCamera:
+    """Picamera2 stand-in that replays JPEGs from a directory as camera frames."""
+
+    def __init__(self, image_dir=SIM_IMAGE_DIR):
+        self.image_dir = image_dir
+        self.images = sorted(
+            os.path.join(image_dir, f) for f in os.listdir(image_dir)
+            if f.lower().endswith((".jpg", ".jpeg", ".png"))
+        ) if os.path.isdir(image_dir) else []
+        if not self.images:
+            raise RuntimeError(f"No images to replay in {image_dir}")
+
+        self._next_image = itertools.cycle(self.images)
+        self.sensor_modes = [
+            {"size": (1536, 864), "format": "SRGGB10_CSI2P", "fps": 120.0},
+            {"size": (2304, 1296), "format": "SRGGB10_CSI2P", "fps": 56.0},
+            {"size": SIM_SENSOR_SIZE, "format": "SRGGB10_CSI2P", "fps": 14.0},
+        ]
+        self.camera_config = None
+        self.controls = {}
+        self.started = False
+        self.frames_captured = 0
+        self.ae_frames = 0  # Frames since auto exposure (re)started
+        print(f"Simulated camera replaying {len(self.images)} images from {image_dir}")
+
+    def create_still_configuration(self, main=None, lores=None, buffer_count=1, display=None, **kwargs):
+        return {"main": dict(main or {"size": SIM_SENSOR_SIZE}), "lores": lores,
+                "buffer_count": buffer_count, "display": display, **kwargs}
+
+    def create_preview_configuration(self, main=None, lores=None, buffer_count=4, display=None, **kwargs):
+        return self.create_still_configuration(main, lores, buffer_count, display, **kwargs)
+
+    def create_video_configuration(self, main=None, lores=None, buffer_count=6, display=None, **kwargs):
+        return self.create_still_configuration(main, lores, buffer_count, display, **kwargs)
+
+    def set_controls(self, controls):
+        self.controls.update(controls)
+        self.ae_frames = 0
+
+    def configure(self, config):
+        self.camera_config = config
+
+    def start(self):
+        self.started = True
+        self.ae_frames = 0
+
+    def stop(self):
+        self.started = False
+
+    def close(self):
+        self.started = False
+
+    def _main_size(self, name="main"):
+        config = self.camera_config or {}
+        stream = config.get(name) or config.get("main") or {}
+        return tuple(stream.get("size", SIM_SENSOR_SIZE))
+
+    def capture_array(self, name="main"):
+        """Return the next replayed image as an RGB array at the configured stream size."""
+        from PIL import Image
+        import numpy as np
+
+        with Image.open(next(self._next_image)) as image:
+            frame = image.convert("RGB").resize(self._main_size(name), Image.BILINEAR)
+        self.frames_captured += 1
+        return np.asarray(frame)
+
+    def switch_mode_and_capture_array(self, config, name="main"):
+        """Capture one frame in another configuration, then switch back."""
+        previous = self.camera_config
+        self.camera_config = config
+        try:
+            return self.capture_array(name)
+        finally:
+            self.camera_config = previous
+
+    def _next_metadata(self):
+        """Exposure metadata that settles over the first few frames, like libcamera's AE."""
+        error = 0.5 ** self.ae_frames if self.ae_frames < SIM_AE_SETTLE_FRAMES else 0.0
+        self.ae_frames += 1
+        return {"ExposureTime": int(10000 * (1 + error)), "AnalogueGain": 1.0 + error,
+                "Lux": 400.0 / (1 + error), "AeLocked": error == 0.0,
+                "SensorTimestamp": time.monotonic_ns()}
+
+    def capture_metadata(self):
+        time.sleep(SIM_FRAME_INTERVAL)
+        return self._next_metadata()
+
+    def capture_request(self):
+        """Wait for the next frame of the running stream."""
+        time.sleep(SIM_FRAME_INTERVAL)
+        return SimulatedRequest(self, self._next_metadata())
+
+
+def create_camera():
+    """Return a Picamera2 instance (pi) or a SimulatedCamera (sim)."""
+    if SIMULATED:
+        return SimulatedCamera()
+    from picamera2 import Picamera2
+    return Picamera2()
+
+
+###################################
+# Serial
+###################################
+class SimulatedArduino:
+    """Firmware stand-in on the master side of a pty; the app opens the slave path with pyserial.
+
+    Starts on text lines like the firmware; after a FRAMED: request it answers FRAMED_OK and
+    switches to frames (acks commands, timestamps presses with its own millis()).
+    """
+
+    def __init__(self, echo_stdin=None):
+        self.master_fd, slave_fd = os.openpty()
+        self.port = os.ttyname(slave_fd)
+        self._slave_fd = slave_fd  # Keep the slave open so reads on the master never see EOF
+        self.received = []  # Commands written by the host
+        self.lock = threading.Lock()
+        self.running = True
+        self.started = time.monotonic()
+        self.framed = False
+        self.tx_seq = 0
+        self.last_rx_seq = None
+
+        self.reader_thread = threading.Thread(target=self._read_loop, daemon=True)
+        self.reader_thread.start()
+
+        # Typing commands (TAKE_PICTURE, PLAY_BACK, NEXT, ...) on a dev box sends them as button presses
+        if echo_stdin is None:
+            echo_stdin = os.environ.get("BCAM_SIM_STDIN", "1") != "0" and os.isatty(0)
+        if echo_stdin:
+            threading.Thread(target=self._stdin_loop, daemon=True).start()
+        print(f"Simulated Arduino on {self.port}")
+
+    def _millis(self):
+        return int((time.monotonic() - self.started) * 1000)
+
+    def press(self, command):
+        """Send a button command to the host as the Arduino would."""
+        ident = frames.EVENT_IDS.get(command)
+        if self.framed and ident is not None:
+            with self.lock:
+                self.tx_seq = (self.tx_seq + 1) & 0xFF
+                seq = self.tx_seq
+            os.write(self.master_fd, frames.encode(frames.EVENT, seq, ident, ms=self._millis()))
+        else:
+            os.write(self.master_fd, (command + "\r\n").encode("utf-8"))
+
+    def _handle_text(self, command):
+        if command.startswith(frames.NEGOTIATE):
+            os.write(self.master_fd, f"{frames.NEGOTIATE_OK}{command[len(frames.NEGOTIATE):]}\r\n".encode("utf-8"))
+            self.framed = True
+            self.last_rx_seq = None
+            return
+        with self.lock:
+            self.received.append(command)
+
+    def _handle_frame(self, frame):
+        if frame.type not in (frames.COMMAND, frames.HELLO):
+            return
+        os.write(self.master_fd, frames.encode(frames.ACK, frame.seq, frame.ident, ms=self._millis()))
+        if frame.type == frames.COMMAND and frame.seq != self.last_rx_seq:
+            self.last_rx_seq = frame.seq
+            with self.lock:
+                self.received.append(frames.command_text(frame.ident, frame.arg))
+
+    def _read_loop(self):
+        buffer = b""
+        parser = frames.FrameParser()
+        while self.running:
+            ready, _, _ = select.select([self.master_fd], [], [], 0.5)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.master_fd, 1024)
+            except OSError:
+                break
+            if self.framed:
+                for frame in parser.feed(data):
+                    self._handle_frame(frame)
+                continue
+            buffer += data
+            while b"\n" in buffer and not self.framed:
+                line, buffer = buffer.split(b"\n", 1)
+                command = line.decode("utf-8", errors="ignore").strip()
+                if command:
+                    self._handle_text(command)
+            if self.framed and buffer:
+                for frame in parser.feed(buffer):
+                    self._handle_frame(frame)
+                buffer = b""
+
+    def _stdin_loop(self):
+        print("Simulated Arduino: type a command (e.g. TAKE_PICTURE) and press Enter")
+        while self.running:
+            line = input_line()
+            if line is None:
+                break
+            if line.strip():
+                self.press(line.strip().upper())
+
+    def close(self):
+        self.running = False
+        for fd in (self.master_fd, self._slave_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def input_line():
+    """Read one line from stdin (None on EOF)."""
+    try:
+        return input()
+    except EOFError:
+        return None
+
+
+# The simulated firmware (sim backend only)
+simulated_arduino = None
+
+
+def open_serial(port, baudrate, timeout=1):
+    """Open the Arduino serial link (real port on the Pi, pty in simulation)."""
+    global simulated_arduino
+    import serial
+
+    if SIMULATED:
+        if simulated_arduino is None:
+            simulated_arduino = SimulatedArduino()
+        return serial.Serial(simulated_arduino.port, baudrate, timeout=timeout)
+    return serial.Serial(port, baudrate, timeout=timeout)
+
+
+###################################
+# GPIO
+###################################
+class SimulatedGPIO:
+    """Subset of the RPi.GPIO API backed by an in-memory pin table."""
+
+    BCM = 11
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    HIGH = 1
+    LOW = 0
+    PUD_UP = 22
+    PUD_DOWN = 21
+    PUD_OFF = 20
+
+    def __init__(self):
+        self.mode = None
+        self.pins = {}  # pin -> level
+        self.lock = threading.Lock()
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=PUD_OFF, initial=None):
+        with self.lock:
+            if initial is not None:
+                self.pins[pin] = initial
+            else:
+                self.pins.setdefault(pin, self.HIGH if pull_up_down == self.PUD_UP else self.LOW)
+
+    def input(self, pin):
+        with self.lock:
+            return self.pins.get(pin, self.LOW)
+
+    def output(self, pin, value):
+        with self.lock:
+            self.pins[pin] = value
+
+    def set_input(self, pin, value):
+        """Drive an input pin from a test or benchmark."""
+        with self.lock:
+            self.pins[pin] = value
+
+    def cleanup(self, pin=None):
+        with self.lock:
+            if pin is None:
+                self.pins.clear()
+            else:
+                self.pins.pop(pin, None)
+
+
+def get_gpio():
+    """Return the RPi.GPIO module (pi) or a SimulatedGPIO (sim)."""
+    if SIMULATED:
+        return SimulatedGPIO()
+    import RPi.GPIO
+    return RPi.GPIO
+
+
+###################################
+# Audio
+###################################
+def command_exists(cmd):
+    """Check if a command exists on the system."""
+    return shutil.which(cmd) is not None
+
+
+def set_system_volume(volume):
+    """Set the ALSA SoftMaster volume (no-op in simulation)."""
+    if SIMULATED:
+        return True
+    subprocess.run(
+        ["amixer", "sset", "SoftMaster", f"{volume}%"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    return True
+
+
+def audio_duration(file_path):
+    """Duration of a WAV or compressed history file (or an estimate for MP3) in seconds."""
+    if file_path.lower().endswith(".wav"):
+        try:
+            with wave.open(file_path, "rb") as wf:
+                return wf.getnframes() / float(wf.getframerate())
+        except (wave.Error, EOFError, OSError):
+            return 0.0
+    if audio_codec.is_compressed(file_path):
+        return audio_codec.duration(file_path)
+    # Assume ~128 kbps for MP3
+    return os.path.getsize(file_path) * 8 / 128000.0
+
+
+class PcmFeed:
+    """PCM chunks on their way into a player's stdin.
+
+    The audio worker calls write() whenever the pipe is writable (non-blocking, so a full pipe
+    never stalls it) and close() once the playback is over; no thread per playback.
+    """
+
+    def __init__(self, proc, chunks):
+        self.proc = proc
+        self.chunks = chunks
+        self.fd = proc.stdin.fileno()
+        os.set_blocking(self.fd, False)
+        self.pending = memoryview(b"")
+        self.done = False
+
+    def write(self):
+        """Write as much as the pipe takes; returns False once there is nothing left to write."""
+        try:
+            while True:
+                if not self.pending:
+                    chunk = next(self.chunks, None)
+                    if chunk is None:
+                        break  # All written; closing stdin lets the player drain and exit
+                    self.pending = memoryview(chunk)
+                    continue
+                written = os.write(self.fd, self.pending)
+                self.pending = self.pending[written:]
+        except BlockingIOError:
+            return True
+        except (BrokenPipeError, OSError, ValueError):
+            pass  # Player was stopped
+        except Exception as e:
+            print(f"Error decoding audio for playback: {e}")
+        self.close()
+        return False
+
+    def close(self):
+        if self.done:
+            return
+        self.done = True
+        self.chunks.close()
+        try:
+            self.proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+
+class StreamPosition:
+    """Sample of the file (intro not counted) that a streamed playback has handed to the player."""
+
+    def __init__(self, start=0):
+        self.samples = start
+
+
+def _counted(chunks, position):
+    try:
+        for chunk in chunks:
+            yield chunk
+            position.samples += len(chunk) // 2
+    finally:
+        chunks.close()
+
+
+def _prepend(first, chunks):
+    yield first
+    yield from chunks
+
+
+def open_stream(file_path, speed=1.0, intro=None, start=0):
+    """PCM stream (rate, chunks, position) for a WAV/Opus/FLAC file, or None if the player can take the file as is.
+
+    `speed` != 1 time-stretches it; `intro` is (rate, pcm bytes) played first with no gap
+    (the file is decoded at that rate); `start` is the sample to begin at.
+    """
+    file_ext = os.path.splitext(file_path.lower())[1]
+    if file_ext != ".wav" and file_ext not in audio_codec.COMPRESSED_EXTENSIONS:
+        return None
+    if file_ext == ".wav" and speed == 1.0 and not intro and not start:
+        return None
+    rate, chunks = audio_codec.open_pcm(file_path, intro[0] if intro else None, start)
+    position = StreamPosition(start)
+    chunks = _counted(chunks, position)
+    if intro:
+        chunks = _prepend(intro[1], chunks)
+    from time_stretch import stretch_chunks  # Numpy; kept off the boot path
+    return rate, stretch_chunks(chunks, rate, speed), position
+
+
+class ProcessAudioSink:
+    """Plays files through aplay (WAV, and decoded Opus/FLAC on stdin) and mpg123 (MP3) subprocesses."""
+
+    def __init__(self):
+        self.has_aplay = command_exists("aplay")
+        self.has_mpg123 = command_exists("mpg123")
+
+    def can_play(self, file_ext):
+        if file_ext == ".wav" or file_ext in audio_codec.COMPRESSED_EXTENSIONS:
+            return self.has_aplay
+        if file_ext == ".mp3":
+            return self.has_mpg123
+        return False
+
+    def start_pcm(self, chunks, rate):
+        """Play 16-bit mono PCM from an iterator by piping it into aplay.
+
+        The chunks are written by whoever services the player (AudioManager's worker) through
+        `proc.pcm_feed`.
+        """
+        proc = subprocess.Popen(
+            ["aplay", "-t", "raw", "-f", "S16_LE", "-c", "1", "-r", str(rate)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        proc.pcm_feed = PcmFeed(proc, chunks)
+        return proc
+
+    def start(self, file_path, speed=1.0, intro=None, start=0):
+        """Start playing a file (see open_stream for `speed`, `intro` and `start`; none apply to MP3).
+
+        Streamed playbacks carry their StreamPosition as `stream_position`.
+        """
+        stream = open_stream(file_path, speed, intro, start)
+        if stream:
+            rate, chunks, position = stream
+            proc = self.start_pcm(chunks, rate)
+            proc.stream_position = position
+            return proc
+        if file_path.lower().endswith(".wav"):
+            player_cmd = ["aplay", file_path]
+        else:
+            player_cmd = ["mpg123", "-q", file_path]  # -q for quiet mode
+        return subprocess.Popen(player_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def kill_all(self):
+        """Kill any stray player processes."""
+        if self.has_aplay:
+            subprocess.run(["pkill", "-f", "aplay"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if self.has_mpg123:
+            subprocess.run(["pkill", "-f", "mpg123"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+class SimulatedPlayback:
+    """Popen-like handle for a simulated playback that lasts as long as the audio."""
+
+    _pids = itertools.count(100000)
+
+    def __init__(self, file_path, realtime=True):
+        self.pid = next(self._pids)
+        self.args = [file_path]
+        self.returncode = None
+        self.stdout = io.BytesIO()
+        self.stderr = io.BytesIO(f"Playing WAVE '{file_path}'\n".encode("utf-8"))
+        self._done = threading.Event()
+        duration = audio_duration(file_path) if realtime else 0.0
+        self._timer = threading.Timer(duration, self._finish, args=(0,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _finish(self, returncode):
+        if self.returncode is None:
+            self.returncode = returncode
+        self._done.set()
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def terminate(self):
+        self._timer.cancel()
+        self._finish(-15)
+
+    kill = terminate
+
+
+class SimulatedStreamPlayback(SimulatedPlayback):
+    """Simulated playback of a PCM stream: consumes the chunks at the rate a player would."""
+
+    def __init__(self, chunks, rate, label, realtime=True):
+        self.pid = next(self._pids)
+        self.args = [label]
+        self.returncode = None
+        self.stdout = io.BytesIO()
+        self.stderr = io.BytesIO(f"Playing raw data '{label}'\n".encode("utf-8"))
+        self._done = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._consume, args=(chunks, rate, realtime), daemon=True)
+        self._thread.start()
+
+    def _consume(self, chunks, rate, realtime):
+        try:
+            for chunk in chunks:
+                if self._stopped.wait(len(chunk) / (2.0 * rate) if realtime else 0):
+                    break
+        except Exception as e:
+            print(f"Error decoding audio for playback: {e}")
+        finally:
+            chunks.close()
+        self._finish(0)
+
+    def terminate(self):
+        self._stopped.set()
+        self._finish(-15)
+
+    kill = terminate
+
+
+class NullAudioSink:
+    """Discards audio but keeps real playback timing."""
+
+    has_aplay = True
+    has_mpg123 = True
+
+    def __init__(self, realtime=SIM_AUDIO_REALTIME):
+        self.realtime = realtime
+        self.active = []
+        self.lock = threading.Lock()
+        self.played = []  # Paths played, in order
+
+    def can_play(self, file_ext):
+        return file_ext in (".wav", ".mp3") + audio_codec.COMPRESSED_EXTENSIONS
+
+    def _record(self, file_path):
+        self.played.append(file_path)
+
+    def start_pcm(self, chunks, rate, label="stdin"):
+        playback = SimulatedStreamPlayback(chunks, rate, label, self.realtime)
+        with self.lock:
+            self.active = [p for p in self.active if p.poll() is None] + [playback]
+        return playback
+
+    def start(self, file_path, speed=1.0, intro=None, start=0):
+        self._record(file_path)
+        stream = open_stream(file_path, speed, intro, start)
+        if stream:
+            rate, chunks, position = stream
+            playback = self.start_pcm(chunks, rate, file_path)
+            playback.stream_position = position
+            return playback
+        playback = SimulatedPlayback(file_path, self.realtime)
+        with self.lock:
+            self.active = [p for p in self.active if p.poll() is None] + [playback]
+        return playback
+
+    def kill_all(self):
+        with self.lock:
+            active, self.active = self.active, []
+        for playback in active:
+            playback.terminate()
+
+
+class WaveFileAudioSink(NullAudioSink):
+    """Copies every played file into a directory (numbered in play order)."""
+
+    def __init__(self, output_dir, realtime=SIM_AUDIO_REALTIME):
+        super().__init__(realtime)
+        self.output_dir = output_dir
+        self.counter = itertools.count(1)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _record(self, file_path):
+        super()._record(file_path)
+        target = os.path.join(self.output_dir, f"{next(self.counter):05d}_{os.path.basename(file_path)}")
+        try:
+            shutil.copyfile(file_path, target)
+        except OSError as e:
+            print(f"Simulated audio sink could not copy {file_path}: {e}")
+
+
+def create_audio_sink():
+    """Return the audio output backend."""
+    if not SIMULATED:
+        return ProcessAudioSink()
+    if SIM_AUDIO_SINK and SIM_AUDIO_SINK != "null":
+        return WaveFileAudioSink(SIM_AUDIO_SINK)
+    return NullAudioSink()
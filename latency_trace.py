@@ -0,0 +1,208 @@
+# latency_trace.py
+import threading
+import json
+import math
+import time
+import os
+from collections import deque
+from contextlib import contextmanager
+
+from metrics_server import read_rss_bytes
+
+# Defaults for the rotating JSONL file
+DEFAULT_MAX_BYTES = 1024 * 1024  # Rotate after 1 MB
+DEFAULT_BACKUP_COUNT = 3         # Keep latency.jsonl.1 .. .3
+DEFAULT_WINDOW = 100             # Cycles kept for the rolling percentiles
+
+
+def stage_clock():
+    """Start point for a span: (monotonic wall time, CPU time of this thread)."""
+    return (time.monotonic(), time.thread_time())
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class CycleTrace:
+    """Monotonic-clock spans and marks for one press-to-speech cycle."""
+
+    def __init__(self, start=None, sample_memory=False, **meta):
+        # The cycle may start earlier than now (e.g. when the serial command arrived)
+        self.start = start if start is not None else time.monotonic()
+        self.wall_start = time.time() - (time.monotonic() - self.start)
+        self.meta = dict(meta)
+        self.spans = {}  # name -> duration (ms)
+        self.marks = {}  # name -> offset from cycle start (ms)
+        self.cpu = {}    # name -> CPU time of the span's thread (ms), when started from stage_clock()
+        self.rss_kb = {}  # name -> RSS at the end of the span (KiB), when sample_memory is set
+        self.sample_memory = sample_memory
+        self.lock = threading.Lock()
+
+    def _ms(self, seconds):
+        return round(seconds * 1000, 1)
+
+    def add_span(self, name, start, end=None):
+        """Record a span from start to end (default now).
+
+        start is a time.monotonic() value, or a stage_clock() pair to also record CPU time.
+        """
+        cpu_ms = None
+        if isinstance(start, tuple):
+            start, cpu_start = start
+            cpu_ms = self._ms(time.thread_time() - cpu_start)
+        end = end if end is not None else time.monotonic()
+        rss = read_rss_bytes() if self.sample_memory else None
+        with self.lock:
+            self.spans[name] = self._ms(end - start)
+            if cpu_ms is not None:
+                self.cpu[name] = cpu_ms
+            if rss is not None:
+                self.rss_kb[name] = rss // 1024
+
+    @contextmanager
+    def span(self, name):
+        """Context manager that times the enclosed block."""
+        start = stage_clock()
+        try:
+            yield
+        finally:
+            self.add_span(name, start)
+
+    def mark(self, name, when=None):
+        """Record a point in time relative to the cycle start."""
+        when = when if when is not None else time.monotonic()
+        with self.lock:
+            self.marks[name] = self._ms(when - self.start)
+
+    def set(self, **meta):
+        """Attach extra fields (capture id, status, ...) to the record."""
+        with self.lock:
+            self.meta.update(meta)
+
+    def elapsed_ms(self):
+        """Milliseconds since the cycle started."""
+        return self._ms(time.monotonic() - self.start)
+
+    def timings(self):
+        """Flat dict of spans and marks (used for the capture journal)."""
+        with self.lock:
+            result = dict(self.spans)
+            result.update({f"at_{name}": value for name, value in self.marks.items()})
+        return result
+
+    def to_record(self):
+        """JSON-serializable record for this cycle."""
+        with self.lock:
+            record = {
+                "ts": round(self.wall_start, 3),
+                "spans": dict(self.spans),
+                "marks": dict(self.marks),
+            }
+            if self.cpu:
+                record["cpu"] = dict(self.cpu)
+            if self.rss_kb:
+                record["rss_kb"] = dict(self.rss_kb)
+            record.update(self.meta)
+        return record
+
+
+class LatencyTracer:
+    """Writes one JSONL record per cycle to a rotating file and keeps rolling p50/p95 stats."""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT, window=DEFAULT_WINDOW,
+                 sample_memory=False):
+        self.path = path
+        self.sample_memory = sample_memory  # Record RSS at the end of every span (benchmarks)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.window = window
+        self.lock = threading.Lock()
+        self.history = {}  # name -> deque of recent values (ms)
+        self.cycles = 0
+        self.listeners = []  # Called with each finished trace
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def new_cycle(self, start=None, **meta):
+        """Start tracing a new cycle."""
+        return CycleTrace(start=start, sample_memory=self.sample_memory, **meta)
+
+    def add_listener(self, listener):
+        """Register a function called with every finished CycleTrace."""
+        self.listeners.append(listener)
+
+    def _rotate(self):
+        """Rotate latency.jsonl -> latency.jsonl.1 -> ... when it grows too large."""
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return
+
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def finish(self, trace, **meta):
+        """Finish a cycle: write its JSONL record and update the rolling stats."""
+        if trace is None:
+            return None
+
+        trace.set(**meta)
+        trace.mark("end")
+        record = trace.to_record()
+
+        with self.lock:
+            self.cycles += 1
+            values = dict(record["spans"])
+            values.update({f"at_{name}": value for name, value in record["marks"].items()})
+            for name, value in values.items():
+                if name not in self.history:
+                    self.history[name] = deque(maxlen=self.window)
+                self.history[name].append(value)
+
+            try:
+                self._rotate()
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+            except Exception as e:
+                print(f"Error writing latency trace: {e}")
+
+        for listener in self.listeners:
+            try:
+                listener(trace)
+            except Exception as e:
+                print(f"Error in latency trace listener: {e}")
+
+        return record
+
+    def summary(self):
+        """Rolling p50/p95 (ms) per span/mark over the last `window` cycles."""
+        with self.lock:
+            return {
+                name: {
+                    "count": len(values),
+                    "p50": percentile(list(values), 50),
+                    "p95": percentile(list(values), 95),
+                }
+                for name, values in self.history.items()
+            }
+
+    def summary_line(self):
+        """One-line human readable summary for the console."""
+        parts = []
+        for name, stats in self.summary().items():
+            if stats["p50"] is not None:
+                parts.append(f"{name} p50={stats['p50']:.0f} p95={stats['p95']:.0f}")
+        return f"Latency over last {self.window} cycles (ms): " + ", ".join(parts)
@@ -0,0 +1,303 @@
+# metrics_server.py
+import threading
+import os
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# Bind to localhost by default; set METRICS_HOST to the management interface address to scrape remotely
+DEFAULT_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.environ.get("METRICS_PORT", "9105"))
+
+# Latency buckets (seconds) covering serial/capture (ms) up to long TTS streams
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)
+
+SOC_TEMP_PATH = "/sys/class/thermal/thermal_zone0/temp"
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Base class: a named metric with optional labels."""
+
+    metric_type = "untyped"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+
+
+class Counter(Metric):
+    """Monotonically increasing counter."""
+
+    metric_type = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        with self.lock:
+            return self.values.get(self._key(labels), 0)
+
+    def render(self):
+        lines = self.header()
+        with self.lock:
+            items = sorted(self.values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Metric):
+    """Value that can go up and down, or is read from a function at scrape time."""
+
+    metric_type = "gauge"
+
+    def __init__(self, name, help_text, labelnames=(), func=None):
+        super().__init__(name, help_text, labelnames)
+        self.values = {}
+        self.func = func
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels):
+        if self.func:
+            return self.func()
+        with self.lock:
+            return self.values.get(self._key(labels), 0)
+
+    def render(self):
+        lines = self.header()
+        if self.func:
+            try:
+                value = self.func()
+            except Exception:
+                value = None
+            if value is None:
+                return []
+            lines.append(f"{self.name} {_format_value(value)}")
+            return lines
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram (Prometheus text format)."""
+
+    metric_type = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = self.header()
+        with self.lock:
+            items = sorted((key, list(series)) for key, series in self.series.items())
+        for key, series in items:
+            for index, bound in enumerate(self.buckets):
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {series[index]}")
+            labels = _format_labels(self.labelnames, key, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(round(series[-2], 6))}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them as Prometheus text."""
+
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=(), func=None):
+        return self._register(Gauge(name, help_text, labelnames, func))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def read_rss_bytes():
+    """Resident set size of this process (Linux /proc)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def read_soc_temperature():
+    """SoC temperature in degrees Celsius (Raspberry Pi thermal zone)."""
+    try:
+        with open(SOC_TEMP_PATH) as f:
+            return int(f.read().strip()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+
+# Default registry and the metrics the camera exposes
+registry = MetricsRegistry()
+
+captures_total = registry.counter("bcam_captures_total", "Capture cycles by final status.", ["status"])
+stage_latency = registry.histogram("bcam_stage_latency_seconds", "Per-stage latency of the press-to-speech path.", ["stage"])
+cache_hits_total = registry.counter("bcam_cache_hits_total", "Cache lookups that hit.", ["cache"])
+cache_misses_total = registry.counter("bcam_cache_misses_total", "Cache lookups that missed.", ["cache"])
+api_errors_total = registry.counter("bcam_api_errors_total", "Errors from remote API calls.", ["api"])
+audio_underruns_total = registry.counter("bcam_audio_underruns_total", "Audio output underruns reported by the player.")
+serial_queue_depth = registry.gauge("bcam_serial_command_queue_depth", "Serial commands waiting to be written, plus an unhandled button press.")
+serial_events_lost = registry.gauge("bcam_serial_events_lost", "Arduino events missed on the framed serial link (sequence gaps).")
+serial_retransmits = registry.gauge("bcam_serial_retransmits", "Commands resent to the Arduino for lack of an ack.")
+capture_queue_depth = registry.gauge("bcam_capture_queue_depth", "Captures queued while offline, waiting to be processed.")
+thread_count = registry.gauge("bcam_threads", "Live Python threads.", func=threading.active_count)
+rss_bytes = registry.gauge("bcam_process_resident_memory_bytes", "Resident memory of the camera process.", func=read_rss_bytes)
+soc_temperature = registry.gauge("bcam_soc_temperature_celsius", "SoC temperature.", func=read_soc_temperature)
+first_audio_latency = registry.histogram("bcam_first_audio_seconds", "Press to first response audio, by wordiness level.", ["wordiness"])
+scene_watch_triggers_total = registry.counter("bcam_scene_watch_triggers_total", "Scene-watch captures started by a scene change.")
+startup_seconds = registry.gauge("bcam_startup_seconds", "Boot timing breakdown (ready = boot to first possible capture).", ["stage"])
+
+
+def observe_trace(trace):
+    """Latency tracer listener: feed a finished CycleTrace into the metrics."""
+    for stage, duration_ms in trace.spans.items():
+        stage_latency.observe(duration_ms / 1000.0, stage=stage)
+    for mark, offset_ms in trace.marks.items():
+        if mark != "end":
+            stage_latency.observe(offset_ms / 1000.0, stage=f"at_{mark}")
+    if "first_audio" in trace.marks:
+        first_audio_latency.observe(trace.marks["first_audio"] / 1000.0, wordiness=trace.meta.get("wordiness", "unknown"))
+    captures_total.inc(status=trace.meta.get("status", "unknown"))
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves /metrics from the default registry."""
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep scrapes out of stdout
+        pass
+
+
+# Singleton server - started on demand
+metrics_server = None
+
+
+def start_metrics_server(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Start the metrics HTTP server in a daemon thread (idle cost: one blocked thread)."""
+    global metrics_server
+
+    if metrics_server is None:
+        try:
+            metrics_server = HTTPServer((host, port), MetricsRequestHandler)
+            thread = threading.Thread(target=metrics_server.serve_forever, daemon=True)
+            thread.start()
+            print(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+        except Exception as e:
+            print(f"Failed to start metrics endpoint: {e}")
+            metrics_server = None
+
+    return metrics_server
+
+
+def stop_metrics_server():
+    """Stop the metrics HTTP server."""
+    global metrics_server
+
+    if metrics_server:
+        metrics_server.shutdown()
+        metrics_server.server_close()
+        metrics_server = None
+        print("Metrics endpoint stopped")
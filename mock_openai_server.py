@@ -0,0 +1,268 @@
+# mock_openai_server.py
+# Local stand-in for the OpenAI chat-completions and speech endpoints (used by benchmark.py).
+#
+#   python mock_openai_server.py --port 8765 --latency 0.8 --token-rate 40 --error-rate 0.05
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 BCAM_BACKEND=sim python picture.py
+import argparse
+import threading
+import hashlib
+import random
+import struct
+import json
+import math
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Words used to build deterministic fake descriptions
+VOCABULARY = (
+    "a wooden table with a white mug on the left side near a window "
+    "there is a step down ahead and a sign reading exit above the door "
+    "two chairs sit beside a bookshelf holding several paperback books "
+    "the floor is tiled and a bag rests against the wall under a poster"
+).split()
+
+SPEECH_SAMPLE_RATE = 24000  # Same as the OpenAI TTS PCM output
+WORDS_PER_SECOND = 2.5      # Speaking rate used to size the synthesized audio
+HD_LATENCY_FACTOR = 1.6     # tts-1-hd takes longer to its first byte than tts-1
+
+
+class MockConfig:
+    """Tunable behaviour of the mock server."""
+
+    def __init__(self, latency=0.5, jitter=0.1, token_rate=50.0, words=None,
+                 audio_rate=4.0, chunk_size=4096, error_rate=0.0, rate_limit_rate=0.0,
+                 stall_rate=0.0, stall_seconds=30.0, seed=None):
+        self.latency = latency                  # Seconds before the first byte
+        self.jitter = jitter                    # +/- uniform jitter on latency (seconds)
+        self.token_rate = token_rate            # Generated tokens per second
+        self.words = words                      # Description length (default: from max_tokens)
+        self.audio_rate = audio_rate            # Speech streamed at N x realtime
+        self.chunk_size = chunk_size            # Bytes per streamed speech chunk
+        self.error_rate = error_rate            # Probability of a 500 response
+        self.rate_limit_rate = rate_limit_rate  # Probability of a 429 response
+        self.stall_rate = stall_rate            # Probability of stalling before responding
+        self.stall_seconds = stall_seconds      # How long a stall lasts
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"chat": 0, "speech": 0, "errors": 0, "rate_limited": 0, "stalls": 0}
+
+    def roll(self, probability):
+        with self.lock:
+            return probability > 0 and self.random.random() < probability
+
+    def first_byte_delay(self):
+        with self.lock:
+            return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+
+def fake_description(seed_bytes, words):
+    """Deterministic description for an image (same image -> same text)."""
+    rng = random.Random(hashlib.sha1(seed_bytes).hexdigest())
+    return " ".join(rng.choice(VOCABULARY) for _ in range(max(1, words))) + "."
+
+
+def wav_header(num_samples, sample_rate=SPEECH_SAMPLE_RATE):
+    """44-byte PCM WAV header for mono 16-bit audio."""
+    data_size = num_samples * 2
+    return (b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+            + b"data" + struct.pack("<I", data_size))
+
+
+def synth_pcm(num_samples, sample_rate=SPEECH_SAMPLE_RATE):
+    """A quiet warbling tone standing in for speech."""
+    frames = bytearray()
+    for n in range(num_samples):
+        t = n / sample_rate
+        value = int(3000 * math.sin(2 * math.pi * (180 + 40 * math.sin(2 * math.pi * 3 * t)) * t))
+        frames += struct.pack("<h", value)
+    return bytes(frames)
+
+
+# One second of tone reused for every response (synthesizing per request would dominate the mock's CPU)
+_TONE = synth_pcm(SPEECH_SAMPLE_RATE)
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Handles /v1/chat/completions and /v1/audio/speech."""
+
+    protocol_version = "HTTP/1.1"
+    config = MockConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_faults(self):
+        """Apply stalls/errors. Returns True if an error response was sent."""
+        config = self.config
+        if config.roll(config.stall_rate):
+            config.count("stalls")
+            time.sleep(config.stall_seconds)
+        if config.roll(config.rate_limit_rate):
+            config.count("rate_limited")
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_error"}})
+            return True
+        if config.roll(config.error_rate):
+            config.count("errors")
+            self._send_json(500, {"error": {"message": "Injected server error (mock)", "type": "server_error"}})
+            return True
+        return False
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON"}})
+            return
+
+        path = self.path.split("?")[0]
+        if path.endswith("/chat/completions"):
+            self.config.count("chat")
+            if not self._inject_faults():
+                self._chat(request)
+        elif path.endswith("/audio/speech"):
+            self.config.count("speech")
+            if not self._inject_faults():
+                self._speech(request)
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown endpoint {path}"}})
+
+    def _chat(self, request):
+        config = self.config
+        max_tokens = request.get("max_tokens") or request.get("max_completion_tokens") or 300
+        words = config.words or int(max_tokens * 0.75)
+        words = min(words, int(max_tokens * 0.75)) or 1
+
+        # Seed the description from the image payload so fixtures give stable text
+        seed = json.dumps(request.get("messages", [])).encode("utf-8")
+        text = fake_description(seed, words)
+        tokens = max(1, int(len(text.split()) / 0.75))
+        model = request.get("model", "gpt-4o")
+
+        time.sleep(config.first_byte_delay())
+
+        if request.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            pieces = text.split(" ")
+            delay = (tokens / config.token_rate) / len(pieces) if config.token_rate > 0 else 0
+            for index, piece in enumerate(pieces):
+                chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model,
+                         "choices": [{"index": 0, "delta": {"content": piece if index == 0 else " " + piece},
+                                      "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(delay)
+            done = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        # Non-streaming: the whole generation time is spent before the response
+        if config.token_rate > 0:
+            time.sleep(tokens / config.token_rate)
+        self._send_json(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1000, "completion_tokens": tokens, "total_tokens": 1000 + tokens},
+        })
+
+    def _speech(self, request):
+        config = self.config
+        text = request.get("input", "")
+        duration = max(0.5, len(text.split()) / WORDS_PER_SECOND)
+        num_samples = int(duration * SPEECH_SAMPLE_RATE)
+        response_format = request.get("response_format", "wav")
+
+        pcm = (_TONE * (num_samples // SPEECH_SAMPLE_RATE + 1))[:num_samples * 2]
+        body = pcm if response_format == "pcm" else wav_header(num_samples) + pcm
+
+        delay = config.first_byte_delay()
+        if request.get("model") == "tts-1-hd":
+            delay *= HD_LATENCY_FACTOR
+        time.sleep(delay)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/pcm" if response_format == "pcm" else "audio/wav")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        # Stream at audio_rate x realtime
+        bytes_per_second = SPEECH_SAMPLE_RATE * 2 * config.audio_rate
+        for offset in range(0, len(body), config.chunk_size):
+            chunk = body[offset:offset + config.chunk_size]
+            self.wfile.write(chunk)
+            self.wfile.flush()
+            if config.audio_rate > 0:
+                time.sleep(len(chunk) / bytes_per_second)
+
+
+def create_server(config, host="127.0.0.1", port=8765):
+    """Create a threaded mock server using the given MockConfig."""
+    handler = type("ConfiguredMockOpenAIHandler", (MockOpenAIHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def add_arguments(parser):
+    """CLI options shared with benchmark.py."""
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to first byte")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Uniform jitter on latency (seconds)")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Generated tokens per second")
+    parser.add_argument("--words", type=int, default=None, help="Description length in words")
+    parser.add_argument("--audio-rate", type=float, default=4.0, help="Speech streaming speed (x realtime)")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="Bytes per speech chunk")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Probability of HTTP 429")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Probability of a stall")
+    parser.add_argument("--stall-seconds", type=float, default=30.0, help="Stall duration (seconds)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for fault injection")
+
+
+def config_from_args(args):
+    return MockConfig(
+        latency=args.latency, jitter=args.jitter, token_rate=args.token_rate, words=args.words,
+        audio_rate=args.audio_rate, chunk_size=args.chunk_size, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, stall_rate=args.stall_rate,
+        stall_seconds=args.stall_seconds, seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI vision/TTS server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = create_server(config_from_args(args), args.host, args.port)
+    print(f"Mock OpenAI server listening on http://{args.host}:{args.port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nMock server stopped")
+    finally:
+        server.server_close()
@@ -1,63 +1,108 @@
 ###################################
 # picture.py (RUNS ALL LOGIC LOCALLY)
 ###################################
+import time
+
+# Boot clock starts before the (lighter) imports below
+BOOT_START = time.monotonic()
+
 from dotenv import load_dotenv
 import os
 import random
-import requests
-from PIL import Image
 from datetime import datetime
-from picamera2 import Picamera2
-import time
 import threading
-import subprocess
-import io
-import openai
-from pydub import AudioSegment
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+# Heavy modules (openai, PIL) are imported on first use or prewarmed after the ready cue
 
 # Import the AudioManager class
 from audio_manager import AudioManager
 
+# Camera/serial/GPIO/audio backends (BCAM_BACKEND=sim runs off the Pi)
+import hardware
+
 # Serial Handling python Script
 import serialHandle
 
+# Capture journal (links image, description, audio and timings)
+from capture_journal import CaptureJournal, STATUS_COMPLETE, STATUS_ERROR, STATUS_INTERRUPTED, STATUS_QUEUED
+
+# Background queue for captures made while the network is down
+from capture_queue import CaptureQueue, tcp_probe
+
+# Numpy-based helpers (document tiles, fisheye, exposure, resampling) are imported where they are used,
+# off the boot path; prewarm_imports loads them after the ready cue
+
+# Hands-free scene watch (change detection on lores frames)
+from scene_watch import SceneWatcher, RateBudget
+
+# Synthesized speech reused for repeated text
+from tts_cache import AudioCache, cache_key
+
+# Compact (Opus/FLAC) storage for the response history
+import audio_codec
+
+# "Three of ten" announcements while navigating the history
+from announce import IndexAnnouncer
+
+# In-flight files live in RAM; only what is kept gets written to the SD card, off the request path
+from staging import StagingArea, default_directory
+
+# Per-stage latency tracing (JSONL + rolling p50/p95)
+from latency_trace import LatencyTracer, stage_clock
+
+# Prometheus-text metrics endpoint for fleet scraping
+import metrics_server
+
+# Deadlines, retries, hedging and circuit breaking for the OpenAI calls
+from remote_call import Deadline, CircuitBreaker, CircuitOpenError, DeadlineExceeded, LatencyWindow, call_with_retry
+
 # Load environment variables
 load_dotenv()
 
-# Set OpenAI API key
+# OpenAI API key
 OPENAI_API_KEY = os.environ.get("OPENAI_KEY")
-openai.api_key = OPENAI_API_KEY
-
-# Camera Object
-picam2 = Picamera2()
 
-# Automatically select the highest resolution mode
-max_mode = max(picam2.sensor_modes, key=lambda m: m['size'][0] * m['size'][1])
-max_res = max_mode['size']
-print(max_res)
-
-config = picam2.create_still_configuration(
-    main={"size": (480, 270)},
-    buffer_count=2,
-    display=None
-)
-# Add advanced controls to reduce banding
-picam2.set_controls({
-    "AwbEnable": True,  # Enable auto white balance
-    "AeEnable": True,   # Enable auto exposure
-    "FrameDurationLimits": (33333, 100000),  # Limit frame duration (helps with banding)
-    "NoiseReductionMode": 2,  # High noise reduction
-    "Saturation": 1.0,  # Normal saturation
-    "Sharpness": 1.0,   # Normal sharpness
-})
-picam2.configure(config)
-picam2.start()
-
-ORIGINALS_DIR = "/home/b-cam/Scripts/blindCam/originals"
-RESIZED_DIR = "/home/b-cam/Scripts/blindCam/resized"
+if hardware.SIMULATED:
+    # Keep simulated output away from resized/, which the simulated camera replays
+    ORIGINALS_DIR = os.path.abspath("sim_data/originals")
+    RESIZED_DIR = os.path.abspath("sim_data/resized")
+else:
+    ORIGINALS_DIR = "/home/b-cam/Scripts/blindCam/originals"
+    RESIZED_DIR = "/home/b-cam/Scripts/blindCam/resized"
 # Make sure audio directory is absolute
 AUDIO_DIR = os.path.abspath("audio")  # Convert to absolute path
-MAX_AUDIO_FILES = 10
+SUMMARY_DIR = os.path.join(AUDIO_DIR, "summaries")  # Spoken summaries (not part of the history)
+HISTORY_CODEC = os.environ.get("BCAM_HISTORY_CODEC", "opus")  # "opus", "flac" or "wav" (uncompressed)
+MAX_AUDIO_FILES = 10 if HISTORY_CODEC == "wav" else 100  # Compressed entries are ~10x smaller, so keep more
+# SD-card budget for the compressed history; WAV history is only capped by count, as before (unless set)
+HISTORY_MB = os.environ.get("BCAM_HISTORY_MB", "" if HISTORY_CODEC == "wav" else "10")
+HISTORY_MAX_BYTES = int(float(HISTORY_MB) * 1024 * 1024) if HISTORY_MB else None
+HISTORY_EXTENSIONS = (".wav",) + audio_codec.COMPRESSED_EXTENSIONS
+JOURNAL_PATH = os.path.abspath("capture_journal.db")
+TRACE_PATH = os.path.abspath("traces/latency.jsonl")
+TTS_CACHE_DIR = os.path.abspath("cache/tts")
+TTS_CACHE_MAX_BYTES = int(float(os.environ.get("BCAM_TTS_CACHE_MB", "20")) * 1024 * 1024)  # Byte budget on the SD card
+READY_SOUND = "sys_aud/ready.wav"
+QUEUED_SOUND = "sys_aud/queued.wav"  # Capture saved for later; the result will show up in the history
+TOO_DARK_SOUND = "sys_aud/too_dark.wav"  # Frame too dark to describe; nothing was sent
+NUMBERS_DIR = "sys_aud/numbers"  # one.mp3 ... ten.mp3 (optional eleven..ninety, hundred, of) for announcements
+
+# Exposure gating
+AE_TIMEOUT = float(os.environ.get("BCAM_AE_TIMEOUT", "0.5"))  # Longest wait for auto exposure to settle (seconds)
+DARK_LEVEL = int(os.environ.get("BCAM_DARK_LEVEL", "40"))  # 95th-percentile luma (0-255) below this is too dark; 0 disables
+
+# Speech settings (part of the TTS cache key)
+TTS_VOICE = "nova"  # Options: "alloy", "echo", "fable", "onyx", "nova", "shimmer"
+TTS_OUTPUT_FORMAT = "wav-22050-mono-s16"  # What synthesize_speech leaves on disk
+TTS_PCM_RATE = 24000         # OpenAI "pcm" responses: 24 kHz, 16-bit, mono
+OUTPUT_SAMPLE_RATE = 22050   # Rate of the response WAVs in the history
+
+# Remote call budgets (seconds)
+REQUEST_DEADLINE = float(os.environ.get("BCAM_REQUEST_DEADLINE", "45"))  # Press to audio file ready
+VISION_ATTEMPT_TIMEOUT = 20.0  # One chat.completions attempt
+TTS_FIRST_BYTE_TIMEOUT = 10.0  # One TTS attempt, up to its first audio chunk (also the per-read stall limit)
 
 # Debug the path resolution for audio files
 print(f"Current working directory: {os.getcwd()}")
@@ -65,6 +110,83 @@ print(f"Absolute path to AUDIO_DIR: {AUDIO_DIR}")
 
 # Global Vars
 wordiness = 200
+
+# Response playback speed, pitch preserved (hold WORD_CNT to cycle through PLAYBACK_SPEEDS)
+PLAYBACK_SPEEDS = (1.0, 1.25, 1.5, 2.0, 2.5)
+playback_speed = float(os.environ.get("BCAM_PLAYBACK_SPEED", "1.0"))
+
+# Number clips are decoded once (in prewarm) and composed in memory for each history step
+announcer = IndexAnnouncer(NUMBERS_DIR, OUTPUT_SAMPLE_RATE)
+RESUME_REWIND = 3.0  # Seconds repeated when resuming a response (covers audio still buffered in the player)
+
+# Per-wordiness generation and speech settings: short modes as fast as possible, long modes complete.
+# max_tokens leaves ~1.5 tokens per word so the long settings aren't cut off;
+# time_scale stretches the request deadline and vision timeout for longer generations.
+WORDINESS_PROFILES = {
+    50: {"max_tokens": 90, "tts_model": "tts-1", "chunk_size": 1024, "time_scale": 0.5,
+         "style": "Only say the single most important thing, in one or two short sentences."},
+    100: {"max_tokens": 170, "tts_model": "tts-1", "chunk_size": 2048, "time_scale": 0.7,
+          "style": "Be brief: the main subject and anything important, in a few sentences."},
+    200: {"max_tokens": 320, "tts_model": "tts-1", "chunk_size": 4096, "time_scale": 1.0,
+          "style": ""},
+    500: {"max_tokens": 780, "tts_model": "tts-1-hd", "chunk_size": 8192, "time_scale": 2.0,
+          "style": "Describe the scene thoroughly, including the layout and where things are."},
+    1000: {"max_tokens": 1550, "tts_model": "tts-1-hd", "chunk_size": 8192, "time_scale": 3.5,
+           "style": "Give a complete, detailed description: all text, objects and their positions."},
+}
+
+def profile_level(level):
+    """Closest wordiness level that has a profile."""
+    if level in WORDINESS_PROFILES:
+        return level
+    return min(WORDINESS_PROFILES, key=lambda known: abs(known - (level or 200)))
+
+def wordiness_profile(level):
+    """Settings for a wordiness level (unknown levels use the closest one)."""
+    return WORDINESS_PROFILES[profile_level(level)]
+
+# Fisheye correction before upload (BCAM_RECTIFY=1); tables are cached under cache/remap
+rectifier = None
+if os.environ.get("BCAM_RECTIFY", "0") == "1":
+    from fisheye import FisheyeRectifier
+    rectifier = FisheyeRectifier()
+
+def rectify(frame, box=None, step=1):
+    """Rectified (if enabled) region/subsampling of a frame."""
+    if rectifier:
+        return rectifier.apply(frame, box, step)
+    if box is not None:
+        x, y, w, h = box
+        frame = frame[y:y + h, x:x + w]
+    return frame[::step, ::step] if step > 1 else frame
+
+# Scene watch: describe the scene whenever it changes (BCAM_SCENE_WATCH=1, or hold PLAY_BACK to toggle)
+SCENE_WATCH_AT_START = os.environ.get("BCAM_SCENE_WATCH", "0") == "1"
+SCENE_WATCH_PER_MINUTE = float(os.environ.get("BCAM_WATCH_PER_MINUTE", "3"))  # Rate budget for watch descriptions
+SCENE_WATCH_WORDINESS = 50  # Short descriptions; ambient updates shouldn't talk over the user
+LORES_SIZE = (160, 90)      # Stream the change detection samples
+
+# Document mode: full-resolution still, only the text-dense tiles are sent
+document_mode = os.environ.get("BCAM_DOCUMENT_MODE", "0") == "1"
+DOCUMENT_MAX_TOKENS = 1200
+DOCUMENT_OVERVIEW_STEP = 4  # Overview and tile picking use every 4th pixel of the full frame
+DOCUMENT_TIME_SCALE = 3.0
+DOCUMENT_PROMPT = """You are reading for someone who is blind and cannot see.
+    The first image is an overview of the page or sign; the others are close-up crops of its text regions, in reading order.
+    First say in a few words what kind of document it is, then read out all of the text exactly, in reading order.
+    Don't add commentary. If some text is unreadable, say so briefly. Don't format the response.
+    The image provided is taken on a fish-eye lens, DO NOT MENTION ANY CURVED DISTORTION AT THE EDGES OF THE IMAGE."""
+
+# Two-tier mode: a short safety-first summary is spoken as soon as it arrives, then the full description
+summary_first = os.environ.get("BCAM_SUMMARY_FIRST", "0") == "1"
+SUMMARY_MIN_WORDINESS = 100  # At 50 words the full description is already short
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_MAX_TOKENS = 40
+SUMMARY_PROMPT = """You are standing in for someone who is blind and cannot see.
+    In ONE short sentence, say what matters most right now: any safety issue first (obstacles, steps, traffic,
+    people in the way), otherwise the main thing in front of them.
+    The image provided is taken on a fish-eye lens, DO NOT MENTION ANY CURVED DISTORTION AT THE EDGES OF THE IMAGE.
+    Do not be poetic and don't format the response."""
 interrupt_event = threading.Event()
 
 # Try to import volume control
@@ -86,59 +208,333 @@ class State:
         
 app_state = State()
 
+class RequestSupervisor:
+    """One long-lived thread that polls the active request's interrupt check."""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.active_check = None
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="request-supervisor", daemon=True)
+        self.thread.start()
+
+    def watch(self, check):
+        """Start polling `check` (returns True once it has handled an interruption)."""
+        with self.lock:
+            self.active_check = check
+        self.wake.set()
+
+    def release(self, check):
+        """Stop polling `check` if it is still the active one."""
+        with self.lock:
+            if self.active_check is check:
+                self.active_check = None
+
+    def _run(self):
+        while True:
+            with self.lock:
+                check = self.active_check
+            if check is None:
+                # Nothing to supervise: sleep until a request registers
+                self.wake.wait()
+                self.wake.clear()
+                continue
+
+            time.sleep(self.interval)
+            try:
+                if check():
+                    self.release(check)
+            except Exception as e:
+                print(f"Error in request supervisor: {e}")
+
+supervisor = RequestSupervisor()
+
 # Ensure directories exist
-for directory in [ORIGINALS_DIR, RESIZED_DIR, AUDIO_DIR]:
+for directory in [ORIGINALS_DIR, RESIZED_DIR, AUDIO_DIR, SUMMARY_DIR]:
     os.makedirs(directory, exist_ok=True)
 
-# Create the AudioManager instance
-audio_manager = AudioManager()
+# Open the capture journal
+journal = CaptureJournal(JOURNAL_PATH)
 
-# Initialize volume control if available
-if has_volume_control:
-    try:
-        # This will initialize the rotary encoder for volume control
-        volume_encoder = volume_control.init_volume_encoder()
-        print("Rotary encoder initialized for system volume control")
-    except Exception as e:
-        print(f"ERROR: Failed to initialize volume encoder: {e}")
+# Latency tracer for the press-to-speech path
+tracer = LatencyTracer(TRACE_PATH)
+
+# RAM staging for images and audio while a request is using them (BCAM_STAGING_DIR="" writes straight to disk)
+staging = StagingArea(default_directory())
+
+# Speech already synthesized for the same text and settings
+tts_cache = AudioCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
+
+# Feed traces and the serial queues into the metrics endpoint
+tracer.add_listener(metrics_server.observe_trace)
+# Commands waiting for the writer, plus a received button press the main loop hasn't taken yet
+metrics_server.serial_queue_depth.func = lambda: len(serialHandle.pending_commands) + (1 if serialHandle.last_command else 0)
+metrics_server.serial_events_lost.func = lambda: serialHandle.link_stats["lost"]
+metrics_server.serial_retransmits.func = lambda: serialHandle.link_stats["retransmits"]
+
+# Devices and clients created by startup()
+picam2 = None
+max_res = None
+still_config = None     # Default 480x270 capture
+document_config = None  # Pre-built full sensor resolution still for document mode
+audio_manager = None
+volume_encoder = None
+openai_client = None
+openai_client_ready = threading.Event()
+openai_breaker = CircuitBreaker("openai")
+# Successful attempt durations per wordiness level; attempts stalling past their p95 get hedged
+vision_latency = {level: LatencyWindow() for level in WORDINESS_PROFILES}
+tts_latency = {level: LatencyWindow() for level in WORDINESS_PROFILES}
+summary_latency = LatencyWindow()
+document_latency = LatencyWindow()
+
+# Runs the summary request next to the full description
+summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+# Re-encodes finished responses for the history off the request path
+history_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+startup_timings = {}  # stage -> seconds
+
+def init_camera():
+    """Create, configure and start the camera."""
+    global picam2, max_res, still_config, document_config
+    camera = hardware.create_camera()
+
+    # Automatically select the highest resolution mode
+    max_mode = max(camera.sensor_modes, key=lambda m: m['size'][0] * m['size'][1])
+    max_res = max_mode['size']
+    print(max_res)
+
+    config = camera.create_still_configuration(
+        main={"size": (480, 270)},
+        lores={"size": LORES_SIZE},  # Scene watch compares these instead of full frames
+        buffer_count=2,
+        display=None
+    )
+    # Built once so document captures only pay for the mode switch
+    document_config = camera.create_still_configuration(
+        main={"size": max_res},
+        buffer_count=1,
+        display=None
+    )
+    # Add advanced controls to reduce banding
+    camera.set_controls({
+        "AwbEnable": True,  # Enable auto white balance
+        "AeEnable": True,   # Enable auto exposure
+        "FrameDurationLimits": (33333, 100000),  # Limit frame duration (helps with banding)
+        "NoiseReductionMode": 2,  # High noise reduction
+        "Saturation": 1.0,  # Normal saturation
+        "Sharpness": 1.0,   # Normal sharpness
+    })
+    camera.configure(config)
+    camera.start()
+    still_config = config
+    picam2 = camera
+
+def init_audio():
+    """Create the AudioManager instance."""
+    global audio_manager
+    manager = AudioManager()
+    manager.on_underrun = metrics_server.audio_underruns_total.inc
+    audio_manager = manager
+
+def init_volume():
+    """Initialize the rotary encoder for volume control (once)."""
+    global volume_encoder
+    if has_volume_control:
+        try:
+            # This will initialize the rotary encoder for volume control
+            volume_encoder = volume_control.init_volume_encoder()
+            print("Rotary encoder initialized for system volume control")
+        except Exception as e:
+            print(f"ERROR: Failed to initialize volume encoder: {e}")
+            volume_encoder = None
+    else:
         volume_encoder = None
-else:
-    volume_encoder = None
-    print("Volume control via rotary encoder is not available")
+        print("Volume control via rotary encoder is not available")
+
+def init_openai_client():
+    """Import openai and create the shared client (reused so connections stay pooled)."""
+    global openai_client
+    try:
+        import openai
+        openai.api_key = OPENAI_API_KEY
+        # Retries are handled by call_with_retry (deadline-aware, shared circuit breaker)
+        openai_client = openai.OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+    finally:
+        openai_client_ready.set()
+
+def get_openai_client():
+    """Return the shared OpenAI client, waiting for startup to create it if needed."""
+    openai_client_ready.wait()
+    if openai_client is None:
+        init_openai_client()
+    return openai_client
+
+def prewarm_imports():
+    """Import modules only needed once a picture is taken."""
+    from PIL import Image
+    import base64
+    import numpy
+    import exposure
+    import document_tiles
+    import audio_resample
+    import time_stretch
+
+    # Decode the number clips so the first history announcement doesn't wait for them
+    announcer.load()
+
+    # Map (or build once) the remap tables so the first capture doesn't pay for them
+    if rectifier:
+        rectifier.prepare(*still_config["main"]["size"])
+        rectifier.prepare(*max_res)
 
-def capture_image():
+def startup():
+    """Initialize camera, audio, serial and network clients in parallel, then play the ready cue."""
+    def timed(name, func):
+        def run():
+            start = time.monotonic()
+            try:
+                return func()
+            finally:
+                startup_timings[name] = time.monotonic() - start
+        return run
+
+    startup_timings["imports"] = time.monotonic() - BOOT_START
+    boot = ThreadPoolExecutor(max_workers=5, thread_name_prefix="boot")
+    required = [
+        boot.submit(timed("camera", init_camera)),
+        boot.submit(timed("audio", init_audio)),
+        boot.submit(timed("volume", init_volume)),
+        boot.submit(timed("serial", serialHandle.open_serial)),
+    ]
+    boot.submit(timed("openai", init_openai_client))
+
+    for future in required:
+        future.result()
+
+    # Capture is possible from here on
+    startup_timings["ready"] = time.monotonic() - BOOT_START
+    volume = volume_control.get_volume() if has_volume_control and volume_encoder else 88
+    audio_manager.play_sound(READY_SOUND, volume)
+    serialHandle.send_serial_command("READY")
+
+    boot.submit(timed("prewarm", prewarm_imports))
+    boot.shutdown(wait=False)
+
+    if SCENE_WATCH_AT_START:
+        scene_watcher.start()
+
+    # Pick up captures left queued by a previous run
+    capture_queue.start()
+
+    print("Startup timing (s): " + ", ".join(f"{name}={seconds:.3f}" for name, seconds in startup_timings.items()))
+    for name, seconds in startup_timings.items():
+        metrics_server.startup_seconds.set(round(seconds, 4), stage=name)
+    return startup_timings
+
+def capture_image(trace=None, document=False, shutter=True):
+    """Capture a frame; returns (image_path, frame). Document captures use the full sensor resolution."""
     # Clear last command
     serialHandle.last_command = None
 
     # Capture
-    frame = picam2.capture_array()
+    stage_start = stage_clock()
+    # Use the first frame whose exposure has settled instead of whatever the stream holds right now
+    import exposure
+    frame, settled, frames = exposure.wait_for_exposure(picam2, AE_TIMEOUT, keep_frame=not document)
+    if not settled:
+        print(f"Exposure still adjusting after {frames} frame(s), using the latest one")
+    if trace:
+        trace.set(ae_frames=frames, ae_settled=settled)
+    if document:
+        frame = picam2.switch_mode_and_capture_array(document_config, "main")
+    else:
+        if rectifier:
+            frame = rectify(frame)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    image_path = os.path.join(ORIGINALS_DIR, f"{timestamp}.jpg")
+    image_path = os.path.join(staging.dir(ORIGINALS_DIR), f"{timestamp}.jpg")
 
-    Image.fromarray(frame).save(image_path)
+    from PIL import Image
+    if document:
+        # Encoding a full-resolution JPEG is slow; tiles are cut from the in-memory frame meanwhile
+        # (the request never reads this file, so the saving thread also hands it off)
+        def save_original():
+            Image.fromarray(frame).save(image_path)
+            staging.persist(image_path, ORIGINALS_DIR, on_done=lambda _: keep_last_10_photos(ORIGINALS_DIR))
+            staging.release(image_path)
+        threading.Thread(target=save_original, daemon=True).start()
+    else:
+        Image.fromarray(frame).save(image_path)
+        staging.persist(image_path, ORIGINALS_DIR, on_done=lambda _: keep_last_10_photos(ORIGINALS_DIR))
+    if trace:
+        trace.add_span("capture", stage_start)
     
     # Play shutter sound and wait for it to complete
     # Get current volume if available, or use default
-    volume = volume_control.get_volume() if has_volume_control and volume_encoder else 88
-    audio_manager.play_sound_and_wait("tempclick.wav", volume)
+    if shutter:
+        stage_start = stage_clock()
+        volume = volume_control.get_volume() if has_volume_control and volume_encoder else 88
+        audio_manager.play_sound_and_wait("tempclick.wav", volume)
+        if trace:
+            trace.add_span("shutter_sound", stage_start)
 
     print(f"Captured image: {image_path}")
     serialHandle.send_serial_command("FEEDBACK_VIBRATE")  # Vibrate on Arduino
 
-    return image_path
+    return image_path, frame
 
-def manage_audio_files(directory, max_files=MAX_AUDIO_FILES):
-    """Keeps only last `max_files` audio files (.wav), removes old ones."""
-    audio_files = sorted(
-        (os.path.join(directory, f) for f in os.listdir(directory) 
-         if f.lower().endswith(".wav")),
-        key=os.path.getmtime
-    )
-    while len(audio_files) > max_files:
-        oldest_file = audio_files.pop(0)
-        os.remove(oldest_file)
+def manage_audio_files(directory, max_files=MAX_AUDIO_FILES, max_bytes=HISTORY_MAX_BYTES):
+    """Keeps only the last `max_files` audio files (and at most `max_bytes` of them, if set), removes old ones."""
+    audio_files = []
+    for f in os.listdir(directory):
+        if f.lower().endswith(HISTORY_EXTENSIONS):
+            try:
+                stat = os.stat(os.path.join(directory, f))
+            except FileNotFoundError:
+                continue  # Replaced by its compressed copy meanwhile
+            audio_files.append((stat.st_mtime, stat.st_size, os.path.join(directory, f)))
+    audio_files.sort()
+    total_bytes = sum(size for _, size, _ in audio_files)
+    while len(audio_files) > max_files or (max_bytes is not None and len(audio_files) > 1 and total_bytes > max_bytes):
+        _, size, oldest_file = audio_files.pop(0)
+        total_bytes -= size
+        try:
+            os.remove(oldest_file)
+        except FileNotFoundError:
+            continue
         print(f"Deleted old audio: {oldest_file}")
 
+def compact_history_audio(wav_path, capture_id=None):
+    """Store a response WAV in the history as HISTORY_CODEC, point the journal at it and drop the WAV."""
+    if HISTORY_CODEC == "wav" and not staging.is_staged(wav_path):
+        return wav_path
+    try:
+        if HISTORY_CODEC == "wav":
+            compact_path = staging.commit(wav_path, AUDIO_DIR)
+        else:
+            compact_path = audio_codec.encode_wav(wav_path, HISTORY_CODEC, AUDIO_DIR)
+    except Exception as e:
+        print(f"Could not store {wav_path} in the history, keeping the WAV: {e}")
+        if not staging.is_staged(wav_path):
+            return wav_path
+        compact_path = staging.commit(wav_path, AUDIO_DIR)  # Keep it on the card, not in tmpfs
+    if capture_id is not None:
+        journal.update(capture_id, audio_path=compact_path)
+    # A player may still have the WAV open; it keeps reading the unlinked file
+    os.remove(wav_path)
+    print(f"Stored history audio: {compact_path} ({os.path.getsize(compact_path) // 1024} KiB)")
+    return compact_path
+
+def discard_response_audio(wav_path, capture_id=None):
+    """Drop a response WAV that is neither played nor kept (partial or empty)."""
+    if capture_id is not None:
+        journal.update(capture_id, audio_path=None)
+    if staging.is_staged(wav_path):
+        staging.release(wav_path)
+    elif os.path.exists(wav_path):
+        os.remove(wav_path)
+
 def keep_last_10_photos(directory):
     """Remove all files in the directory except the 10 most recently modified ones."""
     try:
@@ -166,6 +562,7 @@ def keep_last_10_photos(directory):
 
 def resize_image(image):
     """Resizes image so that the longest side is (x) pixels while maintaining aspect ratio."""
+    from PIL import Image
     max_size = 512
     width, height = image.size
 
@@ -179,26 +576,298 @@ def resize_image(image):
     return image.resize((new_width, new_height), Image.LANCZOS)
 
 def convert_to_small_wav(input_file, output_file):
-    """Convert any WAV to a smaller PCM WAV format."""
+    """Convert a 16-bit PCM WAV to 22050 Hz mono."""
     print(f"Converting {input_file} to a smaller WAV...")
+    from audio_resample import convert_wav
+    convert_wav(input_file, output_file, OUTPUT_SAMPLE_RATE)
+    print(f"Converted to smaller WAV: {output_file}")
+    return output_file
 
-    # Detect format automatically
-    audio = AudioSegment.from_file(input_file, format="wav")  # Auto-detects compressed WAV
+def is_network_error(e):
+    """True for failures worth retrying later (no connection, timeouts, rate limits, server errors)."""
+    import openai
+    return isinstance(e, (openai.APIConnectionError, openai.APITimeoutError,
+                          openai.RateLimitError, openai.InternalServerError,
+                          DeadlineExceeded, CircuitOpenError))
 
-    # Reduce sample rate to 22050 Hz, convert to mono, reduce bit depth
-    audio = audio.set_frame_rate(22050).set_channels(1).set_sample_width(2)
+def describe_image(resized_path, word_limit, trace=None, deadline=None):
+    """Ask the vision model to describe the image; returns the description."""
+    profile = wordiness_profile(word_limit)
 
-    # Export to WAV
-    audio.export(output_file, format="wav")
-    print(f"Converted to smaller WAV: {output_file}")
-    return output_file
+    # Create prompt based on wordiness setting
+    system_prompt = f"""You are standing in for someone who is blind and cannot see.
+        The image provided is taken on a fish-eye lens, DO NOT MENTION ANY CURVED DISTORTION AT THE EDGES OF THE IMAGE.
+        Your response must NOT mention anything that isn't observed in the image and shouldn't be formatted.
+        Objectively note everything you see in the image (do not be poetic).
+        Anything relating to safety should be noted first. If nothing is a safety issue, DO NOT MENTION IT.
+        If there IS text, try to note what it says. If there is no text, DO NOT MENTION IT IN YOUR RESPONSE.
+        If there is money, try to note what value it holds. If there is not money visible, DO NOT MENTION IT.
+        {profile["style"]}
+        Don't go over {word_limit} words."""
+
+    prompt = f"You are standing in for someone who is blind and cannot see.\
+        Your response must NOT mention anything that isn't observed in the image and shouldn't be formatted.\
+        objectively note everything you see in the image (don't get poetic.)\
+        Anything relating to safety should be noted first. If nothing is a safety issue, DO NOT MENTION IT IN YOUR RESPONSE.\
+        If there IS text, try to note what it says. If there is no text, DO NOT MENTION IT IN YOUR RESPONSE.\
+        If there is money, try to note what value it holds. If there is not money visable, DO NOT MENTION IT.\
+        Don't go over {word_limit} words"
+    #prompt = f"You are standing in for someone who is blind and cannot see, \
+    #objectively note everything you see in the image. Don't get too poetic, and don't go over {word_limit} words."
+
+    stage_start = stage_clock()
+    generated_text = vision_completion(
+        resized_path, system_prompt, "gpt-4o", profile["max_tokens"],
+        deadline or Deadline(REQUEST_DEADLINE * profile["time_scale"]),
+        VISION_ATTEMPT_TIMEOUT * profile["time_scale"], vision_latency[profile_level(word_limit)], "vision",
+    )
+    print(f"Generated description: {generated_text}")
+    if trace:
+        trace.add_span("vision", stage_start)
+    return generated_text
+
+def describe_document(resized_path, tile_paths, trace=None, deadline=None):
+    """Read out a document from its overview and full-resolution text tiles."""
+    stage_start = stage_clock()
+    text = vision_completion(
+        resized_path, DOCUMENT_PROMPT, "gpt-4o", DOCUMENT_MAX_TOKENS,
+        deadline or Deadline(REQUEST_DEADLINE * DOCUMENT_TIME_SCALE),
+        VISION_ATTEMPT_TIMEOUT * DOCUMENT_TIME_SCALE, document_latency, "vision", tile_paths,
+    )
+    print(f"Document text: {text}")
+    if trace:
+        trace.add_span("vision", stage_start)
+    return text
+
+def describe_summary(resized_path, deadline=None):
+    """One-sentence, safety-first summary from a small, fast model."""
+    summary = vision_completion(
+        resized_path, SUMMARY_PROMPT, SUMMARY_MODEL, SUMMARY_MAX_TOKENS,
+        deadline or Deadline(REQUEST_DEADLINE / 2), VISION_ATTEMPT_TIMEOUT / 2, summary_latency, "summary",
+    )
+    print(f"Generated summary: {summary}")
+    return summary
+
+def vision_completion(resized_path, system_prompt, model, max_tokens, deadline, attempt_timeout, history, name,
+                      tile_paths=()):
+    """Send the image with a system prompt to a vision model (with retries); returns the text.
+
+    Tiles are sent after the image at high detail; the image then serves as a low-detail overview.
+    """
+    # Create OpenAI client
+    client = get_openai_client()
+
+    # Convert image to base64
+    import base64
+    with open(resized_path, "rb") as img_file:
+        # Encode image properly
+        image_data = base64.b64encode(img_file.read()).decode('utf-8')
+
+    content = [{"type": "text", "text": "Describe this image."},
+               {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data}"}}]
+    if tile_paths:
+        content[1]["image_url"]["detail"] = "low"
+    for tile_path in tile_paths:
+        with open(tile_path, "rb") as tile_file:
+            tile_data = base64.b64encode(tile_file.read()).decode('utf-8')
+        content.append({"type": "image_url",
+                        "image_url": {"url": f"data:image/jpeg;base64,{tile_data}", "detail": "high"}})
+
+    # Use the API with the encoded image
+    def attempt(timeout):
+        return client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": content}
+            ],
+            max_tokens=max_tokens,
+            timeout=timeout,
+        )
 
-def send_request(image_path):
-    """Performs all processing locally: resizes image, uses OpenAI to analyze, and Google TTS for speech."""
+    response = call_with_retry(
+        attempt, deadline, is_network_error, breaker=openai_breaker, name=name,
+        attempt_timeout=attempt_timeout, history=history,
+    )
+
+    # Extract generated text
+    return response.choices[0].message.content
+
+def response_audio_path(capture_id=None):
+    """Path for a new response WAV (capture id keeps names unique)."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if capture_id is not None:
+        return os.path.join(staging.dir(AUDIO_DIR), f"response_{timestamp}_{capture_id}.wav")
+    return os.path.join(staging.dir(AUDIO_DIR), f"response_{timestamp}_{random.randint(1000, 9999)}.wav")
+
+def open_speech_stream(text, timeout, profile):
+    """Start a TTS stream and wait for its first chunk; returns (stream, chunks, first_chunk)."""
+    client = get_openai_client()
+    stream = client.audio.speech.with_streaming_response.create(
+        model=profile["tts_model"], # "tts-1" for speed, "tts-1-hd" for quality
+        voice=TTS_VOICE,
+        input=text,
+        response_format="pcm",  # Raw samples: resampled in memory as they arrive
+        timeout=timeout,
+    )
+    response = stream.__enter__()
+    try:
+        chunks = response.iter_bytes(profile["chunk_size"])
+        first_chunk = next(chunks, b"")
+    except BaseException:
+        stream.__exit__(None, None, None)
+        raise
+    return stream, chunks, first_chunk
+
+def close_speech_stream(opened):
+    """Close a stream returned by open_speech_stream (e.g. the loser of a hedged race)."""
+    opened[0].__exit__(None, None, None)
+
+def synthesize_speech(text, final_wav, trace=None, deadline=None, word_limit=None):
+    """Convert text to speech with OpenAI TTS and write a small WAV to `final_wav`."""
+    word_limit = word_limit or wordiness
+    profile = wordiness_profile(word_limit)
+
+    # Same text and settings as an earlier request: reuse its audio without touching the network
+    stage_start = stage_clock()
+    key = cache_key(text, voice=TTS_VOICE, model=profile["tts_model"], format=TTS_OUTPUT_FORMAT)
+    if tts_cache.get(key, final_wav):
+        metrics_server.cache_hits_total.inc(cache="tts")
+        if trace:
+            trace.add_span("tts_cache", stage_start)
+            trace.set(tts_cache="hit")
+        print(f"Reused cached speech: {final_wav}")
+        return final_wav
+    metrics_server.cache_misses_total.inc(cache="tts")
+
+    # Use OpenAI's Text-to-Speech API with proper streaming
+    stage_start = stage_clock()
+    opened = call_with_retry(
+        lambda timeout: open_speech_stream(text, timeout, profile), deadline or Deadline(REQUEST_DEADLINE * profile["time_scale"]), is_network_error,
+        breaker=openai_breaker, name="tts",
+        attempt_timeout=TTS_FIRST_BYTE_TIMEOUT, history=tts_latency[profile_level(word_limit)],
+        on_discard=close_speech_stream,
+    )
+    if trace:
+        trace.add_span("tts_first_byte", stage_start)
+    try:
+        # Resample each chunk as it arrives and append it to the WAV
+        stream, chunks, first_chunk = opened
+        from audio_resample import StreamResampler
+        resampler = StreamResampler(TTS_PCM_RATE, OUTPUT_SAMPLE_RATE)
+        with wave.open(final_wav, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(OUTPUT_SAMPLE_RATE)
+            # writeframesraw skips the per-chunk header rewrite; close() patches the final length
+            wav.writeframesraw(resampler.process(first_chunk))
+            for chunk in chunks:
+                wav.writeframesraw(resampler.process(chunk))
+            wav.writeframesraw(resampler.flush())
+    finally:
+        close_speech_stream(opened)
+    if trace:
+        trace.add_span("tts", stage_start)
+
+    # Copied to the card in the background (ahead of the history compaction that removes the WAV)
+    history_executor.submit(tts_cache.put, key, final_wav)
+    print(f"Created WAV audio file using OpenAI TTS: {final_wav}")
+    return final_wav
+
+def prepare_summary(resized_path, capture_id, deadline, trace=None):
+    """Summary text and speech for the two-tier mode; returns the summary WAV path."""
+    stage_start = stage_clock()
+    summary = describe_summary(resized_path, deadline)
+    summary_wav = os.path.join(staging.dir(SUMMARY_DIR), f"summary_{capture_id}.wav")
+    synthesize_speech(summary, summary_wav, deadline=deadline, word_limit=50)
+    if trace:
+        trace.add_span("summary", stage_start)
+    return summary_wav
+
+def process_queued_capture(entry):
+    """Finish a queued capture in the background; returns the response audio path."""
+    # Audio already produced (e.g. before a restart): store it like a fresh response
+    audio_path = entry["audio_path"]
+    if audio_path and os.path.exists(audio_path):
+        if audio_path.lower().endswith(".wav"):
+            return compact_history_audio(audio_path, entry["id"])
+        return audio_path
+
+    resized_path = entry["resized_path"]
+    if not resized_path or not os.path.exists(resized_path):
+        raise FileNotFoundError(f"Resized image missing for capture {entry['id']}: {resized_path}")
+
+    # Skip the vision call if the description arrived before TTS failed
+    description = entry["description"]
+    if not description:
+        description = describe_image(resized_path, entry["wordiness"] or wordiness)
+        journal.update(entry["id"], description=description)
+
+    audio_path = synthesize_speech(description, response_audio_path(entry["id"]), word_limit=entry["wordiness"])
+    return compact_history_audio(audio_path, entry["id"])
+
+def announce_deferred_result(entry, audio_path):
+    """Buzz when a queued capture's result lands in the history (only if nothing else is going on)."""
+    manage_audio_files(AUDIO_DIR)
+    if audio_manager.is_playing() or audio_manager.in_playback_mode or app_state.in_audio_playback_mode:
+        return
+    serialHandle.send_serial_command("REQUEST_COMPLETE")
+
+# Drains queued captures once the API is reachable again
+capture_queue = CaptureQueue(
+    journal,
+    process_queued_capture,
+    is_network_error,
+    probe=lambda: tcp_probe(str(get_openai_client().base_url)),
+    on_complete=announce_deferred_result,
+)
+metrics_server.capture_queue_depth.func = capture_queue.pending
+
+def watch_busy():
+    """True while a response, playback or a button press has the user's attention."""
+    return (audio_manager.is_playing() or audio_manager.in_playback_mode or app_state.in_audio_playback_mode
+            or serialHandle.last_command is not None)
+
+scene_watcher = SceneWatcher(
+    lambda: picam2.capture_array("lores"),
+    watch_busy,
+    budget=RateBudget(SCENE_WATCH_PER_MINUTE),
+)
+
+def send_request(image_path, capture_id=None, trace=None, document_frame=None, level=None):
+    """Performs all processing locally: resizes image, uses OpenAI to analyze, and Google TTS for speech.
+
+    With `document_frame` (a full-resolution capture) the text-dense tiles are read out instead.
+    """
     if not image_path:
         print("No image to send, skipping.")
         return
 
+    # Per-stage spans recorded in the trace file and the capture journal
+    if trace is None:
+        trace = tracer.new_cycle(wordiness=wordiness)
+    # Settings for this request (WORD_CNT may change wordiness while it runs)
+    level = wordiness if level is None else level
+    profile = wordiness_profile(level)
+    trace.set(capture_id=capture_id, wordiness=level, max_tokens=profile["max_tokens"], tts_model=profile["tts_model"],
+              playback_speed=playback_speed)
+    finished = threading.Event()
+
+    # One time budget for the vision and TTS calls, retries included
+    time_scale = DOCUMENT_TIME_SCALE if document_frame is not None else profile["time_scale"]
+    deadline = Deadline(REQUEST_DEADLINE * time_scale)
+
+    def finish(status, final=True):
+        # Only the first outcome is recorded (interrupts can race with completion)
+        if finished.is_set():
+            return
+        finished.set()
+        supervisor.release(check_for_interruption)
+        trace.set(status=status)
+        journal.finish(capture_id, status, trace.timings())
+        if final:
+            tracer.finish(trace)
+
     print(f"Processing image: {image_path}")
     
     # Start loading sound loop using AudioManager
@@ -209,45 +878,123 @@ def send_request(image_path):
     
     # Create a flag to track if we've been interrupted
     interrupted = False
+    to_history = False  # Interrupted after the summary: finish the description, but only for the history
+
+    # Two-tier mode state: the summary plays while the full description is still being generated
+    summary_lock = threading.Lock()
+    summary_spoken = threading.Event()  # Summary audio has started
+    summary_done = threading.Event()    # Summary audio finished or was stopped
+    detail_ready = threading.Event()    # Full description audio is ready; a late summary is skipped
 
     # Create a function to check for interruptions
     def check_for_interruption():
         # Check if TAKE_PICTURE command was received during processing
         if serialHandle.last_command == "TAKE_PICTURE":
-            print("Interrupt detected: cancelling request and audio")
+            nonlocal interrupted, to_history
+            if summary_spoken.is_set() and capture_id is not None:
+                # The user heard the summary; this request still finishes the full description,
+                # which lands in the history (PLAY_BACK) instead of being played
+                print("Interrupt after the summary: finishing the description for the history")
+                to_history = True
+                supervisor.release(check_for_interruption)
+            else:
+                print("Interrupt detected: cancelling request and audio")
+                finish(STATUS_INTERRUPTED)
             
             # Stop all audio via AudioManager
             audio_manager.stop_all_audio()
             serialHandle.send_serial_command("STOP_VIBRATION")
             serialHandle.last_command = None
-            nonlocal interrupted
             interrupted = True
             return True
         return False
 
+    def defer():
+        # Network is down or too slow: keep the capture and finish it in the background
+        print(f"Network unavailable, queuing capture {capture_id} for later")
+        finish(STATUS_QUEUED)
+        audio_manager.stop_all_audio()
+        audio_manager.play_sound(QUEUED_SOUND, volume)
+        serialHandle.send_serial_command("STOP_VIBRATION")
+        capture_queue.notify()
+
+    def on_summary_start():
+        trace.mark("first_audio")
+        trace.mark("summary_audio")
+
+    def on_summary_complete():
+        # Keep the loading loop going until the full description is ready
+        with summary_lock:
+            if not detail_ready.is_set() and not finished.is_set() and not to_history:
+                audio_manager.loop_sound("sys_aud/loading.wav", volume)
+        summary_done.set()
+
+    def play_summary(job):
+        # Runs on the summary thread as soon as the summary audio is ready
+        if job.exception() is not None:
+            print(f"Summary unavailable, waiting for the full description: {job.exception()}")
+            return
+        with summary_lock:
+            if detail_ready.is_set() or finished.is_set():
+                return
+            print(f"Playing summary: {job.result()}")
+            audio_manager.stop_all_audio()
+            summary_spoken.set()
+            if not audio_manager.play_sound(job.result(), volume, callback=on_summary_complete,
+                                            on_start=on_summary_start, speed=playback_speed):
+                summary_spoken.clear()
+
     try:
         # Check for interruption before beginning
         if check_for_interruption():
             return
         
-        # Start a thread to periodically check for interruptions
-        interrupt_check_thread = threading.Thread(
-            target=lambda: [time.sleep(0.2), check_for_interruption()] * 150,  # Check every 0.2s for 30s
-            daemon=True
-        )
-        interrupt_check_thread.start()
+        # Have the supervisor check for interruptions every 0.2s until the request finishes
+        supervisor.watch(check_for_interruption)
         
         # Step 1: Load and resize the image
         try:
-            image = Image.open(image_path).convert("RGB")
+            stage_start = stage_clock()
+            from PIL import Image
+            if document_frame is not None:
+                # Subsample before the filter; the overview only needs the layout
+                overview = rectify(document_frame, step=DOCUMENT_OVERVIEW_STEP)
+                image = Image.fromarray(overview)
+            else:
+                image = Image.open(image_path).convert("RGB")
             resized_image = resize_image(image)
             
-            # Save resized image temporarily (optional)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            resized_path = os.path.join(RESIZED_DIR, f"{timestamp}_resized.jpg")
+            # Save resized image temporarily (optional), named after the original
+            base_name = os.path.splitext(os.path.basename(image_path))[0]
+            resized_path = os.path.join(staging.dir(RESIZED_DIR), f"{base_name}_resized.jpg")
             resized_image.save(resized_path, "JPEG")
+            trace.add_span("resize", stage_start)
+            journal.update(capture_id, resized_path=resized_path)
+            # Kept for queued captures; the journal follows the file to the card
+            staging.persist(resized_path, RESIZED_DIR,
+                            on_done=lambda final: journal.update(capture_id, resized_path=final))
+
+            # Document mode: full-resolution crops of the text-dense regions
+            tile_paths = []
+            if document_frame is not None:
+                stage_start = stage_clock()
+                # Pick regions on the overview, then cut them from the full frame
+                import document_tiles
+                step = DOCUMENT_OVERVIEW_STEP
+                boxes = document_tiles.select_tiles(overview, tile_size=document_tiles.DEFAULT_TILE_SIZE // step,
+                                                    stride=1)
+                boxes = [(x * step, y * step, w * step, h * step) for x, y, w, h in boxes]
+                for index, box in enumerate(boxes):
+                    tile = rectify(document_frame, box)
+                    tile_path = os.path.join(staging.dir(RESIZED_DIR), f"{base_name}_tile{index}.jpg")
+                    Image.fromarray(tile).save(tile_path, "JPEG", quality=90)
+                    tile_paths.append(tile_path)
+                trace.add_span("tiles", stage_start)
+                trace.set(tiles=len(tile_paths))
+                print(f"Document mode: sending {len(tile_paths)} tile(s) {boxes}")
         except Exception as e:
             print(f"Error processing image: {e}")
+            finish(STATUS_ERROR)
             audio_manager.stop_all_audio()
             audio_manager.play_error_sound()
             return
@@ -255,126 +1002,94 @@ def send_request(image_path):
         # Check for interruption after image processing
         if check_for_interruption():
             return
+
+        # Two-tier mode: ask for the short summary in parallel with the full description
+        if summary_first and level >= SUMMARY_MIN_WORDINESS and document_frame is None:
+            summary_job = summary_executor.submit(prepare_summary, resized_path, capture_id, deadline, trace)
+            summary_job.add_done_callback(play_summary)
             
         # Step 2: Send to OpenAI API for image description
         try:
-            # Create prompt based on wordiness setting
-            system_prompt = f"""You are standing in for someone who is blind and cannot see.
-                The image provided is taken on a fish-eye lens, DO NOT MENTION ANY CURVED DISTORTION AT THE EDGES OF THE IMAGE.
-                Your response must NOT mention anything that isn't observed in the image and shouldn't be formatted.
-                Objectively note everything you see in the image (do not be poetic).
-                Anything relating to safety should be noted first. If nothing is a safety issue, DO NOT MENTION IT.
-                If there IS text, try to note what it says. If there is no text, DO NOT MENTION IT IN YOUR RESPONSE.
-                If there is money, try to note what value it holds. If there is not money visible, DO NOT MENTION IT.
-                Don't go over {wordiness} words."""
-
-            prompt = f"You are standing in for someone who is blind and cannot see.\
-                Your response must NOT mention anything that isn't observed in the image and shouldn't be formatted.\
-                objectively note everything you see in the image (don't get poetic.)\
-                Anything relating to safety should be noted first. If nothing is a safety issue, DO NOT MENTION IT IN YOUR RESPONSE.\
-                If there IS text, try to note what it says. If there is no text, DO NOT MENTION IT IN YOUR RESPONSE.\
-                If there is money, try to note what value it holds. If there is not money visable, DO NOT MENTION IT.\
-                Don't go over {wordiness} words"
-            #prompt = f"You are standing in for someone who is blind and cannot see, \
-            #objectively note everything you see in the image. Don't get too poetic, and don't go over {wordiness} words."
-            
-            # Create OpenAI client
-            client = openai.OpenAI(api_key=OPENAI_API_KEY)
-            
-            # Convert image to base64
-            import base64
-            with open(resized_path, "rb") as img_file:
-                # Encode image properly
-                image_data = base64.b64encode(img_file.read()).decode('utf-8')
-                
-                # Use the API with the encoded image
-                response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": "Describe this image."},
-                                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data}"}}
-                            ]
-                        }
-                    ],
-                    max_tokens=300,
-                )
-                
-            # Extract generated text
-            generated_text = response.choices[0].message.content
-            print(f"Generated description: {generated_text}")
+            if document_frame is not None:
+                generated_text = describe_document(resized_path, tile_paths, trace, deadline)
+            else:
+                generated_text = describe_image(resized_path, level, trace, deadline)
+            journal.update(capture_id, description=generated_text)
             
         except Exception as e:
             print(f"Error analyzing image with OpenAI: {e}")
+            metrics_server.api_errors_total.inc(api="vision")
+            if is_network_error(e) and capture_id is not None:
+                defer()
+                return
+            finish(STATUS_ERROR)
             audio_manager.stop_all_audio()
             audio_manager.play_error_sound()
             return
             
         # Check for interruption after OpenAI processing
-        if check_for_interruption():
+        if check_for_interruption() and not to_history:
             return
             
         # Step 3: Convert text to speech using OpenAI TTS
+        audio_path = response_audio_path(capture_id)
         try:
-            # Create the final WAV file name
-            final_wav = os.path.join(AUDIO_DIR, f"response_{random.randint(1000, 9999)}.wav")
-            
-            # Use OpenAI's Text-to-Speech API with proper streaming
-            with client.audio.speech.with_streaming_response.create(
-                model="tts-1", # You can also use "tts-1-hd" for higher quality
-                voice="nova",  # Options: "alloy", "echo", "fable", "onyx", "nova", "shimmer"
-                input=generated_text,
-            ) as response:
-                # Stream the response to a file
-                with open(final_wav, "wb") as f:
-                    for chunk in response.iter_bytes():
-                        f.write(chunk)
-            
-            # Optimize the WAV file if needed using pydub
-            try:
-                # Load and optimize the audio
-                audio = AudioSegment.from_file(final_wav)
-                
-                # Convert to smaller WAV with optimized settings
-                audio = audio.set_frame_rate(22050).set_channels(1).set_sample_width(2)
-                
-                # Save the optimized version back to the same file
-                audio.export(final_wav, format="wav")
-                print(f"Optimized WAV file: {final_wav}")
-            except Exception as e:
-                print(f"Warning: Could not optimize WAV file, using original: {e}")
-                # Continue with the original file since it should still work
-            
-            final_audio = final_wav
-            print(f"Created WAV audio file using OpenAI TTS: {final_wav}")
+            final_audio = synthesize_speech(generated_text, audio_path, trace, deadline, level)
+            journal.update(capture_id, audio_path=final_audio)
             
         except Exception as e:
             print(f"Error generating speech with OpenAI TTS: {e}")
+            discard_response_audio(audio_path)  # Whatever part of the WAV was written
+            metrics_server.api_errors_total.inc(api="tts")
+            if is_network_error(e) and capture_id is not None:
+                defer()
+                return
+            finish(STATUS_ERROR)
             audio_manager.stop_all_audio()
             audio_manager.play_error_sound()
             return
     
     except Exception as e:
         print(f"General error during processing: {e}")
+        finish(STATUS_ERROR)
         audio_manager.stop_all_audio()
         audio_manager.play_error_sound()
         return
 
+    # Let a summary that is already playing finish before the full description
+    with summary_lock:
+        detail_ready.set()
+    if summary_spoken.is_set():
+        summary_done.wait()
+
     # After all processing finishes
     print("Processing completed, stopping loading sound")
     audio_manager.stop_all_audio()
     
+    def keep_for_history():
+        # The user moved on after the summary: store the description and buzz (if nothing else is going on)
+        print("Description stored in the history")
+        finish(STATUS_COMPLETE)
+        history_executor.submit(compact_history_audio, final_audio, capture_id)
+        audio_manager.in_playback_mode = False
+        announce_deferred_result(None, final_audio)
+
     # Check for interruption again after processing
     if interrupted or check_for_interruption():
+        if to_history:
+            keep_for_history()
+            return
         print("Interrupted: skipping response playback")
+        finish(STATUS_INTERRUPTED)
+        # Still kept in the history (moved out of staging)
+        history_executor.submit(compact_history_audio, final_audio, capture_id)
         return
 
     # Verify file exists before playing
     if not os.path.exists(final_audio) or os.path.getsize(final_audio) < 100:
         print(f"WARNING: Audio file missing or too small: {final_audio}")
+        finish(STATUS_ERROR)
+        history_executor.submit(discard_response_audio, final_audio, capture_id)  # After its TTS cache copy
         audio_manager.play_error_sound()
         return
     
@@ -383,12 +1098,33 @@ def send_request(image_path):
     
     # Final interruption check before playing
     if check_for_interruption():
+        if to_history:
+            keep_for_history()
+            return
         print("Interrupted just before playback: cancelling playback")
+        history_executor.submit(compact_history_audio, final_audio, capture_id)
         return
         
+    # The trace record is written once: when the audio starts, or when playback ends before it does
+    trace_once = threading.Lock()
+
+    def finish_trace(**meta):
+        if not trace_once.acquire(blocking=False):
+            return False
+        tracer.finish(trace, **meta)
+        return True
+
     # Define callback for when audio completes
     def on_audio_complete():
         print("Audio playback completed - ready for next command")
+        finish_trace(status="stopped_before_audio")
+
+    # Define callback for when the player starts writing samples
+    def on_audio_start():
+        trace.mark("detail_audio" if summary_spoken.is_set() else "first_audio")
+        journal.update(capture_id, timings=trace.timings())
+        if finish_trace():
+            print(tracer.summary_line())
         
     # Send serial command to indicate request is complete and playback starting
     serialHandle.send_serial_command("REQUEST_COMPLETE")
@@ -401,31 +1137,90 @@ def send_request(image_path):
     
     # Get current volume if available, or use default
     volume = volume_control.get_volume() if has_volume_control and volume_encoder else 87
-    if audio_manager.play_sound(final_audio, volume, callback=on_audio_complete):
+    trace.mark("playback_start")
+    finish(STATUS_COMPLETE, final=False)
+    if audio_manager.play_sound(final_audio, volume, callback=on_audio_complete, on_start=on_audio_start,
+                                speed=playback_speed):
         print("SUCCESS: Response audio playback started")
     else:
         print("ERROR: Failed to start response audio playback")
+        finish_trace(status="playback_failed")
         audio_manager.in_playback_mode = False
+
+    # The history keeps a compact copy; the player already has the WAV open
+    history_executor.submit(compact_history_audio, final_audio, capture_id)
         
-    # Cleanup photos
-    keep_last_10_photos(ORIGINALS_DIR)
+    # The network is working: a good time to drain anything queued
+    capture_queue.notify()
+
+    # Cleanup old audio (photos are pruned as they reach the card)
     manage_audio_files(AUDIO_DIR)
+    manage_audio_files(staging.dir(SUMMARY_DIR), 3)
 
-def take_picture():
-    """Triggered by TAKE_PICTURE command."""
+def release_capture_files(image_path, document=False, capture_id=None):
+    """Drop the staged images (and summary speech) of a capture once its request is done with them."""
+    if not staging.is_staged(image_path):
+        return
+    if not document:
+        staging.release(image_path)  # Document originals are released by the thread saving them
+    base_name = os.path.splitext(os.path.basename(image_path))[0]
+    resized_dir = staging.dir(RESIZED_DIR)
+    for name in os.listdir(resized_dir):
+        if name.startswith(base_name + "_"):
+            staging.release(os.path.join(resized_dir, name))
+    if capture_id is not None:
+        # Stopped or finished by the time the request returns (a player keeps reading the unlinked file);
+        # queued behind its copy into the TTS cache
+        summary_wav = os.path.join(staging.dir(SUMMARY_DIR), f"summary_{capture_id}.wav")
+        history_executor.submit(staging.release, summary_wav)
+
+def take_picture(received_at=None, level=None, source="button"):
+    """Triggered by TAKE_PICTURE command (or a scene-watch change, with source="watch")."""
     serialHandle.last_command = None
     print("Taking picture...")
+    level = wordiness if level is None else level
+
+    # The cycle starts when the serial command arrived
+    trace = tracer.new_cycle(start=received_at, wordiness=level, source=source)
+    if received_at is not None:
+        trace.add_span("serial_receive" if source == "button" else "watch_trigger", received_at)
 
-    image_path = capture_image()
+    # Scene watch gives quick ambient descriptions, never a document read-out
+    document = document_mode and source == "button"
+    trace.set(document=document)
+    image_path, frame = capture_image(trace, document, shutter=source == "button")
+    if source == "button":
+        # Don't describe the scene the user just asked about again
+        scene_watcher.rebase()
     if serialHandle.last_command == "TAKE_PICTURE":
         print("Another TAKE_PICTURE came in, skipping request.")
         serialHandle.last_command = None
+        tracer.finish(trace, status="skipped")
+        release_capture_files(image_path, document)
         return False
 
+    # A frame this dark would only come back as "the image is black"; tell the user right away
+    import exposure
+    if exposure.too_dark(frame, DARK_LEVEL):
+        print("Image too dark, not sending it")
+        if source == "button":
+            volume = volume_control.get_volume() if has_volume_control and volume_encoder else 88
+            audio_manager.play_sound(TOO_DARK_SOUND, volume)
+            serialHandle.send_serial_command("REQUEST_COMPLETE")
+        tracer.finish(trace, status="too_dark")
+        release_capture_files(image_path, document)
+        return False
+
+    # Record the capture so its image, text and audio stay linked (the original's place on the card)
+    capture_id = journal.start_capture(os.path.join(ORIGINALS_DIR, os.path.basename(image_path)), level)
+
     # Set the playback mode true as we're about to start a response cycle
     audio_manager.in_playback_mode = True
     
-    send_request(image_path)
+    try:
+        send_request(image_path, capture_id, trace, frame if document else None, level)
+    finally:
+        release_capture_files(image_path, document, capture_id)
     
     # Return True to indicate we've started a capture-to-response cycle
     return True
@@ -444,10 +1239,18 @@ def stop_process():
 
 def get_sorted_audio_files():
     """Returns a list of audio files in the AUDIO_DIR sorted by modification time (newest first)."""
+    # Prefer the journal so we don't have to re-scan the directory
+    try:
+        audio_files = journal.recent_audio(MAX_AUDIO_FILES)
+        if audio_files:
+            return audio_files
+    except Exception as e:
+        print(f"Error reading capture journal: {e}")
+
     audio_files = []
     try:
         for file in os.listdir(AUDIO_DIR):
-            if file.lower().endswith('.wav') and 'response_' in file:
+            if file.lower().endswith(HISTORY_EXTENSIONS) and 'response_' in file:
                 file_path = os.path.join(AUDIO_DIR, file)
                 audio_files.append(file_path)
         
@@ -458,6 +1261,31 @@ def get_sorted_audio_files():
         print(f"Error getting audio files: {e}")
         return []
 
+def play_history_entry(file_path, position, total, volume):
+    """Play a history response after its "N of M" announcement, from where it was last left."""
+    try:
+        saved = journal.resume_position(file_path)
+    except Exception as e:
+        print(f"Could not read resume position: {e}")
+        saved = 0
+    start = max(0, saved - int(RESUME_REWIND * announcer.rate))
+    if start:
+        print(f"Resuming at {start / announcer.rate:.1f} s")
+
+    def on_end(sample):
+        # Stopped during the intro or the rewound part: the saved position still stands
+        # (saving `start` would rewind again on every re-entry)
+        if sample is not None and sample <= saved:
+            return
+        try:
+            journal.save_position(file_path, sample or 0)
+        except Exception as e:
+            print(f"Could not save resume position: {e}")
+
+    # Decoded at the announcement rate, so positions are in samples at that rate
+    audio_manager.play_sound(file_path, volume, speed=playback_speed, intro=announcer.compose(position, total),
+                             start=start, on_end=on_end)
+
 def enter_playback_mode():
     """Enter audio file playback navigation mode."""
     print("Entering audio playback mode...")
@@ -473,15 +1301,21 @@ def enter_playback_mode():
         serialHandle.send_serial_command("READY")
         return False
     
-    # Reset playback index
-    app_state.current_playback_index = 0
+    # Start at the response that was left partway through, if it's still there, else the newest
+    try:
+        interrupted = journal.last_interrupted()
+    except Exception as e:
+        print(f"Could not read resume positions: {e}")
+        interrupted = None
+    app_state.current_playback_index = audio_files.index(interrupted) if interrupted in audio_files else 0
     
     # Play the first file
     if audio_files:
-        print(f"Playing audio file ({app_state.current_playback_index + 1}/{len(audio_files)}): {audio_files[0]}")
+        file_to_play = audio_files[app_state.current_playback_index]
+        print(f"Playing audio file ({app_state.current_playback_index + 1}/{len(audio_files)}): {file_to_play}")
         # Get current volume if available, or use default
         volume = volume_control.get_volume() if has_volume_control and volume_encoder else 87
-        audio_manager.play_sound(audio_files[0], volume)
+        play_history_entry(file_to_play, app_state.current_playback_index + 1, len(audio_files), volume)
         return True
     return False
 
@@ -505,7 +1339,7 @@ def handle_playback_navigation(direction):
     print(f"Playing audio file ({app_state.current_playback_index + 1}/{len(audio_files)}): {file_to_play}")
     # Get current volume if available, or use default
     volume = volume_control.get_volume() if has_volume_control and volume_encoder else 87
-    audio_manager.play_sound(file_to_play, volume)
+    play_history_entry(file_to_play, app_state.current_playback_index + 1, len(audio_files), volume)
 
 def exit_playback_mode():
     """Exit audio file playback navigation mode."""
@@ -519,6 +1353,7 @@ def main_loop():
 
     while True:
         cmd = serialHandle.last_command
+        cmd_time = serialHandle.last_command_time
         
         # Handle playback mode differently
         if app_state.in_audio_playback_mode:
@@ -554,7 +1389,7 @@ def main_loop():
             else:
                 # Only take a picture if we're not in playback mode
                 print("Taking a new picture...")
-                take_picture()
+                take_picture(cmd_time)
                 
         elif cmd == "STOP_PROCESS":
             serialHandle.last_command = None
@@ -582,6 +1417,29 @@ def main_loop():
             else:
                 print("Volume control not available")
             
+        elif cmd == "DOCUMENT_MODE":
+            serialHandle.last_command = None
+            global document_mode
+            document_mode = not document_mode
+            print(f"Document mode {'on' if document_mode else 'off'}")
+            serialHandle.send_serial_command("REQUEST_COMPLETE")  # Haptic acknowledgement
+
+        elif cmd == "SCENE_WATCH":
+            serialHandle.last_command = None
+            if scene_watcher.running:
+                scene_watcher.stop()
+            else:
+                scene_watcher.start()
+            serialHandle.send_serial_command("REQUEST_COMPLETE")  # Haptic acknowledgement
+
+        elif cmd == "PLAYBACK_SPEED":
+            serialHandle.last_command = None
+            global playback_speed
+            faster = [speed for speed in PLAYBACK_SPEEDS if speed > playback_speed]
+            playback_speed = faster[0] if faster else PLAYBACK_SPEEDS[0]
+            print(f"Playback speed {playback_speed}x")
+            serialHandle.send_serial_command("REQUEST_COMPLETE")  # Haptic acknowledgement
+
         elif cmd == "PLAY_BACK":
             serialHandle.last_command = None
             enter_playback_mode()
@@ -610,13 +1468,24 @@ def main_loop():
                 audio_manager.play_sound("sys_aud/wordiness/tiny.wav", volume)
             print(f"Set wordiness to: {wordiness}")
             serialHandle.send_serial_command(f"WORDINESS_{wordiness}")
+
+        elif cmd is None and scene_watcher.triggered.is_set():
+            triggered_at = scene_watcher.triggered_at
+            scene_watcher.acknowledge()
+            if not watch_busy():
+                metrics_server.scene_watch_triggers_total.inc()
+                take_picture(triggered_at, SCENE_WATCH_WORDINESS, source="watch")
             
         time.sleep(0.1)
 
 if __name__ == "__main__":
     try:
+        # Bring up devices and clients in parallel
+        startup()
         # Start serial listener
         serialHandle.start_serial_listener()
+        # Start the local metrics endpoint
+        metrics_server.start_metrics_server()
         # Run main loop
         main_loop()
     except KeyboardInterrupt:
@@ -636,5 +1505,21 @@ if __name__ == "__main__":
             
         # Close serial connection if open
         serialHandle.stop_serial()
+
+        # Stop draining queued captures (they stay queued in the journal)
+        capture_queue.stop()
+
+        # Stop watching for scene changes
+        if scene_watcher.running:
+            scene_watcher.stop()
+
+        # Finish copying staged files to the card (the copies update the journal)
+        staging.close()
+
+        # Close the capture journal
+        journal.close()
+
+        # Stop the metrics endpoint
+        metrics_server.stop_metrics_server()
         
         print("Cleanup complete. Exiting.")
\ No newline at end of file
@@ -0,0 +1,243 @@
+# remote_call.py
+import threading
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import metrics_server
+from latency_trace import percentile
+
+# Defaults
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 0.5      # Seconds; backoff doubles per attempt
+DEFAULT_MAX_DELAY = 4.0       # Cap on a single backoff sleep
+DEFAULT_FAILURE_THRESHOLD = 5 # Consecutive failures before the circuit opens
+DEFAULT_RESET_TIMEOUT = 30.0  # Seconds the circuit stays open before a trial call
+DEFAULT_HEDGE_PERCENTILE = 95 # Hedge once the first attempt is slower than this percentile
+DEFAULT_HEDGE_MIN = 2.0       # ...but never sooner than this (seconds)
+
+# Circuit breaker states
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+api_retries_total = metrics_server.registry.counter(
+    "bcam_api_retries_total", "Remote API calls retried after a retryable error.", ["api"])
+api_hedges_total = metrics_server.registry.counter(
+    "bcam_api_hedged_requests_total", "Hedged requests sent because the first attempt stalled.", ["api"])
+circuit_open = metrics_server.registry.gauge(
+    "bcam_api_circuit_open", "1 while the circuit breaker for a backend is open.", ["api"])
+
+# Runs attempts only when a call is hedged (normal calls run on the caller's thread)
+hedge_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="remote-call")
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before a call succeeded."""
+
+
+class CircuitOpenError(Exception):
+    """The backend has been failing; calls are refused until the reset timeout passes."""
+
+
+class Deadline:
+    """Time budget shared by every attempt of a request."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+class LatencyWindow:
+    """Rolling durations of successful attempts, used to decide when an attempt has stalled."""
+
+    def __init__(self, window=100):
+        self.values = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.values.append(seconds)
+
+    def percentile(self, pct, min_count=10):
+        """Seconds, or None until `min_count` attempts were recorded."""
+        with self.lock:
+            values = list(self.values)
+        if len(values) < min_count:
+            return None
+        return percentile(values, pct)
+
+
+class CircuitBreaker:
+    """Fails fast after repeated failures, then lets one trial call through after a cool-down."""
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        circuit_open.set(0, api=name)
+
+    def allow(self):
+        """True if a call may be made now."""
+        with self.lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = CIRCUIT_HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == CIRCUIT_HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                print(f"Circuit {self.name}: trying the backend again")
+                return True
+            return False
+
+    def record_success(self):
+        """The backend answered (even with a non-retryable error)."""
+        with self.lock:
+            if self.state != CIRCUIT_CLOSED:
+                print(f"Circuit {self.name}: closed")
+            self.state = CIRCUIT_CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+        circuit_open.set(0, api=self.name)
+
+    def record_failure(self):
+        """A retryable failure (connection error, timeout, 429/5xx)."""
+        with self.lock:
+            self.failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    print(f"Circuit {self.name}: open after {self.failures} failure(s)")
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+                self.trial_in_flight = False
+                circuit_open.set(1, api=self.name)
+
+
+def backoff_delay(attempt, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+    """Full-jitter exponential backoff for the given (0-based) retry."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def _discard(future, on_discard):
+    """Release the result of an attempt that lost a hedge race."""
+    if on_discard is None or future.cancelled() or future.exception() is not None:
+        return
+    try:
+        on_discard(future.result()[0])
+    except Exception as e:
+        print(f"Error discarding hedged result: {e}")
+
+
+def _timed(func, timeout):
+    start = time.monotonic()
+    result = func(timeout)
+    return result, time.monotonic() - start
+
+
+def _run_hedged(func, timeout, hedge_after, on_discard, name):
+    """Run func(timeout); if it hasn't returned after `hedge_after` seconds, race a second attempt.
+
+    Returns (result, seconds the winning attempt took).
+    """
+    if not hedge_after or hedge_after >= timeout:
+        return _timed(func, timeout)
+
+    first = hedge_executor.submit(_timed, func, timeout)
+    done, _ = wait([first], timeout=hedge_after)
+    if done:
+        return first.result()
+
+    print(f"{name}: no answer after {hedge_after:.1f}s, sending a hedged request")
+    api_hedges_total.inc(api=name)
+    pending = {first, hedge_executor.submit(_timed, func, max(0.1, timeout - hedge_after))}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winner = None
+        for future in done:
+            if future.exception() is None and winner is None:
+                winner = future
+            elif future.exception() is None:
+                _discard(future, on_discard)
+            else:
+                error = future.exception()
+        if winner is not None:
+            for future in pending:
+                future.add_done_callback(lambda f: _discard(f, on_discard))
+            return winner.result()
+    raise error
+
+
+def call_with_retry(func, deadline, is_retryable, breaker=None, name="api",
+                    max_attempts=DEFAULT_MAX_ATTEMPTS, attempt_timeout=None, history=None,
+                    hedge_percentile=DEFAULT_HEDGE_PERCENTILE, hedge_min=DEFAULT_HEDGE_MIN,
+                    on_discard=None):
+    """Call func(timeout) until it succeeds, a non-retryable error occurs or the deadline runs out.
+
+    Args:
+        func: Makes one attempt; `timeout` is the seconds it may take
+        deadline: Deadline shared by all attempts
+        is_retryable: is_retryable(exception) -> worth another attempt?
+        breaker: Optional CircuitBreaker for the backend
+        attempt_timeout: Upper bound for a single attempt (the deadline still applies)
+        history: Optional LatencyWindow; once it has enough samples, a first attempt slower
+            than its `hedge_percentile` (at least `hedge_min` seconds) is raced by a second one
+        on_discard: Called with the result of a hedged attempt that lost the race
+    """
+    hedge_after = None
+    if history:
+        threshold = history.percentile(hedge_percentile)
+        if threshold is not None:
+            hedge_after = max(hedge_min, threshold)
+
+    last_error = None
+    for attempt in range(max_attempts):
+        if breaker and not breaker.allow():
+            raise CircuitOpenError(f"{name}: backend unavailable, not calling")
+
+        timeout = deadline.remaining()
+        if attempt_timeout:
+            timeout = min(timeout, attempt_timeout)
+        if timeout <= 0:
+            break
+
+        try:
+            result, seconds = _run_hedged(func, timeout, hedge_after if attempt == 0 else None, on_discard, name)
+        except Exception as e:
+            last_error = e
+            if not is_retryable(e):
+                if breaker:
+                    breaker.record_success()
+                raise
+            if breaker:
+                breaker.record_failure()
+            if attempt + 1 >= max_attempts:
+                break
+            delay = min(backoff_delay(attempt), deadline.remaining())
+            print(f"{name}: attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+            api_retries_total.inc(api=name)
+            time.sleep(delay)
+            continue
+
+        if breaker:
+            breaker.record_success()
+        if history:
+            history.record(seconds)
+        return result
+
+    if last_error is not None and not deadline.expired():
+        raise last_error
+    raise DeadlineExceeded(f"{name}: no result within {deadline.seconds:.0f}s") from last_error
@@ -0,0 +1,135 @@
+# scene_watch.py
+# Hands-free mode: watches low-resolution frames and asks for a description only when the scene changes.
+import threading
+import time
+
+# Frames are numpy arrays; only their methods are used, so numpy itself isn't imported at boot
+
+# Defaults
+DEFAULT_INTERVAL = 0.5      # Seconds between sampled frames
+DEFAULT_THRESHOLD = 0.06    # Change score (0-1) against the last described scene that counts as new
+DEFAULT_STABLE = 0.03       # ...and the scene must have stopped moving (score against the previous sample)
+DEFAULT_PER_MINUTE = 3.0    # Rate budget: descriptions per minute
+DEFAULT_BURST = 2           # Descriptions allowed back to back before the budget applies
+THUMB_SIZE = (18, 32)       # Rows, columns of the comparison thumbnail
+
+
+def thumbnail(frame, size=THUMB_SIZE):
+    """Block-averaged luma thumbnail with the mean removed (exposure shifts don't count as change).
+
+    Accepts RGB frames and Picamera2's YUV420 lores arrays (the Y plane is the top two thirds).
+    """
+    if frame.ndim == 3:
+        luma = frame[..., 1]  # Green stands in for luma
+    else:
+        luma = frame[:frame.shape[0] * 2 // 3]
+    rows, cols = size
+    block_r, block_c = max(1, luma.shape[0] // rows), max(1, luma.shape[1] // cols)
+    luma = luma[:block_r * rows, :block_c * cols].astype("float32")
+    thumb = luma.reshape(rows, block_r, cols, block_c).mean(axis=(1, 3))
+    return thumb - thumb.mean()
+
+
+def change_score(a, b):
+    """Mean absolute difference of two thumbnails, 0 (same) to about 1."""
+    return float(abs(a - b).mean() / 255.0)
+
+
+class RateBudget:
+    """Token bucket: `per_minute` events on average, at most `burst` at once."""
+
+    def __init__(self, per_minute=DEFAULT_PER_MINUTE, burst=DEFAULT_BURST):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_take(self):
+        """Use one token if available."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class SceneWatcher:
+    """Samples a camera stream on a background thread and sets `triggered` when the scene has changed.
+
+    The owner describes the scene, then calls `acknowledge()`. Nothing is triggered while `is_busy()`
+    returns True or the rate budget is used up; the change stays pending until it can be described.
+    """
+
+    def __init__(self, capture_frame, is_busy, interval=DEFAULT_INTERVAL, threshold=DEFAULT_THRESHOLD,
+                 stable=DEFAULT_STABLE, budget=None):
+        self.capture_frame = capture_frame
+        self.is_busy = is_busy
+        self.interval = interval
+        self.threshold = threshold
+        self.stable = stable
+        self.budget = budget or RateBudget()
+        self.triggered = threading.Event()
+        self.triggered_at = None
+        self.last_score = 0.0
+        self.reference = None  # Thumbnail of the last described scene
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self.stop_event.clear()
+        self.reference = None
+        self.thread = threading.Thread(target=self._run, name="scene-watch", daemon=True)
+        self.thread.start()
+        print("Scene watch started")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+        self.triggered.clear()
+        print("Scene watch stopped")
+
+    def rebase(self):
+        """Treat the next sampled frame as already described (e.g. after a manual capture)."""
+        self.reference = None
+
+    def acknowledge(self):
+        """The triggered change was handled (or dropped)."""
+        self.triggered_at = None
+        self.triggered.clear()
+
+    def _run(self):
+        previous = None
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            try:
+                thumb = thumbnail(self.capture_frame())
+            except Exception as e:
+                print(f"Scene watch: error reading frame: {e}")
+                self.stop_event.wait(self.interval * 4)
+                continue
+
+            if self.reference is None:
+                self.reference = thumb
+            elif not self.triggered.is_set() and not self.is_busy():
+                self.last_score = change_score(thumb, self.reference)
+                settled = previous is not None and change_score(thumb, previous) <= self.stable
+                if self.last_score >= self.threshold and settled and self.budget.try_take():
+                    print(f"Scene watch: scene changed (score {self.last_score:.3f})")
+                    self.reference = thumb
+                    self.triggered_at = time.monotonic()
+                    self.triggered.set()
+            previous = thumb
+
+            self.stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
@@ -1,33 +1,352 @@
-import serial
+from collections import deque
 import threading
+import time
+import os
+
+# Real UART on the Pi, pty-backed Arduino stand-in in simulation
+import hardware
+
+# Framed link (sequence numbers, firmware timestamps, CRC, acks) negotiated with the firmware
+import serial_frames as frames
 
 # Global variable to track last received command
-last_command = None  
+last_command = None
+last_command_time = None  # time.monotonic() when last_command was received (pressed, on the framed link)
 command_lock = threading.Lock()
 
-# Initialize serial connection
-ser = serial.Serial('/dev/ttyS0', 19200, timeout=1)
+# Serial connection (opened by open_serial() so startup can do it in parallel)
+SERIAL_PORT = '/dev/ttyS0'
+SERIAL_BAUD = 19200  # Text protocol, and where every session starts
+ser = None
+
+# Framed protocol (BCAM_SERIAL_FRAMED=0 stays on text lines)
+SERIAL_FRAMED = os.environ.get("BCAM_SERIAL_FRAMED", "1") != "0"
+FRAMED_BAUD = int(os.environ.get("BCAM_SERIAL_BAUD", "115200"))
+NEGOTIATE_TIMEOUT = 0.3   # Wait for FRAMED_OK (older firmware never answers)
+ACK_TIMEOUT = 0.1         # Resend a command frame after this long without its ack...
+MAX_TRIES = 4             # ...this many times, then assume the Arduino reset and fall back to text
+KEEPALIVE_INTERVAL = 2.0  # Idle HELLO frames: notice a reset Arduino, keep the clock mapping fresh
+MAX_FRAMING_FAILURES = 3  # Stay on text after losing the framed link this many times
+framed = False
+framing_failures = 0
+port_lock = threading.Lock()  # Writes and baud changes
+clock = frames.ClockMapper()
+link_stats = {"lost": 0, "duplicates": 0, "retransmits": 0, "bad_frames": 0}
+
+# Outgoing commands: callers only queue them, one writer thread owns ser.write
+MAX_PENDING = 32  # Oldest commands are dropped past this (the link is gone or stuck)
+LATEST_ONLY_PREFIXES = ("WORDINESS_",)  # Only the newest pending command with this prefix is sent
+pending_commands = deque()
+pending_cond = threading.Condition()
+writer_busy = False  # Writer holds a batch it hasn't finished writing
+writer_thread = None
+tx_seq = 0
+seq_lock = threading.Lock()  # The writer and the listener (_enter_framed) both number frames
+unacked = {}  # seq -> [frame, command, last sent, tries] for command frames (guarded by pending_cond)
+last_sent = 0.0
+last_event_seq = None  # Sequence number of the last event from the Arduino
+
+def open_serial():
+    """Opens the serial connection if it isn't open yet (and switches to frames if the firmware can)."""
+    global ser
+    if ser is None:
+        ser = hardware.open_serial(SERIAL_PORT, SERIAL_BAUD, timeout=1)
+        if SERIAL_FRAMED:
+            negotiate_framing()
+    return ser
+
+def _write(data):
+    with port_lock:
+        ser.write(data)
+
+def _next_seq():
+    global tx_seq
+    with seq_lock:
+        tx_seq = (tx_seq + 1) & 0xFF
+        return tx_seq
+
+def _track(frame, command):
+    """Register a command/HELLO frame for resending until its ack arrives."""
+    with pending_cond:
+        unacked[frame[2]] = [frame, command, time.monotonic(), 1]
+
+def negotiate_framing():
+    """Ask the Arduino for the framed protocol (before the listener runs); text lines stay if it doesn't answer."""
+    reply = f"{frames.NEGOTIATE_OK}{FRAMED_BAUD}"
+    _write(f"{frames.NEGOTIATE}{FRAMED_BAUD}\n".encode('utf-8'))
+    deadline = time.monotonic() + NEGOTIATE_TIMEOUT
+    partial = b""
+    try:
+        while time.monotonic() < deadline:
+            ser.timeout = max(0.01, deadline - time.monotonic())
+            partial += ser.readline()
+            if not partial.endswith(b"\n"):
+                continue
+            line, partial = partial.decode('utf-8', errors='ignore').strip(), b""
+            if line == reply:
+                _enter_framed()
+                return True
+            if line:
+                handle_text_line(line)  # A press that came in meanwhile
+        # No answer: older firmware, or one still framed from before this program restarted
+        return _probe_framed()
+    finally:
+        ser.timeout = 1
+
+def _probe_framed():
+    """Check whether the Arduino is already talking frames at FRAMED_BAUD."""
+    global framed
+    seq = _next_seq()
+    with port_lock:
+        ser.baudrate = FRAMED_BAUD
+        ser.write(frames.encode(frames.HELLO, seq, 0))
+    parser = frames.FrameParser()
+    deadline = time.monotonic() + NEGOTIATE_TIMEOUT
+    while time.monotonic() < deadline:
+        ser.timeout = max(0.01, deadline - time.monotonic())
+        for frame in parser.feed(ser.read(frames.FRAME_LENGTH)):
+            if frame.type == frames.ACK and frame.seq == seq:
+                clock.observe(frame.ms, time.monotonic())
+                framed = True
+                print(f"Arduino link: framed protocol at {FRAMED_BAUD} baud (already active)")
+                return True
+    with port_lock:
+        ser.baudrate = SERIAL_BAUD
+        ser.write(b"\n")  # Ends the line of noise the probe left on text-only firmware
+    print(f"Arduino link: text protocol at {SERIAL_BAUD} baud")
+    return False
+
+def _enter_framed():
+    global framed, last_event_seq, clock
+    with port_lock:
+        ser.baudrate = FRAMED_BAUD
+        framed = True
+    last_event_seq = None
+    clock = frames.ClockMapper()  # A reset Arduino restarts millis()
+    print(f"Arduino link: framed protocol at {FRAMED_BAUD} baud")
+    # Confirms the switch on the Arduino side (it falls back to text if no frame arrives)
+    frame = frames.encode(frames.HELLO, _next_seq(), 0, ms=int(time.monotonic() * 1000))
+    _track(frame, "HELLO")
+    _write(frame)
+
+def _fall_back_to_text():
+    """The Arduino stopped acknowledging (reset?): back to text, and ask for frames again."""
+    global framed, framing_failures
+    framing_failures += 1
+    with pending_cond:
+        unacked.clear()
+        pending_cond.notify_all()
+    with port_lock:
+        framed = False
+        ser.baudrate = SERIAL_BAUD
+        if framing_failures < MAX_FRAMING_FAILURES:
+            ser.write(f"\n{frames.NEGOTIATE}{FRAMED_BAUD}\n".encode('utf-8'))  # The listener handles FRAMED_OK
+    print(f"Arduino link: no acknowledgement, back to text at {SERIAL_BAUD} baud")
 
 def send_serial_command(command):
-    """Sends a command to the Arduino via serial."""
-    ser.write((command + "\n").encode('utf-8'))  
-    print(f"ARDUINO: {command}")
+    """Queues a command for the Arduino; never blocks on the serial port.
+
+    A command identical to the last one still waiting is dropped (e.g. repeated STOP_VIBRATION),
+    and a newer WORDINESS_* replaces one that hasn't been sent yet.
+    """
+    global writer_thread
+    with pending_cond:
+        if writer_thread is None:
+            writer_thread = threading.Thread(target=serial_writer, name="serial-writer", daemon=True)
+            writer_thread.start()
+        if pending_commands and pending_commands[-1] == command:
+            return
+        for prefix in LATEST_ONLY_PREFIXES:
+            if command.startswith(prefix):
+                for queued in [c for c in pending_commands if c.startswith(prefix)]:
+                    pending_commands.remove(queued)
+        if len(pending_commands) >= MAX_PENDING:
+            print(f"ARDUINO: dropping unsent command {pending_commands.popleft()}")
+        pending_commands.append(command)
+        pending_cond.notify()
+
+def _writer_wait():
+    """Seconds until the writer has a resend or keepalive due (None: nothing to do until woken)."""
+    if not framed or ser is None:
+        return None
+    now = time.monotonic()
+    due = [entry[2] + ACK_TIMEOUT - now for entry in unacked.values()]
+    due.append(last_sent + KEEPALIVE_INTERVAL - now)
+    return min(due)
+
+def _write_framed(batch):
+    """Resend overdue frames, then send the batch as command frames (plus a keepalive when idle)."""
+    global last_sent
+    now = time.monotonic()
+    out = []
+    gave_up = []
+    with pending_cond:
+        for seq, entry in list(unacked.items()):
+            if now - entry[2] < ACK_TIMEOUT:
+                continue
+            if entry[3] >= MAX_TRIES:
+                gave_up.append(entry[1])
+                del unacked[seq]
+                continue
+            entry[2], entry[3] = now, entry[3] + 1
+            link_stats["retransmits"] += 1
+            out.append(entry[0])
+    if gave_up:
+        print(f"ARDUINO: never acknowledged {', '.join(gave_up)}")
+        _fall_back_to_text()
+        return False
+
+    ms = int(now * 1000)
+    for command in batch:
+        frame = frames.encode_command(command, _next_seq(), ms)
+        if frame is None:
+            print(f"ARDUINO: no frame ID for {command}, not sent")
+            continue
+        _track(frame, command)
+        out.append(frame)
+    if not out and now - last_sent >= KEEPALIVE_INTERVAL:
+        frame = frames.encode(frames.HELLO, _next_seq(), 0, ms=ms)
+        _track(frame, "HELLO")
+        out.append(frame)
+    if out:
+        _write(b"".join(out))
+        last_sent = now
+    return True
+
+def serial_writer():
+    """Writes queued commands in order, everything waiting at once in a single write."""
+    global writer_busy
+    while True:
+        with pending_cond:
+            while not pending_commands:
+                wait = _writer_wait()
+                if wait is not None and wait <= 0:
+                    break  # A resend or keepalive is due
+                writer_busy = False
+                pending_cond.notify_all()  # Wakes flush_serial_writes()
+                pending_cond.wait(wait)
+            batch = list(pending_commands)
+            pending_commands.clear()
+            writer_busy = True
+
+        port = ser
+        if port is None:
+            for command in batch:
+                print(f"ARDUINO (not connected): {command}")
+            continue
+        try:
+            if framed and _write_framed(batch):
+                if batch:
+                    print(f"ARDUINO: {', '.join(batch)}")
+                continue
+            if batch:
+                _write("".join(command + "\n" for command in batch).encode('utf-8'))
+                print(f"ARDUINO: {', '.join(batch)}")
+        except Exception as e:
+            print(f"ARDUINO: write failed ({e}): {', '.join(batch)}")
+
+def flush_serial_writes(timeout=1.0):
+    """Waits until every queued command has been written (and acknowledged, on the framed link)."""
+    with pending_cond:
+        return pending_cond.wait_for(lambda: not pending_commands and not writer_busy and not unacked, timeout)
+
+def _set_command(command, at):
+    global last_command, last_command_time
+    with command_lock:
+        last_command_time = at
+        last_command = command  # Update last command globally
+
+def handle_text_line(line):
+    """A line from the Arduino in text mode."""
+    if line.startswith(frames.NEGOTIATE_OK):
+        if line == f"{frames.NEGOTIATE_OK}{FRAMED_BAUD}" and not framed:
+            _enter_framed()
+        return
+    if line.startswith("UNKNOWN_COMMAND"):
+        print(f"Arduino didn't understand a command: {line}")  # An echo, not a button
+        return
+    print(f"📡 RECEIVED: {line}")
+    _set_command(line, time.monotonic())
+
+def handle_frame(frame, received_at):
+    """A frame from the Arduino: acks settle our commands, events are button presses."""
+    global last_event_seq
+    clock.observe(frame.ms, received_at)
+    if frame.type == frames.ACK:
+        with pending_cond:
+            if unacked.pop(frame.seq, None) and not unacked:
+                pending_cond.notify_all()
+        return
+    if frame.type == frames.HELLO:
+        _write(frames.encode(frames.ACK, frame.seq, frame.ident, ms=int(received_at * 1000)))
+        return
+    if frame.type != frames.EVENT:
+        return
+
+    # Ack first: the Arduino resends the event until it gets one
+    _write(frames.encode(frames.ACK, frame.seq, frame.ident, ms=int(received_at * 1000)))
+    if frame.seq == last_event_seq:
+        link_stats["duplicates"] += 1  # Our ack was lost; the press was already handled
+        return
+    if last_event_seq is not None:
+        gap = (frame.seq - last_event_seq - 1) & 0xFF
+        if gap:
+            link_stats["lost"] += gap
+            print(f"⚠️ {gap} Arduino event(s) lost before seq {frame.seq}")
+    last_event_seq = frame.seq
+
+    command = frames.EVENT_NAMES.get(frame.ident)
+    if command is None:
+        print(f"Unknown Arduino event ID {frame.ident}")
+        return
+    pressed_at = min(clock.to_host(frame.ms), received_at)
+    print(f"📡 RECEIVED: {command} (pressed {(received_at - pressed_at) * 1000:.0f} ms ago)")
+    _set_command(command, pressed_at)
 
 def serial_thread():
     """Continuously read from the serial port and update last_command."""
-    global last_command
     print("🔌 Listening for serial commands...")
+    parser = frames.FrameParser()
+    partial = b""
 
-    while True:
-        if ser.in_waiting > 0:
-            command = ser.readline().decode('utf-8', errors='ignore').strip()
-            if command:
-                with command_lock:
-                    print(f"📡 RECEIVED: {command}")
-                    last_command = command  # Update last command globally
+    while ser is not None:
+        port = ser
+        try:
+            if framed:
+                # Blocks until bytes arrive (or the port timeout)
+                data = port.read(port.in_waiting or 1)
+                received_at = time.monotonic()
+                if not framed:
+                    partial += data  # Fell back to text while waiting; these are text bytes
+                    continue
+                for frame in parser.feed(data):
+                    handle_frame(frame, received_at)
+                link_stats["bad_frames"] += parser.bad_frames
+                parser.bad_frames = 0
+                continue
+
+            partial += port.readline()  # Blocks until a newline (or the port timeout)
+            while b"\n" in partial and not framed:
+                line, partial = partial.split(b"\n", 1)
+                line = line.decode('utf-8', errors='ignore').strip()
+                if line:
+                    handle_text_line(line)
+            if framed:
+                # Switched to frames: whatever followed FRAMED_OK is already framed
+                parser = frames.FrameParser()
+                received_at = time.monotonic()
+                for frame in parser.feed(partial):
+                    handle_frame(frame, received_at)
+                partial = b""
+        except Exception as e:
+            if ser is None:
+                break
+            print(f"Serial read error: {e}")
+            time.sleep(0.5)
 
 def start_serial_listener():
     """Starts the serial thread."""
+    open_serial()
     serial_thread_instance = threading.Thread(target=serial_thread, daemon=True)
     serial_thread_instance.start()
     return serial_thread_instance
@@ -36,6 +355,8 @@ def stop_serial():
     """Stops the serial connection safely."""
     global ser
     if ser:
+        flush_serial_writes()
         print("🛑 Closing serial connection...")
-        ser.close()
-        ser = None  
+        with port_lock:
+            ser.close()
+            ser = None
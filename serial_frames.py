@@ -0,0 +1,161 @@
+# serial_frames.py
+# Framed Arduino link: fixed-size binary frames with sequence numbers, firmware timestamps, CRC and acks.
+# ard_serial.ino implements the same layout; keep the IDs in step with it.
+#
+#   byte  0     SYNC (0xA5)
+#   byte  1     type: EVENT (Arduino -> host), COMMAND (host -> Arduino), ACK (either way), HELLO
+#   byte  2     sequence number (per sender, wraps at 256; an ACK echoes the one it acknowledges)
+#   byte  3     event/command ID
+#   bytes 4-5   argument (uint16 little-endian, e.g. the wordiness level)
+#   bytes 6-9   sender's clock in milliseconds (uint32 little-endian; the Arduino's millis())
+#   byte  10    CRC-8 (polynomial 0x07) of bytes 1-9
+#
+# The link starts as newline-delimited text at 19200 baud. The host sends "FRAMED:<baud>"; firmware
+# that knows the protocol answers "FRAMED_OK:<baud>" and both switch to frames at that baud.
+from collections import deque
+import struct
+
+SYNC = 0xA5
+FRAME_LENGTH = 11
+NEGOTIATE = "FRAMED:"
+NEGOTIATE_OK = "FRAMED_OK:"
+
+# Frame types
+EVENT = 0x01
+COMMAND = 0x02
+ACK = 0x03
+HELLO = 0x04
+
+# Arduino -> host
+EVENT_IDS = {
+    "TAKE_PICTURE": 1,
+    "PLAY_BACK": 2,
+    "PREV": 3,
+    "NEXT": 4,
+    "WORD_CNT": 5,
+    "PLAYBACK_SPEED": 6,
+    "DOCUMENT_MODE": 7,
+    "SCENE_WATCH": 8,
+}
+EVENT_NAMES = {number: name for name, number in EVENT_IDS.items()}
+
+# Host -> Arduino ("WORDINESS_<n>" travels as WORDINESS with n as the argument)
+COMMAND_IDS = {
+    "FEEDBACK_VIBRATE": 32,
+    "STOP_VIBRATION": 33,
+    "REQUEST_COMPLETE": 34,
+    "READY": 35,
+    "WORDINESS": 36,
+}
+COMMAND_NAMES = {number: name for name, number in COMMAND_IDS.items()}
+
+
+def crc8(data):
+    """CRC-8, polynomial 0x07, initial value 0."""
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def encode(frame_type, seq, ident, arg=0, ms=0):
+    body = struct.pack("<BBBHI", frame_type, seq & 0xFF, ident, arg & 0xFFFF, ms & 0xFFFFFFFF)
+    return bytes((SYNC,)) + body + bytes((crc8(body),))
+
+
+def encode_command(command, seq, ms=0):
+    """COMMAND frame for a text command name, or None if it has no ID."""
+    name, _, arg = command.partition("_") if command.startswith("WORDINESS_") else (command, "", "")
+    if name not in COMMAND_IDS:
+        return None
+    return encode(COMMAND, seq, COMMAND_IDS[name], int(arg or 0), ms)
+
+
+def command_text(ident, arg):
+    """Text form of a COMMAND frame's ID and argument (inverse of encode_command)."""
+    name = COMMAND_NAMES.get(ident)
+    if name == "WORDINESS":
+        return f"WORDINESS_{arg}"
+    return name
+
+
+class Frame:
+    __slots__ = ("type", "seq", "ident", "arg", "ms")
+
+    def __init__(self, frame_type, seq, ident, arg, ms):
+        self.type = frame_type
+        self.seq = seq
+        self.ident = ident
+        self.arg = arg
+        self.ms = ms
+
+
+class FrameParser:
+    """Splits a byte stream into frames, resynchronising on SYNC after noise or a bad CRC."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.bad_frames = 0
+
+    def feed(self, data):
+        """Add received bytes; returns the complete, valid frames."""
+        self.buffer += data
+        frames = []
+        while True:
+            start = self.buffer.find(SYNC)
+            if start < 0:
+                self.buffer.clear()
+                break
+            del self.buffer[:start]
+            if len(self.buffer) < FRAME_LENGTH:
+                break
+            body = bytes(self.buffer[1:FRAME_LENGTH - 1])
+            if crc8(body) != self.buffer[FRAME_LENGTH - 1]:
+                self.bad_frames += 1
+                del self.buffer[:1]  # Not a frame start after all; look for the next SYNC
+                continue
+            del self.buffer[:FRAME_LENGTH]
+            frames.append(Frame(*struct.unpack("<BBBHI", body)))
+        return frames
+
+
+class ClockMapper:
+    """Maps the Arduino's millis() onto time.monotonic().
+
+    Every frame gives (firmware ms, host receive time); the smallest difference seen recently is
+    the one with the least transit delay, so it is taken as the clock offset. Only the last
+    `window` seconds count: the Arduino's resonator drifts by hundreds of ppm, so older offsets
+    are stale (keepalive acks every couple of seconds keep the window populated). millis()
+    wrapping (every ~49.7 days) is unwrapped against the last timestamp seen.
+    """
+
+    def __init__(self, window=20.0):
+        self.window = window
+        self.offsets = deque()  # (host receive time, offset)
+        self.last_ms = None
+        self.wraps = 0
+
+    def _unwrap(self, ms, update):
+        wraps = self.wraps
+        if self.last_ms is not None:
+            if ms < self.last_ms - 0x80000000:
+                wraps += 1
+            elif ms > self.last_ms + 0x80000000:
+                wraps -= 1  # From just before the last wrap
+        if update:
+            self.wraps = wraps
+            self.last_ms = ms
+        return ms + wraps * 0x100000000
+
+    def observe(self, ms, received_at):
+        self.offsets.append((received_at, received_at - self._unwrap(ms, True) / 1000.0))
+        while received_at - self.offsets[0][0] > self.window:
+            self.offsets.popleft()
+
+    def to_host(self, ms):
+        """Host monotonic time of a firmware timestamp (None before the first frame)."""
+        if not self.offsets:
+            return None
+        return self._unwrap(ms, False) / 1000.0 + min(offset for _, offset in self.offsets)
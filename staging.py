@@ -0,0 +1,126 @@
+# staging.py
+# RAM-backed (tmpfs) staging for in-flight files; the ones worth keeping are copied to the SD card in the background.
+import threading
+import shutil
+import queue
+import os
+
+# Defaults
+DEFAULT_DIR = "/dev/shm/bcam"  # tmpfs on Raspberry Pi OS
+COPY_BUFFER = 256 * 1024
+
+
+def default_directory():
+    """BCAM_STAGING_DIR if set ("" turns staging off), else DEFAULT_DIR where /dev/shm exists."""
+    configured = os.environ.get("BCAM_STAGING_DIR")
+    if configured is not None:
+        return configured or None
+    return DEFAULT_DIR if os.path.isdir(os.path.dirname(DEFAULT_DIR)) else None
+
+
+class StagingArea:
+    """Request-path files are written under `directory` instead of their final directory.
+
+    persist() copies a staged file to its final directory on a background thread (temp file,
+    fsync, rename: the card never holds a partial file); release() drops the staged copy once
+    the request is done with it (after its pending copy, if any). Files that are never persisted
+    never touch the card. Without a directory, files are written to their final place directly
+    and both calls only report that.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = os.path.abspath(directory) if directory else None
+        self.lock = threading.Lock()
+        self.pending = {}       # Staged path -> copies still queued
+        self.released = set()   # Staged paths to remove once their copies are done
+        self.queue = queue.Queue()
+        self.thread = None
+        if self.directory:
+            # Whatever is left is from a previous run that never finished with it
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
+            self.thread = threading.Thread(target=self._run, name="staging-flush", daemon=True)
+            self.thread.start()
+            print(f"Staging in-flight files in {self.directory}")
+
+    def dir(self, final_dir):
+        """Directory to write files bound for `final_dir` into."""
+        if not self.directory:
+            return final_dir
+        path = os.path.join(self.directory, os.path.basename(os.path.normpath(final_dir)))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def is_staged(self, path):
+        return bool(self.directory) and os.path.abspath(path).startswith(self.directory + os.sep)
+
+    def persist(self, path, final_dir, on_done=None):
+        """Copy a staged file into `final_dir` in the background; `on_done(final_path)` runs after the rename."""
+        if not self.is_staged(path):
+            if on_done:
+                on_done(path)
+            return
+        with self.lock:
+            self.pending[path] = self.pending.get(path, 0) + 1
+        self.queue.put((path, final_dir, on_done))
+
+    def release(self, path):
+        """The staged copy of `path` is no longer needed."""
+        if not path or not self.is_staged(path):
+            return
+        with self.lock:
+            if self.pending.get(path):
+                self.released.add(path)
+                return
+        self._remove(path)
+
+    def close(self, timeout=5.0):
+        """Finish the queued copies (up to `timeout` seconds)."""
+        if self.thread:
+            self.queue.put(None)
+            self.thread.join(timeout)
+            self.thread = None
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def commit(self, path, final_dir):
+        """Copy `path` into `final_dir` now (temp file, fsync, rename); returns the final path."""
+        final_path = os.path.join(final_dir, os.path.basename(path))
+        temp_path = final_path + ".tmp"
+        try:
+            with open(path, "rb") as source, open(temp_path, "wb") as target:
+                shutil.copyfileobj(source, target, COPY_BUFFER)
+                target.flush()
+                os.fsync(target.fileno())
+            os.replace(temp_path, final_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return final_path
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            path, final_dir, on_done = job
+            try:
+                final_path = self.commit(path, final_dir)
+                if on_done:
+                    on_done(final_path)
+            except Exception as e:
+                print(f"Staging: could not persist {path}: {e}")
+            with self.lock:
+                self.pending[path] -= 1
+                done = not self.pending[path]
+                if done:
+                    del self.pending[path]
+                remove = done and path in self.released
+                if remove:
+                    self.released.discard(path)
+            if remove:
+                self._remove(path)
@@ -0,0 +1,36 @@
+import wave
+
+import numpy as np
+
+from announce import IndexAnnouncer, NUMBER_WORDS, TENS_WORDS
+
+RATE = 22050
+
+
+def write_clip(directory, word, seconds=0.2):
+    with wave.open(str(directory / f"{word}.wav"), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes((np.ones(int(RATE * seconds)) * 5000).astype("<i2").tobytes())
+
+
+def test_numbers_past_ten_are_announced(tmp_path):
+    for word in NUMBER_WORDS:
+        write_clip(tmp_path, word)
+    announcer = IndexAnnouncer(str(tmp_path), RATE)
+    short = len(announcer.compose(3, 10)[1])
+
+    # No clips for eleven and up: the "more than ten" cue instead of silence
+    assert len(announcer.compose(12, 40)[1]) > short
+    assert len(announcer.compose(3, 40)[1]) > short
+
+
+def test_tens_and_units_clips(tmp_path):
+    for word in NUMBER_WORDS + TENS_WORDS:
+        write_clip(tmp_path, word)
+    announcer = IndexAnnouncer(str(tmp_path), RATE)
+    announcer.load()
+
+    assert len(announcer._number(42)) == 2
+    assert len(announcer._number(40)) == 1
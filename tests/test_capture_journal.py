@@ -0,0 +1,32 @@
+from capture_journal import CaptureJournal, STATUS_COMPLETE, STATUS_ERROR, STATUS_INTERRUPTED
+
+
+def make_audio(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b"audio")
+    return str(path)
+
+
+def test_recent_audio_lists_interrupted_captures_with_audio(tmp_path):
+    journal = CaptureJournal(str(tmp_path / "journal.db"))
+    complete = journal.start_capture("a.jpg", 50)
+    journal.update(complete, audio_path=make_audio(tmp_path, "a.opus"))
+    journal.finish(complete, STATUS_COMPLETE)
+    interrupted = journal.start_capture("b.jpg", 50)
+    journal.update(interrupted, audio_path=make_audio(tmp_path, "b.opus"))
+    journal.finish(interrupted, STATUS_INTERRUPTED)
+
+    assert journal.recent_audio() == [str(tmp_path / "b.opus"), str(tmp_path / "a.opus")]
+    journal.close()
+
+
+def test_recent_audio_skips_captures_without_audio(tmp_path):
+    journal = CaptureJournal(str(tmp_path / "journal.db"))
+    interrupted = journal.start_capture("a.jpg", 50)
+    journal.finish(interrupted, STATUS_INTERRUPTED)
+    failed = journal.start_capture("b.jpg", 50)
+    journal.update(failed, audio_path=make_audio(tmp_path, "b.wav"))
+    journal.finish(failed, STATUS_ERROR)
+
+    assert journal.recent_audio() == []
+    journal.close()
@@ -0,0 +1,34 @@
+import wave
+
+from tts_cache import AudioCache, cache_key
+
+
+def write_wav(path, frames):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(22050)
+        wav.writeframes(b"\x01\x00" * frames)
+    return str(path)
+
+
+def test_put_and_get(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    key = cache_key("hello", voice="nova")
+    assert cache.put(key, write_wav(tmp_path / "speech.wav", 2205))
+    assert cache.get(key, str(tmp_path / "copy.wav"))
+    assert (tmp_path / "copy.wav").read_bytes() == (tmp_path / "speech.wav").read_bytes()
+
+
+def test_put_rejects_empty_and_truncated_audio(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    empty = write_wav(tmp_path / "empty.wav", 0)
+    tiny = write_wav(tmp_path / "tiny.wav", 10)
+    truncated = tmp_path / "truncated.wav"
+    truncated.write_bytes(b"RIFF")
+
+    for source in (empty, tiny, str(truncated)):
+        key = cache_key(source)
+        assert not cache.put(key, source)
+        assert not cache.get(key, str(tmp_path / "copy.wav"))
+    assert cache.total_bytes == 0
@@ -0,0 +1,173 @@
+# time_stretch.py
+# Pitch-preserving speed change (WSOLA) for streamed 16-bit mono PCM.
+#
+#   python time_stretch.py                      # CPU benchmark on synthetic speech-like audio
+#   python time_stretch.py audio/response.wav   # ...or on a real response
+import numpy as np
+
+# Defaults
+FRAME_MS = 20   # Overlap-add frame (two frames overlap by half)
+SEARCH_MS = 8   # How far a frame may move to line up with the previous one (about one pitch period)
+
+
+class WsolaStretcher:
+    """Streaming WSOLA: plays audio `speed` times faster (2.0 = twice as fast) at the same pitch.
+
+    Each output frame is taken near its ideal position in the input, shifted by up to `search_ms`
+    to the offset whose start best matches the natural continuation of the previous frame
+    (normalised cross-correlation, one matrix-vector product per frame), then overlap-added.
+    """
+
+    def __init__(self, rate, speed, frame_ms=FRAME_MS, search_ms=SEARCH_MS):
+        self.speed = speed
+        self.frame = max(4, int(rate * frame_ms / 1000) // 2 * 2)
+        self.hop = self.frame // 2
+        self.search = max(1, int(rate * search_ms / 1000))
+        # Periodic Hann: frames overlapping by half sum to exactly 1
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(self.frame) / self.frame)).astype(np.float32)
+
+        self.leftover = b""
+        # `search` zeros in front so the first frame can move left too
+        self.buffer = np.zeros(self.search, dtype=np.float32)
+        self.buffer_start = -self.search  # Absolute input index of buffer[0]
+        self.input_end = 0                # Real (non-padding) samples received
+        self.frames = 0                   # Output frames produced
+        self.previous = None              # Input position of the last frame
+        self.tail = np.zeros(self.hop, dtype=np.float32)  # Second half of the last frame, still to be added
+
+    def _target(self, index):
+        return int(round(index * self.hop * self.speed))
+
+    def _position(self, target):
+        """Input position for the next frame: `target` moved to line up with the previous frame."""
+        if self.previous is None:
+            return target
+        template = self._slice(self.previous + self.hop, self.hop)
+        region = self._slice(target - self.search, 2 * self.search + self.hop)
+        candidates = np.lib.stride_tricks.sliding_window_view(region, self.hop)
+        energy = np.cumsum(np.concatenate(([0.0], region.astype(np.float64) ** 2)))
+        energy = energy[self.hop:] - energy[:-self.hop]
+        scores = (candidates @ template) / np.sqrt(energy + 1e-3)
+        return target - self.search + int(np.argmax(scores))
+
+    def _slice(self, start, length):
+        offset = start - self.buffer_start
+        return self.buffer[offset:offset + length]
+
+    def _run(self, limit):
+        """Produce every frame whose input is available (and whose target is before `limit`)."""
+        output = []
+        available = self.buffer_start + len(self.buffer)
+        while True:
+            target = self._target(self.frames)
+            if target >= limit:
+                break
+            needed = target + self.search + self.frame
+            if self.previous is not None:
+                needed = max(needed, self.previous + 2 * self.hop)
+            if needed > available:
+                break
+
+            position = self._position(target)
+            segment = self._slice(position, self.frame) * self.window
+            output.append(self.tail + segment[:self.hop])
+            self.tail = segment[self.hop:]
+            self.previous = position
+            self.frames += 1
+
+        # Drop input no later frame can reach
+        keep_from = min(self._target(self.frames) - self.search, (self.previous or 0) + self.hop)
+        drop = min(max(0, keep_from - self.buffer_start), len(self.buffer))
+        self.buffer = self.buffer[drop:]
+        self.buffer_start += drop
+
+        if not output:
+            return b""
+        return np.clip(np.rint(np.concatenate(output)), -32768, 32767).astype("<i2").tobytes()
+
+    def process(self, data):
+        """Stretch another chunk of little-endian int16 PCM; returns the bytes that are ready."""
+        data = self.leftover + data
+        usable = len(data) - len(data) % 2
+        self.leftover = data[usable:]
+        if usable:
+            samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32)
+            self.buffer = np.concatenate((self.buffer, samples))
+            self.input_end += len(samples)
+        return self._run(float("inf"))
+
+    def flush(self):
+        """Finish the stream: frames up to the end of the input, then the last overlap tail."""
+        padding = self.search + self.frame + int(np.ceil(self.hop * self.speed))
+        self.buffer = np.concatenate((self.buffer, np.zeros(padding, dtype=np.float32)))
+        out = self._run(self.input_end)
+        tail = np.clip(np.rint(self.tail), -32768, 32767).astype("<i2").tobytes()
+        self.tail = np.zeros(self.hop, dtype=np.float32)
+        return out + tail
+
+
+def stretch_chunks(chunks, rate, speed):
+    """Wrap a PCM chunk iterator so it plays `speed` times faster (unchanged at 1.0)."""
+    if speed == 1.0:
+        yield from chunks
+        return
+    stretcher = WsolaStretcher(rate, speed)
+    try:
+        for chunk in chunks:
+            out = stretcher.process(chunk)
+            if out:
+                yield out
+        yield stretcher.flush()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def _speech_like(rate, seconds, seed=0):
+    """Pitch-gliding harmonics with a syllable envelope, a rough stand-in for speech."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(rate * seconds)) / rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    noise = rng.normal(0, 0.05, len(t))
+    return (np.clip(voice * envelope + noise, -1, 1) * 12000).astype("<i2")
+
+
+if __name__ == "__main__":
+    import argparse
+    import wave
+    import time
+
+    parser = argparse.ArgumentParser(description="WSOLA time-stretch CPU benchmark")
+    parser.add_argument("wav", nargs="?", help="16-bit mono WAV to stretch (default: 30 s of synthetic speech)")
+    parser.add_argument("--speeds", default="1.25,1.5,2.0,2.5", help="Comma-separated playback speeds")
+    parser.add_argument("--chunk", type=int, default=4096, help="Bytes per streamed chunk")
+    args = parser.parse_args()
+
+    if args.wav:
+        with wave.open(args.wav, "rb") as source:
+            rate = source.getframerate()
+            pcm = source.readframes(source.getnframes())
+    else:
+        rate = 22050
+        pcm = _speech_like(rate, 30).tobytes()
+    seconds = len(pcm) / (2.0 * rate)
+
+    print(f"Input: {seconds:.1f} s at {rate} Hz, {args.chunk}-byte chunks")
+    print(f"{'speed':>6} {'out s':>7} {'cpu s':>7} {'cpu/out':>8} {'worst chunk ms':>15}")
+    for speed in (float(s) for s in args.speeds.split(",")):
+        stretcher = WsolaStretcher(rate, speed)
+        out_bytes = 0
+        worst = 0.0
+        cpu_start = time.process_time()
+        for offset in range(0, len(pcm), args.chunk):
+            chunk_start = time.perf_counter()
+            out_bytes += len(stretcher.process(pcm[offset:offset + args.chunk]))
+            worst = max(worst, time.perf_counter() - chunk_start)
+        out_bytes += len(stretcher.flush())
+        cpu = time.process_time() - cpu_start
+        out_seconds = out_bytes / (2.0 * rate)
+        # cpu/out < 1 means it keeps up with playback; on a Pi leave headroom for everything else
+        print(f"{speed:>6.2f} {out_seconds:>7.1f} {cpu:>7.3f} {cpu / out_seconds:>8.3f} {worst * 1000:>15.2f}")
@@ -0,0 +1,106 @@
+# tts_cache.py
+# Content-addressed cache of synthesized speech, bounded by a byte budget on the SD card.
+import threading
+import hashlib
+import shutil
+import wave
+import json
+import os
+from collections import OrderedDict
+
+# Defaults
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024  # 20 MB of WAV files
+SUFFIX = ".wav"
+MIN_BYTES = 100  # Smaller files are failed or cut-off streams (the same check gates playback)
+
+
+def cache_key(text, **params):
+    """SHA-256 of the text plus everything else that changes the audio (voice, model, format...)."""
+    payload = json.dumps({"text": text, **params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """WAV files named by their cache key; the least recently used ones are evicted past `max_bytes`."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self.total_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        # File modification times carry the LRU order across restarts
+        files = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(SUFFIX):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name[:-len(SUFFIX)], stat.st_size))
+            elif name.endswith(".tmp"):
+                os.remove(path)  # Left over from an interrupted put()
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key, dest):
+        """Copy the cached audio for `key` to `dest`; returns False on a miss."""
+        with self.lock:
+            if key not in self.entries:
+                return False
+            self.entries.move_to_end(key)
+            source = self.path(key)
+            try:
+                os.utime(source)
+                shutil.copyfile(source, dest)
+            except OSError as e:
+                print(f"TTS cache: dropping unreadable entry {key[:12]}: {e}")
+                self._remove(key)
+                return False
+        return True
+
+    def put(self, key, source):
+        """Store a copy of `source` under `key` (skipped if it has no audio or alone exceeds the budget)."""
+        try:
+            size = os.path.getsize(source)
+            with wave.open(source, "rb") as wav:
+                frames = wav.getnframes()
+        except (OSError, EOFError, wave.Error) as e:
+            print(f"TTS cache: not storing {key[:12]}: {e}")
+            return False
+        if size < MIN_BYTES or frames == 0:
+            print(f"TTS cache: not storing {key[:12]}: no audio")
+            return False
+        if size > self.max_bytes:
+            return False
+        temp_path = f"{self.path(key)}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(source, temp_path)
+            os.replace(temp_path, self.path(key))
+        except OSError as e:
+            print(f"TTS cache: could not store {key[:12]}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+        with self.lock:
+            self.total_bytes += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+            self._evict()
+        return True
+
+    def _remove(self, key):
+        self.total_bytes -= self.entries.pop(key)
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            self._remove(next(iter(self.entries)))
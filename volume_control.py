@@ -1,7 +1,9 @@
-import RPi.GPIO as GPIO
 import threading
 import time
-import subprocess
+
+# RPi.GPIO on the Pi, simulated pins off-device
+import hardware
+GPIO = hardware.get_gpio()
 
 class VolumeEncoder:
     """Class to handle a rotary encoder for volume control."""
@@ -56,11 +58,7 @@ class VolumeEncoder:
             volume = max(self.min_volume, min(volume, self.max_volume))
             
             # Set volume using amixer (for Raspberry Pi)
-            subprocess.run(
-                ["amixer", "sset", "SoftMaster", f"{volume}%"], 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE
-            )
+            hardware.set_system_volume(volume)
             self.current_volume = volume
             print(f"System volume set to {volume}%")
             return True